@@ -0,0 +1 @@
+from api.app import create_app
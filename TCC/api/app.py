@@ -0,0 +1,260 @@
+"""
+Headless HTTP service for IARIS (ASGI, built on Starlette), for running it
+behind our own frontend or a load balancer instead of the Streamlit page.
+
+    uvicorn api.app:app --host 0.0.0.0 --port 8000 --workers 4
+
+Each worker process leases the IARIS corpus from the store registry
+(model.store_registry) in the background at startup, shares its
+DocumentDatabase (vector store, lexical index, subject shards) across requests,
+together with the cached chat model and the process' pooled OpenAI HTTP
+clients (model.openai_clients).
+
+    GET  /health    liveness: the process is up
+    GET  /ready     readiness: 200 once the database is loaded, 503 before
+    GET  /sources   indexed documents (?topic=... to filter)
+    GET  /pool      OpenAI connection pool stats (open / idle connections, reuse, waits)
+    POST /ask       {"question": str, "history": [{"role", "content"}],
+                     "k": int, "filters": [topic], "mode": "vector" | "lexical" | "hybrid",
+                     "stream": bool}
+                    → Server‐Sent Events: `sources`, one `token` per chunk, then
+                      `done` (or `error`); a JSON answer when "stream" is false.
+                      Failures before the stream starts are a JSON {"error"}
+                      with 502 (OpenAI API), 504 (its timeouts) or 500. Clients
+                      only get a generic message per status; the exception
+                      itself is logged by the worker.
+"""
+import json
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Dict, List, Optional
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+import config
+from model.lexical_index import RETRIEVAL_MODES
+from model.store_registry import StoreLease
+from model.subject_shards import topic_name
+
+HISTORY_ROLES = ("user", "assistant", "system")
+
+
+class BadRequest(ValueError):
+    pass
+
+
+def default_database():
+    """A lease on the IARIS corpus, the same DocumentDatabase the Streamlit app uses."""
+    from model.prompt_cache import get_chat_model
+    from model.store_registry import get_store_registry
+
+    lease = get_store_registry().acquire(config.DEFAULT_CORPUS)
+    if lease.db.llm is None:
+        get_chat_model()  # open the shared client now rather than on the first question
+    return lease
+
+
+class ServiceState:
+    """
+    The worker's database, loaded once in the background so /health answers
+    right away. A factory may return a StoreLease, released at shutdown.
+    """
+
+    def __init__(self, db_factory: Callable):
+        self.db_factory = db_factory
+        self.db = None
+        self.lease: Optional[StoreLease] = None
+        self.error: Optional[str] = None
+        self.loaded = asyncio.Event()
+
+    async def load(self):
+        try:
+            loaded = await asyncio.to_thread(self.db_factory)
+            if isinstance(loaded, StoreLease):
+                self.lease, loaded = loaded, loaded.db
+            self.db = loaded
+            print("✅ IARIS service ready")
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+            print(f"❌ IARIS service failed to load the database: {self.error}")
+        finally:
+            self.loaded.set()
+
+    def close(self):
+        if self.lease is not None:
+            self.lease.release()
+            self.lease = None
+
+
+def _sse(event: str, data: Dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _parse_ask(body) -> Dict:
+    """Validate the /ask payload into arun_rag arguments; raises BadRequest."""
+    if not isinstance(body, dict):
+        raise BadRequest("body must be a JSON object")
+    question = body.get("question")
+    if not isinstance(question, str) or not question.strip():
+        raise BadRequest("'question' must be a non‐empty string")
+
+    history = body.get("history") or []
+    if not isinstance(history, list) or not all(
+            isinstance(turn, dict) and turn.get("role") in HISTORY_ROLES and isinstance(turn.get("content"), str)
+            for turn in history):
+        raise BadRequest(f"'history' must be a list of {{role, content}} with role in {HISTORY_ROLES}")
+
+    overrides = {"retriever_k": config.API_DEFAULT_K}
+    if body.get("k") is not None:
+        k = body["k"]
+        if not isinstance(k, int) or isinstance(k, bool) or not 1 <= k <= config.API_MAX_K:
+            raise BadRequest(f"'k' must be an integer between 1 and {config.API_MAX_K}")
+        overrides["retriever_k"] = k
+    if body.get("filters") is not None:
+        filters = body["filters"]
+        if not isinstance(filters, list) or not all(isinstance(topic, str) for topic in filters):
+            raise BadRequest("'filters' must be a list of topic names")
+        overrides["filter_list"] = filters
+    if body.get("mode") is not None:
+        if body["mode"] not in RETRIEVAL_MODES:
+            raise BadRequest(f"'mode' must be one of {RETRIEVAL_MODES}")
+        overrides["retrieval_mode"] = body["mode"]
+
+    stream = body.get("stream", True)
+    if not isinstance(stream, bool):
+        raise BadRequest("'stream' must be a boolean")
+    return {"query": question.strip(), "messages": [{"role": turn["role"], "content": turn["content"]}
+                                                     for turn in history],
+            "stream": stream, **overrides}
+
+
+def _error(status: int, message: str) -> JSONResponse:
+    return JSONResponse({"error": message}, status_code=status)
+
+
+FAILURE_MESSAGES = {
+    502: "the language model service is unavailable",
+    504: "the language model service timed out",
+    500: "internal error",
+}
+
+
+def _failure_status(exc: Exception) -> int:
+    """502 for errors of the upstream OpenAI API, 504 for its timeouts, 500 for our own."""
+    if "Timeout" in type(exc).__name__:
+        return 504
+    if type(exc).__module__.split(".")[0] in ("openai", "httpx", "httpcore"):
+        return 502
+    return 500
+
+
+def _failure(exc: Exception, where: str) -> Dict:
+    """Log `exc` and return the error body for the client, without exception text or internals."""
+    status = _failure_status(exc)
+    print(f"❌ {where} failed ({status}): {type(exc).__name__}: {exc}")
+    return {"error": FAILURE_MESSAGES[status], "status": status}
+
+
+def _not_ready(state: ServiceState) -> JSONResponse:
+    if state.error:
+        # The cause was logged by ServiceState.load
+        return JSONResponse({"status": "failed", "error": "the database failed to load"}, status_code=503)
+    return JSONResponse({"status": "loading"}, status_code=503)
+
+
+async def _event_stream(response: Dict) -> AsyncIterator[str]:
+    # The status line has already been sent: from here on failures become an `error` event
+    try:
+        # Sources are known before generation starts, so clients can show them first
+        yield _sse("sources", {"sources": response["sources"]})
+        async for token in response["rag_stream"]:
+            yield _sse("token", {"text": token})
+        metrics = response["metrics"]
+        done = _sse("done", {"answer": response["rag_text"], "cache_hit": response["cache_hit"],
+                             "ttft": metrics.ttft, "total_latency": metrics.total_latency,
+                             "timings": response["timings"]})
+    except Exception as e:
+        yield _sse("error", _failure(e, "/ask stream"))
+        return
+    yield done
+
+
+def create_app(db_factory: Callable = None) -> Starlette:
+    """
+    Build the ASGI app. `db_factory()` returns the DocumentDatabase to serve
+    (default: `default_database`, or a StoreLease on it); tests pass one
+    with stub models.
+    """
+    state = ServiceState(db_factory or default_database)
+
+    @asynccontextmanager
+    async def lifespan(app: Starlette):
+        loading = asyncio.create_task(state.load())
+        yield
+        await loading
+        state.close()
+        from model.openai_clients import get_openai_clients
+        clients = get_openai_clients(create=False)
+        if clients is not None:
+            await clients.aclose()
+
+    async def health(request: Request) -> JSONResponse:
+        return JSONResponse({"status": "ok"})
+
+    async def ready(request: Request) -> JSONResponse:
+        if state.db is None:
+            return _not_ready(state)
+        return JSONResponse({"status": "ready", "sources": len(state.db.sources)})
+
+    async def sources(request: Request) -> JSONResponse:
+        if state.db is None:
+            return _not_ready(state)
+        topic = request.query_params.get("topic")
+        items: List[Dict] = []
+        for source, entry in sorted(state.db.sources.entries.items()):
+            source_topic = topic_name(entry["subject"])
+            if topic is None or source_topic == topic:
+                items.append({"source": source, "topic": source_topic, "chunks": entry["chunks"]})
+        topics = sorted({topic_name(entry["subject"]) for entry in state.db.sources.entries.values()} - {None})
+        return JSONResponse({"sources": items, "topics": topics})
+
+    async def pool(request: Request) -> JSONResponse:
+        from model.openai_clients import get_openai_clients
+        return JSONResponse(get_openai_clients().stats())
+
+    async def ask(request: Request):
+        if state.db is None:
+            return _not_ready(state)
+        try:
+            arguments = _parse_ask(await request.json())
+        except json.JSONDecodeError:
+            return _error(400, "body must be valid JSON")
+        except BadRequest as e:
+            return _error(400, str(e))
+
+        try:
+            response = await state.db.arun_rag(**arguments)
+        except Exception as e:
+            failure = _failure(e, "/ask")
+            return _error(failure["status"], failure["error"])
+        if not arguments["stream"]:
+            return JSONResponse({"answer": response["rag_text"], "sources": response["sources"],
+                                 "cache_hit": response["cache_hit"], "timings": response["timings"]})
+        return StreamingResponse(_event_stream(response), media_type="text/event-stream",
+                                 headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+    app = Starlette(routes=[
+        Route("/health", health),
+        Route("/ready", ready),
+        Route("/sources", sources),
+        Route("/pool", pool),
+        Route("/ask", ask, methods=["POST"]),
+    ], lifespan=lifespan)
+    app.state.service = state
+    return app
+
+
+app = create_app()
@@ -0,0 +1,176 @@
+# api/test_app.py
+
+import io
+import os
+import json
+import time
+import tempfile
+import threading
+import unittest
+from contextlib import redirect_stdout
+from typing import List
+from unittest.mock import AsyncMock, patch
+
+import httpx
+import openai
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from starlette.testclient import TestClient
+
+from api.app import FAILURE_MESSAGES, create_app
+from model.store_registry import StoreRegistry
+from model.testing import build_test_database, write_files
+
+ANSWER = "Olá, gestor! A Teoria da Mudança..."
+
+
+def parse_events(body: str) -> List[tuple]:
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+class TestService(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.data_dir = os.path.join(self.tmp_dir.name, "data")
+        self.tdm, self.gri = write_files(self.data_dir, {
+            "tdm/tdm.txt": "Teoria da Mudança conecta atividades a impactos.",
+            "gri/gri.txt": "O relatório GRI segue normas de sustentabilidade.",
+        })
+        self.stdout = io.StringIO()
+        self.output = redirect_stdout(self.stdout)
+        self.output.__enter__()
+
+    def tearDown(self):
+        self.output.__exit__(None, None, None)
+        self.tmp_dir.cleanup()
+
+    def _database(self):
+        persist_dir = os.path.join(tempfile.mkdtemp(dir=self.tmp_dir.name), "chroma_db")
+        db = build_test_database(self.data_dir, persist_dir,
+                                 llm=FakeListChatModel(responses=[ANSWER]))
+        self.addCleanup(db.close)
+        return db
+
+    def _client(self, db_factory=None) -> TestClient:
+        client = TestClient(create_app(db_factory or self._database))
+        client.__enter__()
+        self.addCleanup(client.__exit__, None, None, None)
+        deadline = time.time() + 10
+        while client.get("/ready").status_code != 200 and time.time() < deadline:
+            time.sleep(0.01)
+        return client
+
+    def test_ask_streams_tokens_as_server_sent_events(self):
+        response = self._client().post("/ask", json={"question": "O que é Teoria da Mudança?"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("text/event-stream"))
+        events = parse_events(response.text)
+        self.assertEqual(events[0][0], "sources")
+        tokens = [data["text"] for event, data in events if event == "token"]
+        self.assertGreater(len(tokens), 1)
+        self.assertEqual("".join(tokens), ANSWER)
+        self.assertEqual(events[-1][0], "done")
+        self.assertEqual(events[-1][1]["answer"], ANSWER)
+        self.assertIsNotNone(events[-1][1]["ttft"])
+
+    def test_ask_without_streaming_returns_json(self):
+        response = self._client().post("/ask", json={"question": "Relatório GRI", "stream": False,
+                                                     "k": 2, "mode": "lexical"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["answer"], ANSWER)
+        self.assertEqual(response.json()["sources"], [self.gri])
+
+    def test_request_settings_do_not_leak_into_the_shared_database(self):
+        db = self._database()
+        client = self._client(lambda: db)
+        client.post("/ask", json={"question": "GRI", "stream": False, "k": 2, "mode": "lexical"})
+        self.assertEqual((db.retriever_k, db.retrieval_mode), (1, "vector"))
+
+    def test_invalid_requests_are_rejected(self):
+        client = self._client()
+        for body in ({}, {"question": "  "}, {"question": "x", "k": 0}, {"question": "x", "mode": "magic"},
+                     {"question": "x", "history": [{"role": "robot", "content": "oi"}]}):
+            self.assertEqual(client.post("/ask", json=body).status_code, 400, body)
+        self.assertEqual(client.post("/ask", content=b"not json").status_code, 400)
+
+    def test_failures_before_streaming_return_a_json_error(self):
+        db = self._database()
+        client = self._client(lambda: db)
+        upstream = openai.APIConnectionError(request=httpx.Request("POST", "https://api.openai.com/v1/chat/completions"))
+        for exc, status in ((upstream, 502), (openai.APITimeoutError(request=upstream.request), 504),
+                            (RuntimeError("retriever down"), 500)):
+            with patch.object(db, "arun_rag", AsyncMock(side_effect=exc)):
+                for stream in (True, False):
+                    response = client.post("/ask", json={"question": "GRI", "stream": stream})
+                    self.assertEqual(response.status_code, status, exc)
+                    self.assertEqual(response.json()["error"], FAILURE_MESSAGES[status])
+                    self.assertNotIn(type(exc).__name__, response.text)
+
+    def test_failures_while_streaming_send_an_error_event(self):
+        db = self._database()
+        db.llm = FakeListChatModel(responses=[ANSWER], error_on_chunk_number=3)
+        response = self._client(lambda: db).post("/ask", json={"question": "GRI"})
+        self.assertEqual(response.status_code, 200)
+        events = parse_events(response.text)
+        self.assertEqual([event for event, _ in events], ["sources", "token", "token", "token", "error"])
+        self.assertEqual(events[-1][1], {"error": FAILURE_MESSAGES[500], "status": 500})
+        self.assertIn("FakeListChatModelError", self.stdout.getvalue())
+
+    def test_sources_lists_the_catalog(self):
+        client = self._client()
+        body = client.get("/sources").json()
+        self.assertEqual(body["topics"], ["gri", "tdm"])
+        self.assertEqual([item["source"] for item in body["sources"]], [self.gri, self.tdm])
+        self.assertEqual(client.get("/sources", params={"topic": "tdm"}).json()["sources"],
+                         [{"source": self.tdm, "topic": "tdm", "chunks": 1}])
+
+    def test_pool_reports_openai_connection_stats(self):
+        stats = self._client().get("/pool").json()
+        self.assertTrue({"requests", "open_connections", "idle_connections", "wait_seconds_max"} <= set(stats))
+
+    def test_health_answers_while_the_database_is_still_loading(self):
+        release = threading.Event()
+
+        def slow_factory():
+            release.wait(10)
+            return self._database()
+
+        with TestClient(create_app(slow_factory)) as client:
+            self.assertEqual(client.get("/health").json(), {"status": "ok"})
+            self.assertEqual(client.get("/ready").status_code, 503)
+            self.assertEqual(client.post("/ask", json={"question": "x"}).status_code, 503)
+            release.set()
+
+    def test_corpus_lease_is_held_until_shutdown(self):
+        registry = StoreRegistry(opener=lambda spec: self._database())
+        registry.register("iaris", "data", self.tmp_dir.name)
+        with TestClient(create_app(lambda: registry.acquire("iaris"))) as client:
+            deadline = time.time() + 10
+            while client.get("/ready").status_code != 200 and time.time() < deadline:
+                time.sleep(0.01)
+            self.assertEqual(client.post("/ask", json={"question": "GRI", "stream": False}).json()["answer"], ANSWER)
+            self.assertEqual(registry.stats()["iaris"]["refs"], 1)
+        self.assertEqual(registry.stats()["iaris"]["refs"], 0)
+
+    def test_failed_load_is_reported_by_readiness(self):
+        def broken_factory():
+            raise FileNotFoundError("chroma_db")
+
+        with TestClient(create_app(broken_factory)) as client:
+            deadline = time.time() + 10
+            while client.get("/ready").json()["status"] == "loading" and time.time() < deadline:
+                time.sleep(0.01)
+            response = client.get("/ready")
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()["status"], "failed")
+        self.assertNotIn("chroma_db", response.text)
+        self.assertIn("FileNotFoundError: chroma_db", self.stdout.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
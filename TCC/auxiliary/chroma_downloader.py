@@ -0,0 +1,104 @@
+import os
+import re
+import json
+import hashlib
+
+import config
+
+
+def _remote_version(fs, remote_path: str) -> dict:
+    """
+    Identify the remote object: S3 ETag when the filesystem exposes one,
+    otherwise fsspec's checksum of the file info (size, mtime, ...).
+    """
+    info = fs.info(remote_path)
+    etag = info.get("ETag") or info.get("etag")
+    version = etag.strip('"') if etag else str(fs.checksum(remote_path))
+    return {"remote": remote_path, "version": version, "size": info.get("size")}
+
+
+def _read_meta(meta_path: str) -> dict:
+    if not os.path.exists(meta_path):
+        return {}
+    with open(meta_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write_meta(meta_path: str, meta: dict):
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=4)
+
+
+def _md5_of(path: str, chunk_size: int) -> "hashlib._Hash":
+    md5 = hashlib.md5()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            md5.update(block)
+    return md5
+
+
+def download_if_changed(fs, remote_path: str, local_path: str, chunk_size: int = None) -> bool:
+    """
+    Bring `local_path` up to date with `remote_path` on any fsspec filesystem
+    (s3fs, the local filesystem in tests, ...):
+      • skips the download when the local copy has the same ETag/checksum,
+        as recorded at download time (the live file is not compared: opening
+        the DB adds the subject shards to it and changes its size),
+      • streams the object in chunks into `<local_path>.part`, so memory
+        stays at one chunk whatever the database size,
+      • resumes an interrupted `.part` download when the remote is unchanged,
+      • verifies size (and MD5 for single‐part S3 ETags), then swaps the file
+        in with an atomic rename.
+    Returns True if a new copy was downloaded, False if the local one was current.
+    """
+    chunk_size = chunk_size or config.DOWNLOAD_CHUNK_SIZE
+    meta_path = local_path + ".meta.json"
+    part_path = local_path + ".part"
+    part_meta_path = part_path + ".meta.json"
+
+    remote = _remote_version(fs, remote_path)
+    local = _read_meta(meta_path)
+    if os.path.exists(local_path) and local.get("version") == remote["version"]:
+        print("✅ Local ChromaDB is current, skipping download.")
+        return False
+
+    os.makedirs(os.path.dirname(local_path) or ".", exist_ok=True)
+
+    # Resume only if the partial file belongs to the same remote version
+    offset = 0
+    if os.path.exists(part_path) and _read_meta(part_meta_path).get("version") == remote["version"]:
+        offset = os.path.getsize(part_path)
+        if remote["size"] is not None and offset > remote["size"]:
+            offset = 0
+    if offset == 0:
+        open(part_path, "wb").close()
+        _write_meta(part_meta_path, remote)
+
+    # Plain 32‐hex ETags are the MD5 of the object (not true for multipart uploads)
+    verify_md5 = bool(re.fullmatch(r"[0-9a-f]{32}", remote["version"]))
+    md5 = _md5_of(part_path, chunk_size) if verify_md5 and offset else hashlib.md5()
+
+    print(f"📥 Downloading {remote_path} ({remote['size']} bytes), resuming at byte {offset}...")
+    with fs.open(remote_path, mode="rb") as source, open(part_path, "ab") as target:
+        if offset:
+            source.seek(offset)
+        for block in iter(lambda: source.read(chunk_size), b""):
+            target.write(block)
+            if verify_md5:
+                md5.update(block)
+        target.flush()
+        os.fsync(target.fileno())
+
+    size = os.path.getsize(part_path)
+    if remote["size"] is not None and size != remote["size"]:
+        raise IOError(f"Incomplete download of {remote_path}: {size} of {remote['size']} bytes")
+    if verify_md5 and md5.hexdigest() != remote["version"]:
+        os.remove(part_path)
+        os.remove(part_meta_path)
+        raise IOError(f"Checksum mismatch for {remote_path}")
+
+    os.replace(part_path, local_path)
+    _write_meta(meta_path, remote)
+    os.remove(part_meta_path)
+    print("✅ ChromaDB download complete.")
+    return True
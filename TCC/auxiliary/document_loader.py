@@ -3,7 +3,13 @@ import gdown
 import zipfile
 
 
-def download_dataset():
+def download_dataset(extract: bool = True) -> str:
+    """
+    Download the documents archive into data/. With extract=False the zip is
+    kept as is and its path returned, to be ingested in place
+    (`DocumentDatabase(file_path=...)` reads .txt members straight out of it);
+    otherwise it is extracted and the data folder is returned.
+    """
 
     # Google Drive file ID (Extracted from your link)
     file_id = os.getenv("DOCS_REMOTE_FILE_ID")
@@ -21,6 +27,10 @@ def download_dataset():
     # Download the ZIP file
     gdown.download(file_url, zip_file_path, quiet=False)
 
+    if not extract:
+        print(f"✅ Download complete. Archive kept at {zip_file_path}.")
+        return zip_file_path
+
     # Extract the ZIP file
     if zip_file_path.endswith(".zip"):
         with zipfile.ZipFile(zip_file_path, "r") as zip_ref:
@@ -28,3 +38,4 @@ def download_dataset():
         os.remove(zip_file_path)  # Remove ZIP file after extraction
 
     print("✅ Download and extraction complete. Files are in the 'data' folder.")
+    return output_dir
@@ -0,0 +1,254 @@
+"""
+Versioned, delta‐updatable snapshots of a vector database folder (Chroma
+files, source catalog, lexical index...), on any fsspec filesystem (s3fs,
+or a local directory in tests):
+
+    <remote>/LATEST                    version id of the newest snapshot
+    <remote>/manifests/<version>.json  {"version", "parent", "created_at",
+                                        "segment_size", "files": {path: {"size", "sha256", "segments"}}}
+    <remote>/segments/<ab>/<sha256>    one fixed‐size piece of a file, named by its content
+
+A producer uploads only the segments the remote does not have yet; a
+consumer downloads only the segments its local files do not already
+contain, verifies every checksum, and swaps the new folder in at once.
+
+    python -m auxiliary.snapshots publish ./chroma_db s3://bucket/iaris-snapshots
+    python -m auxiliary.snapshots pull s3://bucket/iaris-snapshots ./chroma_db
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+from dataclasses import dataclass
+from typing import Dict, Iterator, Optional, Tuple
+
+import config
+
+LOCAL_SNAPSHOT_FILE = ".snapshot.json"
+# Left behind by interrupted writes or our own staging, never part of a snapshot
+SKIPPED_SUFFIXES = (".tmp", ".part", ".staging", ".previous")
+
+
+@dataclass
+class SnapshotSync:
+    version: str
+    changed: bool
+    downloaded_segments: int = 0
+    reused_segments: int = 0
+    downloaded_bytes: int = 0
+
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _segment_path(remote_root: str, digest: str) -> str:
+    return f"{remote_root}/segments/{digest[:2]}/{digest}"
+
+
+def _manifest_path(remote_root: str, version: str) -> str:
+    return f"{remote_root}/manifests/{version}.json"
+
+
+def _iter_files(local_dir: str) -> Iterator[Tuple[str, str]]:
+    """(relative path with forward slashes, absolute path) of every file in `local_dir`, sorted."""
+    for root, dirs, files in os.walk(local_dir):
+        dirs[:] = sorted(d for d in dirs if not d.endswith(SKIPPED_SUFFIXES))
+        for name in sorted(files):
+            if name == LOCAL_SNAPSHOT_FILE or name.endswith(SKIPPED_SUFFIXES):
+                continue
+            path = os.path.join(root, name)
+            yield os.path.relpath(path, local_dir).replace(os.sep, "/"), path
+
+
+def _iter_segments(path: str, segment_size: int) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(segment_size), b""):
+            yield block
+
+
+def _read_json(fs, path: str) -> Dict:
+    return json.loads(fs.cat_file(path).decode("utf-8"))
+
+
+def _write_bytes(fs, path: str, data: bytes):
+    fs.makedirs(path.rsplit("/", 1)[0], exist_ok=True)
+    fs.pipe_file(path, data)
+
+
+def latest_version(fs, remote_root: str) -> Optional[str]:
+    path = f"{remote_root}/LATEST"
+    return fs.cat_file(path).decode("utf-8").strip() if fs.exists(path) else None
+
+
+def local_version(local_dir: str) -> Optional[str]:
+    path = os.path.join(local_dir, LOCAL_SNAPSHOT_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f).get("version")
+
+
+def publish_snapshot(local_dir: str, fs, remote_root: str, segment_size: int = None) -> Dict:
+    """
+    Publish `local_dir` (a closed store, not one being written to) as the
+    newest snapshot. Segments already on the remote are not uploaded again,
+    so a publish after a small sync only sends what changed. The version id
+    is derived from the content: publishing an unchanged folder is a no‐op.
+    Returns the manifest.
+    """
+    segment_size = segment_size or config.SNAPSHOT_SEGMENT_SIZE
+    remote_root = remote_root.rstrip("/")
+    parent = latest_version(fs, remote_root)
+    known = set()
+    if parent is not None:
+        parent_manifest = _read_json(fs, _manifest_path(remote_root, parent))
+        if parent_manifest["segment_size"] == segment_size:
+            known = {digest for entry in parent_manifest["files"].values() for digest in entry["segments"]}
+
+    files, uploaded, uploaded_bytes = {}, 0, 0
+    for relative_path, path in _iter_files(local_dir):
+        file_hash, segments, size = hashlib.sha256(), [], 0
+        for block in _iter_segments(path, segment_size):
+            digest = _sha256(block)
+            file_hash.update(block)
+            size += len(block)
+            segments.append(digest)
+            if digest not in known:
+                target = _segment_path(remote_root, digest)
+                if not fs.exists(target):
+                    _write_bytes(fs, target, block)
+                    uploaded += 1
+                    uploaded_bytes += len(block)
+                known.add(digest)
+        files[relative_path] = {"size": size, "sha256": file_hash.hexdigest(), "segments": segments}
+
+    version = _sha256(json.dumps({"segment_size": segment_size, "files": files}, sort_keys=True).encode("utf-8"))[:16]
+    if version == parent:
+        print(f"✅ Snapshot {version} is already the latest, nothing to publish.")
+        return parent_manifest
+
+    manifest = {"version": version, "parent": parent, "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "segment_size": segment_size, "files": files}
+    _write_bytes(fs, _manifest_path(remote_root, version), json.dumps(manifest, indent=1).encode("utf-8"))
+    # LATEST moves last, so consumers never see a manifest whose segments are still uploading
+    _write_bytes(fs, f"{remote_root}/LATEST", version.encode("utf-8"))
+    print(f"📤 Snapshot {version} published: {len(files)} files, {uploaded} new segments "
+          f"({uploaded_bytes / 2**20:.1f} MB) uploaded")
+    return manifest
+
+
+def _local_segments(local_dir: str, segment_size: int) -> Dict[str, Tuple[str, int, int]]:
+    """Segments already on disk: sha256 → (path, offset, length), from the current local files."""
+    available = {}
+    if not os.path.isdir(local_dir):
+        return available
+    for _, path in _iter_files(local_dir):
+        offset = 0
+        for block in _iter_segments(path, segment_size):
+            available.setdefault(_sha256(block), (path, offset, len(block)))
+            offset += len(block)
+    return available
+
+
+def _read_local_segment(path: str, offset: int, length: int) -> bytes:
+    with open(path, "rb") as f:
+        f.seek(offset)
+        return f.read(length)
+
+
+def _recover_interrupted_swap(local_dir: str):
+    previous_dir = local_dir + ".previous"
+    if os.path.isdir(previous_dir) and not os.path.exists(local_dir):
+        os.replace(previous_dir, local_dir)
+    shutil.rmtree(previous_dir, ignore_errors=True)
+
+
+def sync_snapshot(fs, remote_root: str, local_dir: str, version: str = None) -> SnapshotSync:
+    """
+    Bring `local_dir` to snapshot `version` (default: the latest):
+      • nothing is transferred when it already is at that version,
+      • segments its current files already contain are copied locally,
+        only the missing ones are downloaded,
+      • every segment and every assembled file is checked against the
+        manifest's sha256; any mismatch raises IOError and leaves
+        `local_dir` untouched,
+      • the new folder is assembled next to it and swapped in with renames.
+    Call it before the store is opened: open files cannot be swapped on Windows.
+    """
+    remote_root = remote_root.rstrip("/")
+    local_dir = os.path.normpath(local_dir)
+    _recover_interrupted_swap(local_dir)
+    version = version or latest_version(fs, remote_root)
+    if version is None:
+        raise FileNotFoundError(f"No snapshot published at {remote_root}")
+    if local_version(local_dir) == version:
+        print(f"✅ Local vector DB is at snapshot {version}, skipping download.")
+        return SnapshotSync(version, changed=False)
+
+    manifest = _read_json(fs, _manifest_path(remote_root, version))
+    segment_size = manifest["segment_size"]
+    available = _local_segments(local_dir, segment_size)
+    result = SnapshotSync(version, changed=True)
+
+    staging_dir = local_dir + ".staging"
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    try:
+        for relative_path, entry in manifest["files"].items():
+            target = os.path.join(staging_dir, *relative_path.split("/"))
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            file_hash = hashlib.sha256()
+            with open(target, "wb") as f:
+                for digest in entry["segments"]:
+                    if digest in available:
+                        block = _read_local_segment(*available[digest])
+                        result.reused_segments += 1
+                    else:
+                        block = fs.cat_file(_segment_path(remote_root, digest))
+                        result.downloaded_segments += 1
+                        result.downloaded_bytes += len(block)
+                    if _sha256(block) != digest:
+                        raise IOError(f"Checksum mismatch in segment {digest} of {relative_path}")
+                    file_hash.update(block)
+                    f.write(block)
+                f.flush()
+                os.fsync(f.fileno())
+            if file_hash.hexdigest() != entry["sha256"] or os.path.getsize(target) != entry["size"]:
+                raise IOError(f"Checksum mismatch for {relative_path}")
+        with open(os.path.join(staging_dir, LOCAL_SNAPSHOT_FILE), "w", encoding="utf-8") as f:
+            json.dump({"version": version, "remote": remote_root}, f)
+    except BaseException:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        raise
+
+    # An interruption between the two renames is undone by _recover_interrupted_swap on the next run
+    previous_dir = local_dir + ".previous"
+    if os.path.exists(local_dir):
+        os.replace(local_dir, previous_dir)
+    os.replace(staging_dir, local_dir)
+    shutil.rmtree(previous_dir, ignore_errors=True)
+    print(f"✅ Vector DB at snapshot {version}: {result.downloaded_segments} segments downloaded "
+          f"({result.downloaded_bytes / 2**20:.1f} MB), {result.reused_segments} reused")
+    return result
+
+
+def main(argv=None):
+    from fsspec.core import url_to_fs
+
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 3 or argv[0] not in ("publish", "pull"):
+        print(__doc__)
+        sys.exit(2)
+    command, source, target = argv
+    if command == "publish":
+        fs, remote_root = url_to_fs(target)
+        publish_snapshot(source, fs, remote_root)
+    else:
+        fs, remote_root = url_to_fs(source)
+        sync_snapshot(fs, remote_root, target)
+
+
+if __name__ == "__main__":
+    main()
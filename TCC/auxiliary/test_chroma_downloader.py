@@ -0,0 +1,138 @@
+# auxiliary/test_chroma_downloader.py
+
+import os
+import json
+import hashlib
+import tempfile
+import unittest
+
+from fsspec.implementations.local import LocalFileSystem
+
+from auxiliary.chroma_downloader import download_if_changed
+
+
+class ETagFileSystem(LocalFileSystem):
+    """Local filesystem that reports an S3‐style MD5 ETag and records reads."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.bytes_read = 0
+        self.opened = 0
+
+    def info(self, path, **kwargs):
+        info = super().info(path, **kwargs)
+        with open(path, "rb") as f:
+            info["ETag"] = '"' + hashlib.md5(f.read()).hexdigest() + '"'
+        return info
+
+    def open(self, path, mode="rb", **kwargs):
+        self.opened += 1
+        handle = super().open(path, mode, **kwargs)
+        fs, read = self, handle.read
+
+        def counting_read(*args):
+            data = read(*args)
+            fs.bytes_read += len(data)
+            return data
+
+        handle.read = counting_read
+        return handle
+
+
+class TestDownloadIfChanged(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.remote = os.path.join(self.tmp.name, "bucket", "chroma.sqlite3")
+        self.local = os.path.join(self.tmp.name, "chroma_db", "chroma.sqlite3")
+        os.makedirs(os.path.dirname(self.remote))
+        self.payload = os.urandom(100_000)
+        with open(self.remote, "wb") as f:
+            f.write(self.payload)
+        self.fs = ETagFileSystem(skip_instance_cache=True)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def read_local(self):
+        with open(self.local, "rb") as f:
+            return f.read()
+
+    def test_downloads_in_chunks_and_skips_when_current(self):
+        self.assertTrue(download_if_changed(self.fs, self.remote, self.local, chunk_size=4096))
+        self.assertEqual(self.read_local(), self.payload)
+        self.assertFalse(os.path.exists(self.local + ".part"))
+
+        self.fs.opened = 0
+        self.assertFalse(download_if_changed(self.fs, self.remote, self.local, chunk_size=4096))
+        self.assertEqual(self.fs.opened, 0)
+
+    def test_skips_after_opening_the_downloaded_db(self):
+        import chromadb
+
+        bucket = os.path.dirname(self.remote)
+        os.remove(self.remote)
+        chromadb.PersistentClient(path=bucket).create_collection("langchain").add(
+            ids=["1"], embeddings=[[0.1, 0.2]], documents=["chunk"])
+        self.assertTrue(download_if_changed(self.fs, self.remote, self.local))
+
+        # Opening the copy writes to it, e.g. when the subject shards are built
+        local_client = chromadb.PersistentClient(path=os.path.dirname(self.local))
+        local_client.create_collection("shard_gri").add(
+            ids=[str(i) for i in range(200)], embeddings=[[i, 1.0] for i in range(200)],
+            documents=["chunk " * 50] * 200)
+        self.assertNotEqual(os.path.getsize(self.local), self.fs.info(self.remote)["size"])
+
+        self.fs.opened = 0
+        self.assertFalse(download_if_changed(self.fs, self.remote, self.local))
+        self.assertEqual(self.fs.opened, 0)
+
+    def test_redownloads_when_remote_changes(self):
+        download_if_changed(self.fs, self.remote, self.local)
+        with open(self.remote, "wb") as f:
+            f.write(b"new database")
+        self.assertTrue(download_if_changed(self.fs, self.remote, self.local))
+        self.assertEqual(self.read_local(), b"new database")
+
+    def test_resumes_partial_download(self):
+        download_if_changed(self.fs, self.remote, self.local)
+        with open(self.local + ".meta.json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        os.remove(self.local)
+        os.remove(self.local + ".meta.json")
+
+        # Simulate an interrupted download of the same remote version
+        with open(self.local + ".part", "wb") as f:
+            f.write(self.payload[:60_000])
+        with open(self.local + ".part.meta.json", "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+
+        self.fs.bytes_read = 0
+        self.assertTrue(download_if_changed(self.fs, self.remote, self.local, chunk_size=4096))
+        self.assertEqual(self.fs.bytes_read, 40_000)
+        self.assertEqual(self.read_local(), self.payload)
+
+    def test_discards_partial_from_other_version(self):
+        os.makedirs(os.path.dirname(self.local))
+        with open(self.local + ".part", "wb") as f:
+            f.write(b"stale bytes")
+        with open(self.local + ".part.meta.json", "w", encoding="utf-8") as f:
+            json.dump({"version": "old", "size": 11}, f)
+
+        self.assertTrue(download_if_changed(self.fs, self.remote, self.local))
+        self.assertEqual(self.read_local(), self.payload)
+
+    def test_checksum_mismatch_keeps_previous_copy(self):
+        download_if_changed(self.fs, self.remote, self.local)
+        with open(self.remote, "wb") as f:
+            f.write(b"x" * 10)
+        corrupt = self.fs.info(self.remote)
+        self.fs.info = lambda path, **kwargs: {**corrupt, "ETag": '"' + "0" * 32 + '"'}
+
+        with self.assertRaises(IOError):
+            download_if_changed(self.fs, self.remote, self.local)
+        self.assertEqual(self.read_local(), self.payload)
+        self.assertFalse(os.path.exists(self.local + ".part"))
+
+
+if __name__ == "__main__":
+    unittest.main()
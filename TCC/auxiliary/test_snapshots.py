@@ -0,0 +1,134 @@
+# auxiliary/test_snapshots.py
+
+import io
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+
+from fsspec.implementations.local import LocalFileSystem
+
+from auxiliary.snapshots import LOCAL_SNAPSHOT_FILE, local_version, publish_snapshot, sync_snapshot
+
+SEGMENT = 4096
+
+
+class CountingFileSystem(LocalFileSystem):
+    """Local filesystem standing in for the remote, counting segment uploads and downloads."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.uploaded = 0
+        self.downloaded = 0
+
+    def pipe_file(self, path, value, **kwargs):
+        if "/segments/" in path:
+            self.uploaded += 1
+        return super().pipe_file(path, value, **kwargs)
+
+    def cat_file(self, path, *args, **kwargs):
+        if "/segments/" in path:
+            self.downloaded += 1
+        return super().cat_file(path, *args, **kwargs)
+
+
+class TestSnapshots(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.source = os.path.join(self.tmp.name, "producer", "chroma_db")
+        self.remote = os.path.join(self.tmp.name, "bucket", "snapshots")
+        self.local = os.path.join(self.tmp.name, "consumer", "chroma_db")
+        self.files = {"chroma.sqlite3": os.urandom(10 * SEGMENT),
+                      "sources.json": b'{"data/tdm/tdm.txt": {"chunks": 3}}',
+                      "0b1c/data_level0.bin": os.urandom(3 * SEGMENT + 100)}
+        self._write(self.source, self.files)
+        self.fs = CountingFileSystem(skip_instance_cache=True)
+        self.output = redirect_stdout(io.StringIO())
+        self.output.__enter__()
+
+    def tearDown(self):
+        self.output.__exit__(None, None, None)
+        self.tmp.cleanup()
+
+    def _write(self, root, files):
+        for name, data in files.items():
+            path = os.path.join(root, *name.split("/"))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(data)
+
+    def _read_tree(self, root):
+        tree = {}
+        for folder, _, names in os.walk(root):
+            for name in names:
+                if name != LOCAL_SNAPSHOT_FILE:
+                    path = os.path.join(folder, name)
+                    with open(path, "rb") as f:
+                        tree[os.path.relpath(path, root).replace(os.sep, "/")] = f.read()
+        return tree
+
+    def test_first_sync_downloads_everything_then_skips(self):
+        manifest = publish_snapshot(self.source, self.fs, self.remote, segment_size=SEGMENT)
+        self.assertEqual(self.fs.uploaded, 15)
+
+        result = sync_snapshot(self.fs, self.remote, self.local)
+        self.assertEqual((result.version, result.changed, result.downloaded_segments), (manifest["version"], True, 15))
+        self.assertEqual(self._read_tree(self.local), self.files)
+        self.assertEqual(local_version(self.local), manifest["version"])
+
+        self.fs.downloaded = 0
+        self.assertFalse(sync_snapshot(self.fs, self.remote, self.local).changed)
+        self.assertEqual(self.fs.downloaded, 0)
+
+    def test_deltas_only_move_changed_segments(self):
+        first = publish_snapshot(self.source, self.fs, self.remote, segment_size=SEGMENT)
+        sync_snapshot(self.fs, self.remote, self.local)
+
+        database = bytearray(self.files["chroma.sqlite3"])
+        database[5 * SEGMENT:5 * SEGMENT + 10] = b"x" * 10  # one page rewritten
+        self.files["chroma.sqlite3"] = bytes(database)
+        self.files["topics.json"] = b'["tdm"]'
+        del self.files["sources.json"]
+        os.remove(os.path.join(self.source, "sources.json"))
+        self._write(self.source, self.files)
+
+        self.fs.uploaded = 0
+        second = publish_snapshot(self.source, self.fs, self.remote, segment_size=SEGMENT)
+        self.assertEqual(second["parent"], first["version"])
+        self.assertEqual(self.fs.uploaded, 2)
+        self.assertEqual(publish_snapshot(self.source, self.fs, self.remote, segment_size=SEGMENT)["version"],
+                         second["version"])
+
+        result = sync_snapshot(self.fs, self.remote, self.local)
+        self.assertEqual((result.downloaded_segments, result.reused_segments), (2, 13))
+        self.assertEqual(self._read_tree(self.local), self.files)
+        self.assertFalse(os.path.exists(self.local + ".staging") or os.path.exists(self.local + ".previous"))
+
+    def test_corrupt_segment_leaves_the_local_copy_untouched(self):
+        first = publish_snapshot(self.source, self.fs, self.remote, segment_size=SEGMENT)
+        sync_snapshot(self.fs, self.remote, self.local)
+        self._write(self.source, {"topics.json": b'["gri"]'})
+        second = publish_snapshot(self.source, self.fs, self.remote, segment_size=SEGMENT)
+
+        digest = second["files"]["topics.json"]["segments"][0]
+        with open(os.path.join(self.remote, "segments", digest[:2], digest), "wb") as f:
+            f.write(b"tampered")
+        with self.assertRaises(IOError):
+            sync_snapshot(self.fs, self.remote, self.local)
+        self.assertEqual(local_version(self.local), first["version"])
+        self.assertNotIn("topics.json", self._read_tree(self.local))
+        self.assertFalse(os.path.exists(self.local + ".staging"))
+
+    def test_interrupted_swap_is_recovered(self):
+        manifest = publish_snapshot(self.source, self.fs, self.remote, segment_size=SEGMENT)
+        sync_snapshot(self.fs, self.remote, self.local)
+        os.replace(self.local, self.local + ".previous")  # crashed between the two renames
+
+        self.fs.downloaded = 0
+        self.assertFalse(sync_snapshot(self.fs, self.remote, self.local).changed)
+        self.assertEqual(self.fs.downloaded, 0)
+        self.assertEqual(local_version(self.local), manifest["version"])
+
+
+if __name__ == "__main__":
+    unittest.main()
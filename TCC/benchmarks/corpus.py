@@ -0,0 +1,56 @@
+import os
+import random
+from typing import List
+
+SUBJECTS = [
+    "teoria_da_mudanca",
+    "mensuracao_de_impacto",
+    "relatorio_de_sustentabilidade",
+    "engajamento_de_stakeholders",
+]
+
+VOCABULARY = (
+    "impacto social ambiental positivo teoria mudança indicador resultado efeito "
+    "monitoramento avaliação relatório sustentabilidade GRI ODS stakeholder engajamento "
+    "organização gestor fundação instituto empresa negócio comunidade território "
+    "estratégia meta objetivo atividade produto insumo evidência dados pesquisa "
+    "governança transparência materialidade cadeia valor clima carbono diversidade"
+).split()
+
+QUESTIONS = [
+    "O que é Teoria da Mudança?",
+    "Como medir impacto social?",
+    "Quais indicadores GRI devo usar no relatório de sustentabilidade?",
+    "Como engajar stakeholders da comunidade?",
+    "Como alinhar a estratégia aos ODS?",
+]
+
+
+def _paragraph(rng: random.Random, words: int) -> str:
+    sentence = [rng.choice(VOCABULARY) for _ in range(words)]
+    return " ".join(sentence).capitalize() + "."
+
+
+def generate_corpus(root: str, files: int, words_per_file: int = 400, seed: int = 42) -> List[str]:
+    """
+    Write a synthetic corpus shaped like config.DATA_DIR: one folder per
+    subject with .txt files inside. Same seed, same corpus.
+    Returns the list of file paths written.
+    """
+    rng = random.Random(seed)
+    paths = []
+    for subject in SUBJECTS:
+        os.makedirs(os.path.join(root, subject), exist_ok=True)
+    for i in range(files):
+        subject = SUBJECTS[i % len(SUBJECTS)]
+        path = os.path.join(root, subject, f"documento_{i:06d}.txt")
+        paragraphs = []
+        remaining = words_per_file
+        while remaining > 0:
+            size = min(remaining, rng.randint(40, 90))
+            paragraphs.append(_paragraph(rng, size))
+            remaining -= size
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n\n".join(paragraphs))
+        paths.append(path)
+    return paths
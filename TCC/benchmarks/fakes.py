@@ -0,0 +1,90 @@
+import re
+import time
+import asyncio
+import hashlib
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+import numpy as np
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    Deterministic, offline stand‐in for OpenAIEmbeddings: every word is hashed
+    into one of `dimensions` buckets (feature hashing), so texts sharing words
+    get similar vectors and the same text always gets the same vector.
+    """
+
+    def __init__(self, dimensions: int = 1536, latency: float = 0.0):
+        self.dimensions = dimensions
+        self.latency = latency
+        self.calls = 0
+        self.texts_embedded = 0
+
+    def _vector(self, text: str) -> List[float]:
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for word in re.findall(r"\w+", text.lower()):
+            digest = hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest()
+            value = int.from_bytes(digest, "little")
+            vector[value % self.dimensions] += 1.0 if value & (1 << 63) else -1.0
+        norm = np.linalg.norm(vector)
+        if norm:
+            vector /= norm
+        return vector.tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        # `latency` simulates the round‐trip to the embedding API
+        time.sleep(self.latency)
+        self.calls += 1
+        self.texts_embedded += len(texts)
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        time.sleep(self.latency)
+        self.calls += 1
+        return self._vector(text)
+
+
+class FakeStreamingChatModel(BaseChatModel):
+    """
+    Offline chat model that streams a canned answer word by word, waiting
+    `first_token_latency` before the first token and `token_latency` between
+    the following ones, so TTFT and tokens/s can be measured without OpenAI.
+    """
+
+    answer: str = "Olá! Esta é uma resposta sintética da IARIS sobre impacto socioambiental positivo."
+    first_token_latency: float = 0.0
+    token_latency: float = 0.0
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-streaming-chat"
+
+    def _tokens(self) -> List[str]:
+        return re.findall(r"\S+\s*", self.answer)
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        self.calls += 1
+        time.sleep(self.first_token_latency + self.token_latency * max(len(self._tokens()) - 1, 0))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.answer))])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        self.calls += 1
+        for i, token in enumerate(self._tokens()):
+            time.sleep(self.first_token_latency if i == 0 else self.token_latency)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+                       **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        self.calls += 1
+        for i, token in enumerate(self._tokens()):
+            await asyncio.sleep(self.first_token_latency if i == 0 else self.token_latency)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
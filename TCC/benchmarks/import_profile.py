@@ -0,0 +1,132 @@
+"""
+Import‐time profile of the app's cold start.
+
+Runs `python -X importtime` on a fresh interpreter (so nothing is cached in
+sys.modules) and reports where startup time goes: total time, the heaviest
+top‐level packages and the slowest individual modules. With --first-use it
+also times the work the lazy startup pushed out of import time (loading
+DocumentDatabase, importing LangGraph and compiling the graphs).
+
+    python -m benchmarks.import_profile
+    python -m benchmarks.import_profile --target model --first-use --top 15
+"""
+import os
+import re
+import sys
+import json
+import argparse
+import subprocess
+from collections import defaultdict
+from typing import Dict, List, NamedTuple
+
+TCC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FIRST_USE_SCRIPT = """
+import json, time
+timings = {}
+started_at = time.perf_counter()
+from model import DocumentDatabase
+timings["import DocumentDatabase"] = time.perf_counter() - started_at
+started_at = time.perf_counter()
+from model.graph_chatbot import get_graph
+timings["import graph_chatbot"] = time.perf_counter() - started_at
+started_at = time.perf_counter()
+get_graph()
+timings["compile graph"] = time.perf_counter() - started_at
+started_at = time.perf_counter()
+get_graph(use_async=True)
+timings["compile async graph"] = time.perf_counter() - started_at
+print(json.dumps(timings))
+"""
+
+_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+class ImportRecord(NamedTuple):
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def parse_importtime(stderr: str) -> List[ImportRecord]:
+    """Parse the `-X importtime` lines (self and cumulative times are in µs)."""
+    records = []
+    for line in stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            records.append(ImportRecord(module, int(self_us), int(cumulative_us), len(indent) // 2))
+    return records
+
+
+def profile_import(target: str) -> List[ImportRecord]:
+    """Import `target` in a fresh interpreter and return its import records."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+        cwd=TCC_DIR, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        tail = [line for line in result.stderr.splitlines() if not line.startswith("import time:")]
+        raise RuntimeError(f"importing {target} failed:\n" + "\n".join(tail[-10:]))
+    return parse_importtime(result.stderr)
+
+
+def profile_first_use() -> Dict[str, float]:
+    """Time the deferred work (DocumentDatabase import, graph compilation) in a fresh interpreter."""
+    result = subprocess.run([sys.executable, "-c", FIRST_USE_SCRIPT], cwd=TCC_DIR, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr[-2000:])
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def summarize(records: List[ImportRecord], top: int) -> Dict:
+    total_us = sum(record.self_us for record in records)
+    by_package = defaultdict(int)
+    for record in records:
+        by_package[record.module.split(".")[0]] += record.self_us
+    packages = sorted(by_package.items(), key=lambda item: item[1], reverse=True)[:top]
+    modules = sorted(records, key=lambda record: record.self_us, reverse=True)[:top]
+    return {
+        "total_ms": round(total_us / 1000, 1),
+        "modules_imported": len(records),
+        "packages": [{"package": name, "self_ms": round(us / 1000, 1)} for name, us in packages],
+        "slowest_modules": [{"module": r.module, "self_ms": round(r.self_us / 1000, 1),
+                             "cumulative_ms": round(r.cumulative_us / 1000, 1)} for r in modules],
+    }
+
+
+def print_report(target: str, report: Dict, first_use: Dict[str, float] = None):
+    print(f"⏱️ import {target}: {report['total_ms']} ms across {report['modules_imported']} modules")
+    print("\n📦 Heaviest packages (self time)")
+    for row in report["packages"]:
+        print(f"  {row['self_ms']:>9.1f} ms  {row['package']}")
+    print("\n🐢 Slowest modules (self / cumulative)")
+    for row in report["slowest_modules"]:
+        print(f"  {row['self_ms']:>9.1f} / {row['cumulative_ms']:>9.1f} ms  {row['module']}")
+    if first_use:
+        print("\n🔁 Deferred to first use")
+        for step, seconds in first_use.items():
+            print(f"  {seconds * 1000:>9.1f} ms  {step}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import-time profile of the IARIS cold start")
+    parser.add_argument("--target", default="main", help="module to import (default: the Streamlit entry point)")
+    parser.add_argument("--top", type=int, default=20, help="rows per table")
+    parser.add_argument("--first-use", action="store_true", help="also time the lazily deferred steps")
+    parser.add_argument("--output", help="write the report as JSON")
+    args = parser.parse_args(argv)
+
+    report = summarize(profile_import(args.target), args.top)
+    first_use = profile_first_use() if args.first_use else None
+    print_report(args.target, report, first_use)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"target": args.target, **report, "first_use": first_use}, f, ensure_ascii=False, indent=4)
+        print(f"✅ Import profile saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,322 @@
+"""
+Offline benchmark suite for ingestion, retrieval and end‐to‐end RAG.
+
+Everything runs locally: embeddings come from HashingEmbeddings, answers from
+FakeStreamingChatModel and documents from a synthetic corpus shaped like
+config.DATA_DIR, so results are comparable from run to run.
+
+    python -m benchmarks.run_benchmarks --output benchmark_results.json
+    python -m benchmarks.run_benchmarks --quick --baseline benchmark_results.json
+"""
+import gc
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+from contextlib import ExitStack
+from typing import Dict, List, Optional
+from unittest.mock import patch
+
+import numpy as np
+from langchain_chroma import Chroma
+from langchain_core.prompts import PromptTemplate
+
+import config
+from model.document_database import DocumentDatabase
+from model.metrics import MetricsRecorder
+from model.graph_chatbot import retrieve_chunks
+from model.lexical_index import RETRIEVAL_MODES
+from model.vector_index import CompactVectorIndex, catalog_fingerprint
+from benchmarks.corpus import QUESTIONS, SUBJECTS, generate_corpus
+from benchmarks.fakes import FakeStreamingChatModel, HashingEmbeddings
+
+PROMPT = PromptTemplate.from_template(
+    "Você é a IARIS.\n\n## O usuário te perguntou: \"{question}\"\n## Documento: \"{context}\""
+)
+
+
+def _percentiles(samples: List[float]) -> Dict[str, float]:
+    values = np.asarray(samples) * 1000
+    return {
+        "p50_ms": round(float(np.percentile(values, 50)), 3),
+        "p95_ms": round(float(np.percentile(values, 95)), 3),
+        "mean_ms": round(float(values.mean()), 3),
+    }
+
+
+def build_database(corpus_dir: str, persist_dir: str, embeddings, llm) -> DocumentDatabase:
+    """Build a DocumentDatabase from scratch in `persist_dir`."""
+    with ExitStack() as stack:
+        stack.enter_context(patch.object(config, "ANSWER_CACHE_ENABLED", False))
+        stack.enter_context(patch.object(config, "METRICS_ENABLED", False))
+        db = DocumentDatabase(chroma_db=None, file_path=corpus_dir, prompt_template=PROMPT, retriever_k=4,
+                              filter_list=[], embeddings=embeddings, llm=llm, persist_directory=persist_dir)
+    db.metrics = MetricsRecorder(jsonl_path="")
+    return db
+
+
+def bench_ingestion(db_factory, files: int, words_per_file: int, workdir: str) -> Dict:
+    corpus_dir = os.path.join(workdir, "data")
+    generate_corpus(corpus_dir, files=files, words_per_file=words_per_file)
+    started_at = time.perf_counter()
+    db = db_factory(corpus_dir, os.path.join(workdir, "chroma_db"))
+    elapsed = time.perf_counter() - started_at
+    chunks = db.vectorstore._collection.count()
+    return db, {
+        "files": files,
+        "chunks": chunks,
+        "seconds": round(elapsed, 3),
+        "files_per_second": round(files / elapsed, 2),
+        "chunks_per_second": round(chunks / elapsed, 2),
+    }
+
+
+def bench_retrieval(db: DocumentDatabase, ks: List[int], repeats: int, modes: List[str]) -> List[Dict]:
+    """
+    Latency of the graph's retrieval node per retrieval mode and k, over the
+    whole corpus and filtered to one subject (searched through its shard).
+    """
+    results = []
+    for filter_list in ([], SUBJECTS[:1]):
+        for mode in modes:
+            for k in ks:
+                state = {"query": QUESTIONS[0], "retriever_k": k, "vectorstore": db.vectorstore,
+                         "lexical_index": db.lexical_index, "shards": db.shards,
+                         "retrieval_mode": mode, "filter_list": filter_list}
+                retrieve_chunks(state)  # warm‐up
+                samples = []
+                for i in range(repeats):
+                    state["query"] = QUESTIONS[i % len(QUESTIONS)]
+                    started_at = time.perf_counter()
+                    retrieve_chunks(state)
+                    samples.append(time.perf_counter() - started_at)
+                results.append({"mode": mode, "filter": ",".join(filter_list), "retriever_k": k,
+                                "queries": repeats, **_percentiles(samples)})
+    return results
+
+
+def _rss_bytes() -> Optional[int]:
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return psutil.Process().memory_info().rss
+
+
+def _dir_bytes(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, files in os.walk(path) for name in files)
+
+
+def bench_vector_backends(db: DocumentDatabase, workdir: str, k: int, repeats: int, pca_dims: int) -> List[Dict]:
+    """
+    Chroma vs. the compact vector index on the same collection: load time
+    (open + first query), resident memory it adds (needs psutil), size on
+    disk and search latency, with the queries embedded beforehand.
+    """
+    persist_dir = db.vectorstore._client.get_settings().persist_directory
+    vectors = db.embeddings.embed_documents([QUESTIONS[i % len(QUESTIONS)] for i in range(repeats)])
+    fingerprint = catalog_fingerprint(db.sources.entries)
+
+    def measure(backend: str, open_store, search, directory: str) -> Dict:
+        gc.collect()
+        rss_before = _rss_bytes()
+        started_at = time.perf_counter()
+        store = open_store()
+        search(store, vectors[0])
+        load_seconds = time.perf_counter() - started_at
+        samples = []
+        for vector in vectors:
+            started_at = time.perf_counter()
+            search(store, vector)
+            samples.append(time.perf_counter() - started_at)
+        rss_after = _rss_bytes()
+        return {"backend": backend, "retriever_k": k, "queries": repeats,
+                "load_ms": round(load_seconds * 1000, 3),
+                "rss_mb": round((rss_after - rss_before) / 2**20, 1) if rss_before is not None else None,
+                "disk_mb": round(_dir_bytes(directory) / 2**20, 2),
+                **_percentiles(samples)}
+
+    results = []
+    for dtype, pca in (("float16", None), ("int8", None), ("float16", pca_dims)):
+        with patch.object(config, "VECTOR_INDEX_DTYPE", dtype), patch.object(config, "VECTOR_INDEX_PCA_DIMS", pca):
+            directory = CompactVectorIndex.for_vectorstore(db.vectorstore, fingerprint).directory
+        results.append(measure(f"compact-{dtype}" + (f"-pca{pca}" if pca else ""),
+                               lambda: CompactVectorIndex.load(directory, db.embeddings),
+                               lambda store, vector: store.search_by_vectors([vector], k), directory))
+
+    # A copy, so Chroma cannot reuse the HNSW index the benchmark database already loaded
+    chroma_dir = os.path.join(workdir, "chroma_copy")
+    shutil.copytree(persist_dir, chroma_dir, ignore=shutil.ignore_patterns("vector_index"))
+    results.append(measure("chroma", lambda: Chroma(persist_directory=chroma_dir, embedding_function=db.embeddings),
+                           lambda store, vector: store.similarity_search_by_vector(vector, k), chroma_dir))
+    return results
+
+
+def bench_end_to_end(db: DocumentDatabase, repeats: int) -> Dict:
+    ttfts, totals = [], []
+    for i in range(repeats):
+        response = db.run_rag(QUESTIONS[i % len(QUESTIONS)], messages=[])
+        for _ in response["rag_stream"]:
+            pass
+        ttfts.append(response["metrics"].ttft)
+        totals.append(response["metrics"].total_latency)
+    return {
+        "queries": repeats,
+        "ttft": _percentiles(ttfts),
+        "total": _percentiles(totals),
+    }
+
+
+def bench_batch(db: DocumentDatabase, queries: int, max_concurrency: int) -> Dict:
+    """An evaluation run answered one `run_rag` at a time vs. with `run_rag_batch`."""
+    questions = [QUESTIONS[i % len(QUESTIONS)] for i in range(queries)]
+    started_at = time.perf_counter()
+    for question in questions:
+        db.run_rag(question, messages=[], stream=False)
+    sequential = time.perf_counter() - started_at
+
+    started_at = time.perf_counter()
+    db.run_rag_batch(questions, max_concurrency=max_concurrency)
+    batch = time.perf_counter() - started_at
+    return {
+        "queries": queries,
+        "max_concurrency": max_concurrency,
+        "sequential_seconds": round(sequential, 3),
+        "batch_seconds": round(batch, 3),
+        "speedup": round(sequential / batch, 2) if batch else None,
+    }
+
+
+def run(args) -> Dict:
+    embeddings = HashingEmbeddings(dimensions=args.dimensions, latency=args.embedding_latency)
+    llm = FakeStreamingChatModel(first_token_latency=args.first_token_latency, token_latency=args.token_latency)
+
+    def db_factory(corpus_dir, persist_dir):
+        return build_database(corpus_dir, persist_dir, embeddings, llm)
+
+    results = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "params": vars(args),
+        },
+        "ingestion": [],
+        "retrieval": [],
+        "end_to_end": None,
+        "batch": None,
+        "vector_backends": [],
+    }
+
+    with ExitStack() as stack:
+        stack.enter_context(patch.object(config, "INGEST_REQUESTS_PER_SECOND", args.requests_per_second))
+        largest_db = largest_workdir = None
+        for files in args.corpus_sizes:
+            workdir = stack.enter_context(tempfile.TemporaryDirectory())
+            print(f"📚 Corpus with {files} files")
+            db, ingestion = bench_ingestion(db_factory, files, args.words_per_file, workdir)
+            results["ingestion"].append(ingestion)
+            for row in bench_retrieval(db, args.ks, args.repeats, args.modes):
+                results["retrieval"].append({"chunks": ingestion["chunks"], **row})
+            largest_db, largest_workdir = db, workdir
+        results["vector_backends"] = [{"chunks": ingestion["chunks"], **row} for row in bench_vector_backends(
+            largest_db, largest_workdir, max(args.ks), args.repeats, args.pca_dims)]
+        results["end_to_end"] = bench_end_to_end(largest_db, args.repeats)
+        results["batch"] = bench_batch(largest_db, args.repeats, args.batch_concurrency)
+    return results
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """List the measurements that got worse than the baseline by more than `tolerance`."""
+    regressions = []
+
+    def check(name, current, previous, higher_is_better):
+        if previous is None or current is None or previous == 0:
+            return
+        change = (current - previous) / previous
+        if (-change if higher_is_better else change) > tolerance:
+            regressions.append(f"{name}: {previous} → {current} ({change:+.0%})")
+
+    old_ingestion = {row["files"]: row for row in baseline.get("ingestion", [])}
+    for row in results["ingestion"]:
+        old = old_ingestion.get(row["files"], {})
+        check(f"ingestion[{row['files']} files].chunks_per_second", row["chunks_per_second"],
+              old.get("chunks_per_second"), True)
+
+    def retrieval_key(row):
+        # Baselines from before retrieval modes only measured vector search
+        return row["chunks"], row["retriever_k"], row.get("mode", "vector"), row.get("filter", "")
+
+    old_retrieval = {retrieval_key(row): row for row in baseline.get("retrieval", [])}
+    for row in results["retrieval"]:
+        old = old_retrieval.get(retrieval_key(row), {})
+        scope = f"{row['mode']}, {row['filter'] or 'all subjects'}"
+        check(f"retrieval[{row['chunks']} chunks, {scope}, k={row['retriever_k']}].p95_ms", row["p95_ms"],
+              old.get("p95_ms"), False)
+
+    old_backends = {(row["chunks"], row["backend"]): row for row in baseline.get("vector_backends", [])}
+    for row in results.get("vector_backends", []):
+        old = old_backends.get((row["chunks"], row["backend"]), {})
+        check(f"vector_backends[{row['chunks']} chunks, {row['backend']}].p95_ms", row["p95_ms"],
+              old.get("p95_ms"), False)
+
+    old_e2e = baseline.get("end_to_end") or {}
+    check("end_to_end.ttft.p95_ms", results["end_to_end"]["ttft"]["p95_ms"],
+          old_e2e.get("ttft", {}).get("p95_ms"), False)
+    if results.get("batch"):
+        check("batch.batch_seconds", results["batch"]["batch_seconds"],
+              (baseline.get("batch") or {}).get("batch_seconds"), False)
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline IARIS RAG benchmarks")
+    parser.add_argument("--corpus-sizes", type=int, nargs="+", default=[100, 500, 2000],
+                        help="number of .txt files per synthetic corpus")
+    parser.add_argument("--words-per-file", type=int, default=400)
+    parser.add_argument("--ks", type=int, nargs="+", default=[1, 4, 10], help="retriever_k values")
+    parser.add_argument("--modes", nargs="+", default=list(RETRIEVAL_MODES), choices=RETRIEVAL_MODES,
+                        help="retrieval modes to measure")
+    parser.add_argument("--repeats", type=int, default=50, help="queries per measurement")
+    parser.add_argument("--dimensions", type=int, default=1536, help="fake embedding size")
+    parser.add_argument("--pca-dims", type=int, default=256, help="PCA size of the reduced compact vector index")
+    parser.add_argument("--embedding-latency", type=float, default=0.0, help="seconds per embedding call")
+    parser.add_argument("--first-token-latency", type=float, default=0.3)
+    parser.add_argument("--token-latency", type=float, default=0.01)
+    parser.add_argument("--batch-concurrency", type=int, default=config.BATCH_MAX_CONCURRENCY,
+                        help="concurrent generations in the batch benchmark")
+    parser.add_argument("--requests-per-second", type=float, default=1000)
+    parser.add_argument("--quick", action="store_true", help="small corpus and few repeats, for CI")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", help="earlier results JSON to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown vs. baseline (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+    if args.quick:
+        args.corpus_sizes, args.repeats = [50, 200], 10
+        args.first_token_latency, args.token_latency = 0.05, 0.001
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = run(args)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=4)
+    print(f"✅ Benchmark results saved to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"❌ Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+        print("✅ No regressions against baseline.")
+
+
+if __name__ == "__main__":
+    main()
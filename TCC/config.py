@@ -1,4 +1,58 @@
 
 PERSIST_DIRECTORY = "./chroma_db"
 TOPICS_FILE = PERSIST_DIRECTORY + "/topics.json"
-DATA_DIR = "./data/IARIS_DATA"
\ No newline at end of file
+MANIFEST_FILE = PERSIST_DIRECTORY + "/manifest.json"
+DATA_DIR = "./data/IARIS_DATA"
+# Folder inside the dataset zip that holds the subject folders (DATA_DIR once extracted)
+ARCHIVE_PREFIX = "IARIS_DATA/"
+EMBEDDING_CACHE_PATH = "./embedding_cache/embeddings.sqlite3"
+EMBEDDING_LRU_SIZE = 10000
+INGEST_BATCH_SIZE = 64
+INGEST_MAX_CONCURRENCY = 4
+INGEST_REQUESTS_PER_SECOND = 10
+INGEST_TOKENS_PER_SECOND = None
+INGEST_MAX_RETRIES = 5
+INGEST_QUEUE_SIZE = 256
+INGEST_PROGRESS_INTERVAL = 5
+ANSWER_CACHE_ENABLED = True
+ANSWER_CACHE_SIMILARITY = 0.95
+ANSWER_CACHE_TTL = 24 * 60 * 60
+ANSWER_CACHE_MAX_ENTRIES = 1000
+METRICS_ENABLED = True
+METRICS_JSONL_PATH = "./metrics/rag_metrics.jsonl"
+METRICS_LOG_QUERIES = False
+METRICS_PORT = None
+DOWNLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+RETRIEVAL_MODE = "vector"
+HYBRID_CANDIDATES = 20
+RRF_K = 60
+SUBJECT_SHARDS_ENABLED = True
+SHARD_SEARCH_WORKERS = 8
+CONTEXT_TOKEN_BUDGET = 3000
+CONTEXT_DEDUP_THRESHOLD = 0.9
+MEMORY_RECENT_TURNS = 2
+MEMORY_TURN_TOKENS = 400
+MEMORY_SUMMARY_TOKENS = 300
+MEMORY_SUMMARY_WORKERS = 4
+PROMPT_CACHE_SIZE = 32
+BATCH_QUERY_SIZE = 64
+BATCH_MAX_CONCURRENCY = 8
+API_DEFAULT_K = 4
+API_MAX_K = 10
+DEFAULT_CORPUS = "iaris"
+STORES_DIRECTORY = "./stores"
+STORE_REGISTRY_MAX_BYTES = 4 * 1024 ** 3
+STORE_BYTES_PER_CHUNK = 8 * 1024
+OPENAI_MAX_CONNECTIONS = 20
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = 10
+OPENAI_KEEPALIVE_EXPIRY = 60
+OPENAI_CONNECT_TIMEOUT = 5
+OPENAI_READ_TIMEOUT = 60
+OPENAI_POOL_TIMEOUT = 10
+OPENAI_MAX_RETRIES = 2
+OPENAI_HTTP2 = True
+VECTOR_BACKEND = "chroma"
+VECTOR_INDEX_DTYPE = "int8"
+VECTOR_INDEX_PCA_DIMS = None
+VECTOR_INDEX_BLOCK_ROWS = 65536
+SNAPSHOT_SEGMENT_SIZE = 1024 * 1024
@@ -1,5 +1,9 @@
-from model import DocumentDatabase
+from typing import TYPE_CHECKING
+
 from view import ChatView  # assuming chat_view.py lives under view/
+
+if TYPE_CHECKING:  # the real import is deferred until main() builds the model
+    from model import DocumentDatabase
 # from document_database import DocumentDatabase
 
 
@@ -8,23 +12,30 @@ class ChatController:
     Orchestrates between Streamlit (ChatView) and our LangGraph‐powered DocumentDatabase.
     """
 
-    def __init__(self, db: DocumentDatabase, view: ChatView):
+    def __init__(self, db: "DocumentDatabase", view: ChatView):
         self.db = db
         self.view = view
         self.last_input = ""
         self.history = []
         self.messages = []
         self.retriever_k = self.view.retriever_k
+        self.retrieval_mode = self.view.retrieval_mode
         self.prompt = self.view.get_edited_prompt()
         self.filters = self.view.get_search_filters()
-        self.user_edited_prompt = self.view.get_edited_prompt()
-        self._update_query()
+        self.user_edited_prompt = self.prompt
 
 
-    def _update_query(self):
-        self.db.prompt_template = self.prompt
-        self.db.retriever_k = self.retriever_k
-        self.db.filter_list = self.filters
+    def _request_overrides(self) -> dict:
+        """
+        This session's search settings, passed along with each question: the
+        DocumentDatabase is shared by every session, so they are never set on it.
+        """
+        return {
+            "prompt_template": self.user_edited_prompt,
+            "retriever_k": self.retriever_k,
+            "retrieval_mode": self.retrieval_mode,
+            "filter_list": self.filters,
+        }
 
 
     def run(self, debug: bool = False):
@@ -38,7 +49,8 @@ class ChatController:
             user_input = self.view.get_text()
             self.user_edited_prompt = self.view.get_edited_prompt()
             self.retriever_k = self.view.retriever_k
-            self.filter_dict = {"filters": self.view.get_search_filters()}
+            self.retrieval_mode = self.view.retrieval_mode
+            self.filters = self.view.get_search_filters()
             chat_history = self.view.generate_context()
             if chat_history is not []:
                 # print("Chat has history")
@@ -50,7 +62,8 @@ class ChatController:
                 # Ask our LangGraph‐powered RAG engine to stream an answer:
                 rag_response = self.db.run_rag(
                     query=user_input,
-                    messages=self.messages
+                    messages=self.messages,
+                    **self._request_overrides()
                 )
                 # Hand that off to the view for display:
                 self.view.display(responses=rag_response)
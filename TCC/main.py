@@ -2,45 +2,55 @@
 import sys
 # sys.modules['sqlite3'] = sys.modules.pop('pysqlite3')
 
-from model import DocumentDatabase
 from view import *
-from auxiliary import document_loader, vector_db_loader
+from auxiliary import document_loader, vector_db_loader, chroma_downloader, snapshots
 from controller import ChatController
 import subprocess
 import streamlit as st
 from st_files_connection import FilesConnection
-from langchain_chroma import Chroma
 import os
-from langchain_openai import OpenAIEmbeddings
+import config
+from model.embedding_cache import get_cached_embeddings
+from model.metrics import start_metrics_server
+from model.store_registry import get_store_registry
 
 
 @st.cache_resource
 def get_chroma_db():
-    """Downloads the ChromaDB SQLite database from S3 and stores it in a folder."""
+    """
+    Syncs the vector database from S3 into a local folder and opens it: the
+    latest snapshot under S3_CHROMADB_SNAPSHOT (only its changed segments are
+    downloaded), or else the single SQLite file at S3_CHROMADB_KEY.
+    """
     
     S3_CHROMADB_KEY = os.getenv("S3_CHROMADB_KEY")
+    S3_CHROMADB_SNAPSHOT = os.getenv("S3_CHROMADB_SNAPSHOT")
     LOCAL_DB_FOLDER = "chroma_db"
     LOCAL_DB_PATH = os.path.join(LOCAL_DB_FOLDER, "chroma.sqlite3")
 
-    os.makedirs(LOCAL_DB_FOLDER, exist_ok=True)  # Ensure folder exists
-
-    print("📥 Downloading ChromaDB from S3...")
-
     s3 = st.connection('s3', type=FilesConnection)
-    # Open S3 file and read its contents
-    with s3.open(S3_CHROMADB_KEY, mode="rb") as downloaded_file:
-        file_data = downloaded_file.read()  # Read as bytes
-    
-    # Write the file to the local directory
-    with open(LOCAL_DB_PATH, "wb") as f:
-        f.write(file_data)
+    if S3_CHROMADB_SNAPSHOT:
+        snapshots.sync_snapshot(s3.fs, S3_CHROMADB_SNAPSHOT, LOCAL_DB_FOLDER)
+    else:
+        os.makedirs(LOCAL_DB_FOLDER, exist_ok=True)  # Ensure folder exists
+        # Streamed in chunks, skipped when the ETag matches, resumed after a partial download
+        chroma_downloader.download_if_changed(s3.fs, S3_CHROMADB_KEY, LOCAL_DB_PATH)
 
     print("✅ ChromaDB Loaded from Cache!")
-    return Chroma(persist_directory=LOCAL_DB_FOLDER, embedding_function=OpenAIEmbeddings())
+    from langchain_chroma import Chroma
+    return Chroma(persist_directory=LOCAL_DB_FOLDER, embedding_function=get_cached_embeddings())
+
+@st.cache_resource
+def get_metrics_server():
+    """Starts the Prometheus /metrics endpoint once per process, if a port is configured."""
+    if config.METRICS_PORT:
+        return start_metrics_server(config.METRICS_PORT)
+    return None
 
 def main():
 
     st.set_page_config(layout="wide", initial_sidebar_state="collapsed")
+    get_metrics_server()
     
     # Load the database once and use it persistently
     # chroma_db = get_chroma_db()
@@ -48,12 +58,18 @@ def main():
 
     view = ChatView(file_path="")
 
+    # The corpus is opened once per process and shared by every session and rerun;
+    # heavy LangChain/Chroma imports happen there, after the page has rendered
+    registry = get_store_registry()
+    registry.register(config.DEFAULT_CORPUS, r"C:\Users\alexf\TCC\GISIA\data\IARIS_DATA", config.PERSIST_DIRECTORY,
+                      chroma_db=chroma_db)
+
     # Initialize MVC components
-    model = DocumentDatabase(chroma_db=chroma_db, file_path=r"C:\Users\alexf\TCC\GISIA\data\IARIS_DATA")
-    controller = ChatController(model, view)
+    with registry.acquire(config.DEFAULT_CORPUS) as model:
+        controller = ChatController(model, view)
 
-    # Run the chat interface
-    controller.run()
+        # Run the chat interface
+        controller.run()
 
 # Run the app
 if __name__ == "__main__":
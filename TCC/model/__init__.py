@@ -1,2 +1,18 @@
-from model.document_database import DocumentDatabase
-from model.url_database import WebDatabase
\ No newline at end of file
+# Exports are resolved on first access, so `import model` (and submodules like
+# model.metrics) do not pull in LangChain, Chroma and OpenAI until needed.
+_EXPORTS = {
+    "DocumentDatabase": "model.document_database",
+    "WebDatabase": "model.url_database",
+}
+
+
+def __getattr__(name: str):
+    if name in _EXPORTS:
+        import importlib
+        value = getattr(importlib.import_module(_EXPORTS[name]), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+__all__ = list(_EXPORTS)
@@ -0,0 +1,131 @@
+import re
+import time
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Iterator, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.prompts import PromptTemplate
+
+import config
+from model.embedding_cache import get_cached_embeddings
+from model.prompt_cache import prompt_hash
+
+
+@dataclass
+class CachedAnswer:
+    query: str
+    key: str
+    vector: np.ndarray
+    answer: str
+    sources: List[str]
+    created_at: float
+
+
+def replay_tokens(text: str) -> Iterator[str]:
+    """Split a stored answer back into word‐sized tokens so the UI can stream it."""
+    for match in re.finditer(r"\S+\s*|\s+", text):
+        yield match.group()
+
+
+class AnswerCache:
+    """
+    Semantic cache of finished RAG answers:
+      • entries are grouped by a key made of the corpus, the prompt
+        template hash, retriever_k and the active subject filters, so
+        another corpus, an edited prompt or a different k never serves a
+        stale answer,
+      • within a key, a new query hits when the cosine similarity of its
+        embedding with a past query is above `threshold`,
+      • entries expire after `ttl` seconds and the least recently used are
+        evicted beyond `max_entries`.
+    """
+
+    def __init__(self, embeddings: Embeddings = None, threshold: float = None,
+                 ttl: float = None, max_entries: int = None):
+        self.embeddings = embeddings if embeddings is not None else get_cached_embeddings()
+        self.threshold = threshold if threshold is not None else config.ANSWER_CACHE_SIMILARITY
+        self.ttl = ttl if ttl is not None else config.ANSWER_CACHE_TTL
+        self.max_entries = max_entries or config.ANSWER_CACHE_MAX_ENTRIES
+        self._entries: "OrderedDict[int, CachedAnswer]" = OrderedDict()
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def corpus_id(corpus: str) -> str:
+        return prompt_hash(corpus)[:16]
+
+    @staticmethod
+    def make_key(prompt_template: Optional[PromptTemplate], retriever_k: int, filter_list: List[str] = None,
+                 retrieval_mode: str = "vector", corpus: str = "") -> str:
+        """`corpus` identifies the store the answer came from (its persist directory)."""
+        template = prompt_template.template if prompt_template is not None else ""
+        filters = ",".join(sorted(filter_list or []))
+        return f"{AnswerCache.corpus_id(corpus)}:{prompt_hash(template)}:{retriever_k}:{filters}:{retrieval_mode}"
+
+    def _embed(self, query: str) -> np.ndarray:
+        vector = np.asarray(self.embeddings.embed_query(query), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _expire(self, now: float):
+        expired = [entry_id for entry_id, entry in self._entries.items() if now - entry.created_at > self.ttl]
+        for entry_id in expired:
+            del self._entries[entry_id]
+
+    def lookup(self, query: str, key: str) -> Optional[CachedAnswer]:
+        vector = self._embed(query)
+        with self._lock:
+            self._expire(time.time())
+            candidates = [(entry_id, entry) for entry_id, entry in self._entries.items() if entry.key == key]
+            if candidates:
+                similarities = np.stack([entry.vector for _, entry in candidates]) @ vector
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    entry_id, entry = candidates[best]
+                    self._entries.move_to_end(entry_id)
+                    self.hits += 1
+                    return entry
+            self.misses += 1
+            return None
+
+    def store(self, query: str, key: str, answer: str, sources: List[str]):
+        if not answer:
+            return
+        entry = CachedAnswer(query=query, key=key, vector=self._embed(query), answer=answer,
+                             sources=list(sources), created_at=time.time())
+        with self._lock:
+            self._entries[self._next_id] = entry
+            self._next_id += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self, corpus: str = None):
+        """Drop every entry, or only those answered from `corpus` (after its index changed)."""
+        with self._lock:
+            if corpus is None:
+                self._entries.clear()
+                return
+            prefix = f"{self.corpus_id(corpus)}:"
+            for entry_id in [entry_id for entry_id, entry in self._entries.items() if entry.key.startswith(prefix)]:
+                del self._entries[entry_id]
+
+
+_default_cache: Optional[AnswerCache] = None
+_default_lock = threading.Lock()
+
+
+def get_answer_cache() -> AnswerCache:
+    """Process‐wide answer cache, shared by every Streamlit session."""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = AnswerCache()
+        return _default_cache
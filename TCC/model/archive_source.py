@@ -0,0 +1,77 @@
+import os
+import zipfile
+import hashlib
+import posixpath
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+# Written by macOS archivers next to every file, never documents of ours
+SKIPPED_FOLDERS = ("__MACOSX",)
+
+
+def is_archive(file_path) -> bool:
+    return isinstance(file_path, str) and os.path.isfile(file_path) and zipfile.is_zipfile(file_path)
+
+
+def _parts(prefix: str) -> List[str]:
+    return [part for part in (prefix or "").split("/") if part]
+
+
+def archive_folder(archive_path: str, prefix: str = "") -> str:
+    """
+    Where the data folder `prefix` (e.g. "IARIS_DATA/") of the archive would
+    be once extracted next to it: the folder directory ingestion walks, which
+    sources and subjects are named after.
+    """
+    return os.path.join(os.path.dirname(archive_path), *_parts(prefix))
+
+
+def archive_members(archive: zipfile.ZipFile, folder: str, prefix: str = "") -> Dict[str, zipfile.ZipInfo]:
+    """
+    The .txt members of `archive` under `prefix`, keyed by the path they
+    would have once extracted into `folder`, so sources and subjects match a
+    walk of the extracted data folder. Read from the central directory only.
+    Raises ValueError when the archive has documents but none under `prefix`.
+    """
+    prefix_parts = _parts(prefix)
+    members, outside = {}, 0
+    for info in archive.infolist():
+        name = posixpath.normpath(info.filename)
+        parts = name.split("/")
+        if info.is_dir() or not name.endswith(".txt") or parts[0] in SKIPPED_FOLDERS:
+            continue
+        if name.startswith(("/", "../")) or ".." in parts:
+            print(f"⚠️ Skipping archive member outside the archive root: {info.filename}")
+            continue
+        if parts[:len(prefix_parts)] != prefix_parts or len(parts) == len(prefix_parts):
+            outside += 1
+            continue
+        members[os.path.join(folder, *parts[len(prefix_parts):])] = info
+    if outside and not members:
+        # Indexing nothing would make a sync drop the whole corpus
+        raise ValueError(f"No .txt members under {prefix!r} in the archive; check the archive prefix")
+    return members
+
+
+def subject_of(source: str, folder: str) -> Optional[str]:
+    """Subject folder of a member: its first folder below the data folder, as `os.scandir(folder)` would list it."""
+    parts = os.path.relpath(source, folder or ".").split(os.sep)
+    return os.path.join(folder, parts[0]) if len(parts) > 1 else None
+
+
+def iter_archive_documents(archive: zipfile.ZipFile, members: Dict[str, zipfile.ZipInfo],
+                           folder: str) -> Iterator[Tuple[Document, str]]:
+    """
+    (document, sha256) for each member, decompressed one at a time from the
+    archive: only the member being read is ever held in memory, and nothing
+    is written to disk.
+    """
+    for source, info in members.items():
+        with archive.open(info) as f:
+            data = f.read()
+        metadata = {"source": source}
+        subject = subject_of(source, folder)
+        if subject is not None:
+            metadata["subject"] = subject
+        yield Document(page_content=data.decode("utf-8"), metadata=metadata), hashlib.sha256(data).hexdigest()
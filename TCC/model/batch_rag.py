@@ -0,0 +1,145 @@
+import os
+import json
+import time
+import asyncio
+from typing import IO, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.documents import Document
+
+import config
+from model.graph_chatbot import collect_sources, format_context
+from model.lexical_index import reciprocal_rank_fusion
+from model.prompt_cache import get_rag_chain
+from model.subject_shards import query_collection, subject_where
+from model.tokens import count_tokens
+
+
+class BatchRAGRunner:
+    """
+    Answers a list of questions with one DocumentDatabase's store and model
+    and the run's `settings` (prompt, k, filters, retrieval mode, as given by
+    `DocumentDatabase._request_settings`), for offline evaluation runs:
+      1. the questions are embedded in batches of `batch_size`, one call each,
+      2. the vector searches of a batch go to Chroma as one multi‐query
+         (to the selected subject shards when filtered, or filtered on the
+         chunks' subject without shards), or to the compact vector index as
+         one matrix product,
+      3. generations run concurrently, at most `max_concurrency` at a time,
+         starting as soon as their batch is retrieved,
+      4. each result is appended to the JSONL output as soon as it is done.
+    Questions are answered without chat history and bypass the answer cache,
+    so a run after a corpus update measures fresh answers.
+    """
+
+    def __init__(self, db, settings: Dict = None, max_concurrency: int = None, batch_size: int = None):
+        self.db = db
+        self.settings = settings or db._request_settings()
+        self.max_concurrency = max_concurrency or config.BATCH_MAX_CONCURRENCY
+        self.batch_size = batch_size or config.BATCH_QUERY_SIZE
+        self.mode = self.settings["retrieval_mode"] if db.lexical_index is not None else "vector"
+
+    def _vector_search(self, queries: List[str], k: int, timings: Dict[str, float]) -> List[List[Document]]:
+        filter_list = self.settings["filter_list"]
+        started_at = time.perf_counter()
+        vectors = self.db.vectorstore.embeddings.embed_documents(queries)
+        timings["embed_batch"] = time.perf_counter() - started_at
+
+        started_at = time.perf_counter()
+        if self.db.vector_index is not None:
+            results = [[doc for _, doc in hits]
+                       for hits in self.db.vector_index.search_by_vectors(vectors, k, filter_list)]
+        elif filter_list and self.db.shards is not None:
+            results = self.db.shards.search_by_vectors(vectors, filter_list, k)
+        elif filter_list:
+            # No shards: Chroma filters on the chunks' subject folders
+            subjects = self.db.sources.subjects_for(filter_list)
+            hits = query_collection(self.db.vectorstore, vectors, k, subject_where(subjects)) if subjects \
+                else [[] for _ in vectors]
+            results = [[doc for _, doc in query_hits] for query_hits in hits]
+        else:
+            results = [[doc for _, doc in hits] for hits in query_collection(self.db.vectorstore, vectors, k)]
+        timings["vector_search_batch"] = time.perf_counter() - started_at
+        return results
+
+    def _retrieve(self, queries: List[str]) -> Tuple[List[List[Document]], Dict[str, float]]:
+        """Chunks for each query of one batch, plus the batch's shared timings."""
+        started_at = time.perf_counter()
+        timings: Dict[str, float] = {}
+        k, filter_list = self.settings["retriever_k"], self.settings["filter_list"]
+        if self.mode == "lexical":
+            results = [self.db.lexical_index.search_documents(self.db.vectorstore, query, k, filter_list)
+                       for query in queries]
+        elif self.mode == "hybrid":
+            candidates = max(k, config.HYBRID_CANDIDATES)
+            vector_results = self._vector_search(queries, candidates, timings)
+            results = [reciprocal_rank_fusion(
+                [vector_docs, self.db.lexical_index.search_documents(self.db.vectorstore, query, candidates,
+                                                                     filter_list)],
+                k, config.RRF_K) for query, vector_docs in zip(queries, vector_results)]
+        else:
+            results = self._vector_search(queries, k, timings)
+        timings["retrieve_batch"] = time.perf_counter() - started_at
+        return results, timings
+
+    async def _answer(self, index: int, query: str, chunks: Optional[List[Document]], batch_timings: Dict[str, float],
+                      semaphore: asyncio.Semaphore, output: Optional[IO]) -> Dict:
+        queued_at = time.perf_counter()
+        record = {"index": index, "query": query, "answer": None, "sources": [], "context_tokens": 0,
+                  "context_tokens_saved": 0, "timings": dict(batch_timings), "error": None}
+        try:
+            if chunks is None:
+                raise RuntimeError(f"retrieval failed: {record['timings'].pop('retrieval_error')}")
+            async with semaphore:
+                record["timings"]["queue_wait"] = time.perf_counter() - queued_at
+                state = {"query": query, "raw_chunks": chunks}
+                context = format_context(state)
+                record["timings"].update(context.pop("timings"))
+                record["sources"] = collect_sources(state)["sources"]
+                record["context_tokens_saved"] = context["context_tokens_saved"]
+                record["context_tokens"] = count_tokens(context["formatted_context"])
+
+                started_at = time.perf_counter()
+                chain = get_rag_chain(self.settings["prompt_template"], self.db.llm)
+                record["answer"] = await chain.ainvoke({"question": query, "context": context["formatted_context"]})
+                record["timings"]["generate"] = time.perf_counter() - started_at
+        except Exception as e:
+            record["error"] = f"{type(e).__name__}: {e}"
+            print(f"⚠️ Question {index} failed: {record['error']}")
+        record["timings"]["latency"] = time.perf_counter() - queued_at
+
+        if output is not None:
+            output.write(json.dumps(record, ensure_ascii=False) + "\n")
+            output.flush()
+        return record
+
+    async def arun(self, queries: Sequence[str], output_path: str = None) -> List[Dict]:
+        """Answer every query; returns the records in input order (the JSONL is in completion order)."""
+        queries = list(queries)
+        started_at = time.perf_counter()
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        output = None
+        if output_path:
+            os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+            output = open(output_path, "w", encoding="utf-8")
+        try:
+            tasks = []
+            for start in range(0, len(queries), self.batch_size):
+                batch = queries[start:start + self.batch_size]
+                # Retrieval runs off the event loop, so earlier batches keep generating meanwhile
+                try:
+                    results, timings = await asyncio.to_thread(self._retrieve, batch)
+                except Exception as e:
+                    # One failed batch (e.g. an embedding API error) is reported per question, not fatal
+                    results, timings = [None] * len(batch), {"retrieval_error": f"{type(e).__name__}: {e}"}
+                tasks += [asyncio.create_task(self._answer(start + i, query, chunks, timings, semaphore, output))
+                          for i, (query, chunks) in enumerate(zip(batch, results))]
+            records = await asyncio.gather(*tasks)
+        finally:
+            if output is not None:
+                output.close()
+
+        elapsed = time.perf_counter() - started_at
+        failed = sum(record["error"] is not None for record in records)
+        print(f"✅ Batch of {len(records)} questions answered in {elapsed:.1f}s "
+              f"({len(records) / elapsed if elapsed else 0:.1f} q/s, {failed} failed)")
+        return records
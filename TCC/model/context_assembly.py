@@ -0,0 +1,159 @@
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+import config
+from model.tokens import count_tokens, truncate_to_tokens
+
+SEPARATOR = "\n\n"
+
+
+@dataclass
+class Span:
+    """Contiguous text from one source, built from one or more retrieved chunks."""
+    source: Optional[str]
+    text: str
+    rank: int                       # best retrieval rank among its chunks
+    start: Optional[int] = None     # character offsets in the source, when known
+    end: Optional[int] = None
+    chunks: int = 1
+
+
+@dataclass
+class AssembledContext:
+    text: str
+    spans: List[Span] = field(default_factory=list)
+    tokens: int = 0
+    tokens_in: int = 0
+
+    @property
+    def tokens_saved(self) -> int:
+        return max(self.tokens_in - self.tokens, 0)
+
+
+def _suffix_prefix_overlap(left: str, right: str, min_overlap: int) -> int:
+    """Length of the longest suffix of `left` that is a prefix of `right` (0 if < min_overlap)."""
+    for size in range(min(len(left), len(right)), min_overlap - 1, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+
+def _merge_positioned(spans: List[Span]) -> List[Span]:
+    """Merge spans whose [start, end) ranges overlap or touch, using the splitter's start_index."""
+    merged: List[Span] = []
+    for span in sorted(spans, key=lambda s: s.start):
+        last = merged[-1] if merged else None
+        if last is not None and span.start <= last.end:
+            if span.end > last.end:
+                last.text += span.text[last.end - span.start:]
+                last.end = span.end
+            last.rank = min(last.rank, span.rank)
+            last.chunks += span.chunks
+        else:
+            merged.append(span)
+    return merged
+
+
+def _merge_by_text(spans: List[Span], min_overlap: int) -> List[Span]:
+    """
+    Without offsets (indexes built before start_index was stored), join
+    chunks whose edges repeat the same text, as chunk_overlap produces.
+    """
+    merged = list(spans)
+    changed = True
+    while changed:
+        changed = False
+        for i, left in enumerate(merged):
+            for j, right in enumerate(merged):
+                if i == j:
+                    continue
+                if right.text in left.text:
+                    overlap, text = len(right.text), left.text
+                else:
+                    overlap = _suffix_prefix_overlap(left.text, right.text, min_overlap)
+                    text = left.text + right.text[overlap:]
+                if overlap:
+                    left.text = text
+                    left.rank = min(left.rank, right.rank)
+                    left.chunks += right.chunks
+                    del merged[j]
+                    changed = True
+                    break
+            if changed:
+                break
+    return merged
+
+
+def merge_chunks(docs: List[Document], min_overlap: int = 20) -> List[Span]:
+    """Group retrieved chunks by source and stitch overlapping/adjacent ones back together."""
+    by_source: Dict[Optional[str], List[Span]] = {}
+    for rank, doc in enumerate(docs):
+        start = doc.metadata.get("start_index")
+        end = start + len(doc.page_content) if start is not None else None
+        source = doc.metadata.get("source")
+        by_source.setdefault(source, []).append(Span(source, doc.page_content, rank, start, end))
+
+    spans: List[Span] = []
+    for source, group in by_source.items():
+        positioned = [span for span in group if span.start is not None]
+        others = [span for span in group if span.start is None]
+        spans += _merge_positioned(positioned) if positioned else []
+        spans += _merge_by_text(others, min_overlap) if source is not None else others
+    return sorted(spans, key=lambda span: span.rank)
+
+
+def _shingles(text: str, size: int = 3) -> set:
+    words = re.findall(r"\w+", text.lower())
+    return {tuple(words[i:i + size]) for i in range(max(len(words) - size + 1, 1))}
+
+
+def drop_near_duplicates(spans: List[Span], threshold: float) -> List[Span]:
+    """Keep the best‐ranked of any spans whose word 3‐gram Jaccard similarity reaches `threshold`."""
+    kept: List[Tuple[Span, set]] = []
+    for span in spans:
+        shingles = _shingles(span.text)
+        duplicate = any(
+            len(shingles & other) / max(len(shingles | other), 1) >= threshold or shingles <= other
+            for _, other in kept
+        )
+        if not duplicate:
+            kept.append((span, shingles))
+    return [span for span, _ in kept]
+
+
+def assemble_context(docs: List[Document], token_budget: int = None,
+                     dedup_threshold: float = None) -> AssembledContext:
+    """
+    Build the prompt context from retrieved chunks:
+      • chunks of one source that overlap or touch are merged into one span,
+      • near‐duplicate spans are dropped,
+      • spans are packed in retrieval order until `token_budget` is reached.
+    Token counts come from the cached tokenizer (model.tokens.count_tokens).
+    """
+    token_budget = token_budget if token_budget is not None else config.CONTEXT_TOKEN_BUDGET
+    dedup_threshold = dedup_threshold if dedup_threshold is not None else config.CONTEXT_DEDUP_THRESHOLD
+    if not docs:
+        return AssembledContext(text="")
+
+    separator_tokens = count_tokens(SEPARATOR)
+    # What the naive "\n\n".join(chunks) would have cost
+    tokens_in = sum(count_tokens(doc.page_content) for doc in docs) + separator_tokens * (len(docs) - 1)
+
+    spans = drop_near_duplicates(merge_chunks(docs), dedup_threshold)
+    packed: List[Span] = []
+    used = 0
+    for span in spans:
+        cost = count_tokens(span.text) + (separator_tokens if packed else 0)
+        if used + cost <= token_budget:
+            packed.append(span)
+            used += cost
+        elif not packed:
+            # Even the best span is over budget: keep as much of it as fits
+            span.text = truncate_to_tokens(span.text, token_budget)
+            packed.append(span)
+            used = count_tokens(span.text)
+
+    return AssembledContext(SEPARATOR.join(span.text for span in packed), packed, used, tokens_in)
@@ -0,0 +1,125 @@
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import config
+from model.tokens import MODEL_NAME, count_tokens, truncate_to_tokens
+
+SUMMARY_PROMPT = """Atualize o resumo de uma conversa entre um gestor e a IARIS, uma assistente de impacto socioambiental.
+Mantenha o contexto da organização do gestor, suas necessidades, os temas já tratados e as conclusões principais.
+Escreva em português, em até {words} palavras, sem repetir as respostas por extenso.
+
+Resumo atual:
+{summary}
+
+Novas trocas:
+{turns}
+
+Novo resumo:"""
+
+_summary_executor: Optional[ThreadPoolExecutor] = None
+_summary_lock = threading.Lock()
+
+
+def _get_summary_executor() -> ThreadPoolExecutor:
+    """Process‐wide pool for summary updates, shared by every session instead of a thread each."""
+    global _summary_executor
+    with _summary_lock:
+        if _summary_executor is None:
+            _summary_executor = ThreadPoolExecutor(max_workers=config.MEMORY_SUMMARY_WORKERS,
+                                                   thread_name_prefix="memory-summary")
+        return _summary_executor
+
+
+class ConversationMemory:
+    """
+    Chat history with a bounded prompt footprint:
+      • the last `max_turns` exchanges are kept verbatim (each side capped
+        at `turn_tokens`),
+      • older exchanges are folded into a running summary (at most
+        `summary_tokens`), updated incrementally with only the turns that
+        just left the window.
+    The summary is refreshed on a background thread as soon as a turn is
+    evicted, so the LLM call overlaps with the user reading the answer;
+    `messages()` waits for it only if it is still running.
+
+    One instance lives in each Streamlit session (`st.session_state["memory"]`).
+    """
+
+    def __init__(self, max_turns: int = None, turn_tokens: int = None,
+                 summary_tokens: int = None, llm=None):
+        self.max_turns = max_turns if max_turns is not None else config.MEMORY_RECENT_TURNS
+        self.turn_tokens = turn_tokens or config.MEMORY_TURN_TOKENS
+        self.summary_tokens = summary_tokens or config.MEMORY_SUMMARY_TOKENS
+        self.llm = llm
+        self.turns: List[Tuple[str, str]] = []
+        self.summary = ""
+        self.summarized_turns = 0
+        self._lock = threading.Lock()
+        self._pending: Optional[Future] = None
+
+    def __len__(self):
+        return self.summarized_turns + len(self.turns)
+
+    def add_turn(self, user: str, assistant: str):
+        """Record one exchange; turns pushed out of the window are summarized in the background."""
+        with self._lock:
+            self.turns.append((user, assistant))
+            evicted = self.turns[:-self.max_turns] if self.max_turns else list(self.turns)
+            self.turns = self.turns[len(evicted):]
+            if evicted:
+                # Chained on the previous update, so evicted turns are folded in order (the pool
+                # runs jobs first in, first out: the previous one has always started already)
+                previous = self._pending
+                self._pending = _get_summary_executor().submit(self._fold, previous, evicted)
+
+    def _fold(self, previous: Optional[Future], evicted: List[Tuple[str, str]]):
+        if previous is not None:
+            previous.result()
+        summary = self._summarize(self.summary, evicted)
+        self.summary = truncate_to_tokens(summary, self.summary_tokens)
+        self.summarized_turns += len(evicted)
+        print(f"🧠 Memory: {len(evicted)} turn(s) folded into the summary "
+              f"({self.summarized_turns} summarized, {count_tokens(self.summary)} tokens)")
+
+    def _summarize(self, summary: str, evicted: List[Tuple[str, str]]) -> str:
+        turns = "\n".join(f"Gestor: {user}\nIARIS: {truncate_to_tokens(assistant, self.turn_tokens)}"
+                          for user, assistant in evicted)
+        try:
+            llm = self.llm
+            if llm is None:
+                from model.prompt_cache import get_chat_model  # heavy import, only needed once a turn is evicted
+                llm = self.llm = get_chat_model(MODEL_NAME, temperature=0)
+            prompt = SUMMARY_PROMPT.format(words=self.summary_tokens * 3 // 4,
+                                           summary=summary or "(vazio)", turns=turns)
+            return llm.invoke(prompt).content.strip()
+        except Exception as e:
+            # Without the LLM, keep the gist: what the user asked, newest last
+            print(f"⚠️ Could not summarize the conversation ({type(e).__name__}), keeping the questions only.")
+            questions = "\n".join(f"- {user}" for user, _ in evicted)
+            return f"{summary}\n{questions}".strip() if summary else f"Perguntas anteriores:\n{questions}"
+
+    def wait(self):
+        """Block until the summary includes every evicted turn."""
+        pending = self._pending
+        if pending is not None:
+            pending.result()
+
+    def messages(self) -> List[Dict[str, str]]:
+        """History to send with the next question: the summary (if any) followed by the recent turns."""
+        self.wait()
+        with self._lock:
+            history = []
+            if self.summary:
+                history.append({"role": "system", "content": f"Resumo da conversa até aqui: {self.summary}"})
+            for user, assistant in self.turns:
+                history.append({"role": "user", "content": truncate_to_tokens(user, self.turn_tokens)})
+                history.append({"role": "assistant", "content": truncate_to_tokens(assistant, self.turn_tokens)})
+            return history
+
+    def clear(self):
+        self.wait()
+        with self._lock:
+            self.turns = []
+            self.summary = ""
+            self.summarized_turns = 0
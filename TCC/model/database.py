@@ -1,12 +1,3 @@
-from langchain import hub
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import WebBaseLoader, SeleniumURLLoader, PDFPlumberLoader
-from langchain_community.vectorstores import Chroma
-from langchain_core.output_parsers import StrOutputParser
-from langchain_core.runnables import RunnablePassthrough, RunnableParallel
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
-
-
 from abc import ABC, abstractmethod
 
 import os
@@ -16,21 +7,18 @@ load_dotenv()
 openai_key = os.getenv("OPENAI_API_KEY")
 
 class Database(ABC):
-    _instance = None
-
-    # Flag to track if the instance has been initialized
-    _initialized = False
-
-    def __new__(cls, *args, **kwargs):
-        if cls._instance is None:
-            cls._instance = super(Database, cls).__new__(cls)
-        return cls._instance
+    """
+    Base class of the vector store backed databases. Each instance opens its
+    own store; to share one per corpus across sessions and threads, go
+    through `model.store_registry.get_store_registry()`.
+    """
 
     def __init__(self, *args, **kwargs):
-        if not type(self)._initialized:
-            # Only initialize once
-            self._initialize(*args, **kwargs)
-            type(self)._initialized = True
+        self._initialize(*args, **kwargs)
+
+    def close(self):
+        """Release what the instance holds open (called when a registry evicts it)."""
+        pass
 
     @abstractmethod
     def _initialize(self,*args, **kwargs):
@@ -1,18 +1,35 @@
-from typing import List, Dict
+from typing import Iterable, Iterator, List, Dict, Optional, Set, Tuple
 import os
+import time
+import asyncio
 import re
 import json
+import zipfile
 from dotenv import load_dotenv
 from langchain_core.prompts import PromptTemplate
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
 from langchain_community.document_loaders import TextLoader
 from langchain_chroma import Chroma
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
 
 import config
 from model.database import Database
-from model.graph_chatbot import app
+from model.embedding_cache import get_cached_embeddings
+from model.manifest import ArchiveManifest, FileManifest, ManifestDiff
+from model.archive_source import archive_folder, archive_members, is_archive, iter_archive_documents
+from model.source_catalog import SourceCatalog
+from model.lexical_index import RETRIEVAL_MODES, LexicalIndex
+from model.subject_shards import SubjectShards, subject_for
+from model.vector_index import CompactVectorIndex, catalog_fingerprint
+from model.ingestion import EmbeddingPipeline, IngestionStats, prefetch
+from model.answer_cache import AnswerCache, CachedAnswer, get_answer_cache, replay_tokens
+from model.token_stream import AsyncTokenStream, TokenStream
+from model.metrics import RAGMetrics, get_metrics_recorder
+from model.tokens import count_tokens
+from model.prompt_cache import get_prompt_template
+from model.prompts import DEFAULT_PROMPT
 
 load_dotenv(override=True)
 openai_key = os.getenv("OPENAI_API_KEY")
@@ -30,94 +47,320 @@ class DocumentDatabase(Database):
          - Stream back "rag_stream" plus "sources."
     """
 
-    def _initialize(self, chroma_db: Chroma, file_path, prompt_template: PromptTemplate = None, retriever_k: int = 1, filter_list: List[str] = None):
+    # Where the collection, manifest, catalog and topics live; None means config.PERSIST_DIRECTORY
+    persist_directory: Optional[str] = None
+    # Serves vector search instead of Chroma when VECTOR_BACKEND is "compact"
+    vector_index: Optional[CompactVectorIndex] = None
+    answer_cache: Optional[AnswerCache] = None
+    # Folder inside a .zip file_path that holds the subject folders; None means config.ARCHIVE_PREFIX
+    archive_prefix: Optional[str] = None
+
+    def _initialize(self, chroma_db: Chroma, file_path, prompt_template: PromptTemplate = None, retriever_k: int = 1, filter_list: List[str] = None, sync: bool = False,
+                    embeddings: Embeddings = None, llm: BaseChatModel = None, retrieval_mode: str = None,
+                    persist_directory: str = None, archive_prefix: str = None):
         """
         — If an existing Chroma is passed in, reuse it.
         — Otherwise, either load from disk or build from scratch.
+        — With sync=True an existing index is brought up to date with file_path.
+        — `embeddings` / `llm` replace the OpenAI defaults (tests, benchmarks).
+        — `retrieval_mode` is "vector", "lexical" or "hybrid" (default: config.RETRIEVAL_MODE).
+        — `persist_directory` keeps this corpus apart from others (default: config.PERSIST_DIRECTORY).
+        — `file_path` may also be a .zip of the data folder, ingested without extracting it;
+          `archive_prefix` is that folder inside the archive (default: config.ARCHIVE_PREFIX).
         """
         self.file_path = file_path
-        self.prompt_template = prompt_template
+        self.persist_directory = persist_directory
+        self.archive_prefix = archive_prefix
+        self.prompt_template = prompt_template or get_prompt_template(DEFAULT_PROMPT)
         self.retriever_k = retriever_k
         self.filter_list = filter_list
+        self.embeddings = embeddings if embeddings is not None else get_cached_embeddings()
+        self.llm = llm
+        self.answer_cache = get_answer_cache() if config.ANSWER_CACHE_ENABLED else None
+        self.metrics = get_metrics_recorder() if config.METRICS_ENABLED else None
+        self.retrieval_mode = retrieval_mode or config.RETRIEVAL_MODE
+        if self.retrieval_mode not in RETRIEVAL_MODES:
+            raise ValueError(f"retrieval_mode must be one of {RETRIEVAL_MODES}, got {self.retrieval_mode!r}")
 
+        self._owns_vectorstore = not chroma_db
         if chroma_db:
             self.vectorstore = chroma_db
-            existing_metadatas = self.vectorstore.get()["metadatas"]
-            existing_docs = {meta["source"] for meta in existing_metadatas if "source" in meta}
-            print("✅ Document Database instantiated with existing document count:", len(existing_docs))
+            self._open_indexes()
+            print("✅ Document Database instantiated with existing document count:", len(self.sources))
         else:
-            self._create_chroma_db(file_path=file_path)
+            self._create_chroma_db(file_path=file_path, sync=sync)
         self._build_graph()
 
-    def _create_chroma_db(self, file_path="data/", text_splitter=None, loader=None):
+    def _persist_dir(self) -> str:
+        return self.persist_directory or config.PERSIST_DIRECTORY
+
+    def _corpus(self) -> str:
+        """Identifies this corpus in the process‐wide answer cache."""
+        return os.path.abspath(self._persist_dir())
+
+    def _invalidate_answer_cache(self):
+        """Forget this corpus's cached answers: they may cite chunks that were just changed or removed."""
+        if self.answer_cache is not None:
+            self.answer_cache.clear(corpus=self._corpus())
+
+    def _manifest(self) -> FileManifest:
+        if self.persist_directory is None:
+            return FileManifest()  # config.MANIFEST_FILE
+        return FileManifest(os.path.join(self.persist_directory, "manifest.json"))
+
+    def _archive_manifest(self) -> ArchiveManifest:
+        return ArchiveManifest(os.path.join(self._persist_dir(), "archive_manifest.json"))
+
+    def close(self):
+        """Close the lexical index and, if this instance opened it, the Chroma client."""
+        if getattr(self, "lexical_index", None) is not None:
+            self.lexical_index.close()
+        client = getattr(getattr(self, "vectorstore", None), "_client", None)
+        if getattr(self, "_owns_vectorstore", False) and hasattr(client, "close"):
+            client.close()
+
+    def _create_chroma_db(self, file_path="data/", text_splitter=None, loader=None, sync: bool = False):
         # Load existing database if it exists
-        if os.path.exists(config.PERSIST_DIRECTORY):
+        if os.path.exists(self._persist_dir()):
             print("Loading existing vector database...")
-            self.vectorstore = Chroma(persist_directory=config.PERSIST_DIRECTORY, embedding_function=OpenAIEmbeddings())
-            existing_metadatas = self.vectorstore.get()["metadatas"]
-            existing_docs = {meta["source"] for meta in existing_metadatas if "source" in meta}  # Use source as ID
-            print(existing_docs)
+            self.vectorstore = Chroma(persist_directory=self._persist_dir(), embedding_function=self.embeddings)
+            self._open_indexes()
+            print(f"Existing document count: {len(self.sources)}")
+            if sync:
+                self.sync_chroma_db(file_path=file_path, text_splitter=text_splitter)
             return
         else:
             print("No existing database found. Creating a new one...")
-            self.vectorstore = Chroma(embedding_function=OpenAIEmbeddings(), persist_directory=config.PERSIST_DIRECTORY)
-            existing_docs = set()
+            self.vectorstore = Chroma(embedding_function=self.embeddings, persist_directory=self._persist_dir())
+            self._open_indexes()
 
-        print(f"Existing document count: {len(existing_docs)}")
+        print(f"Existing document count: {len(self.sources)}")
+        if is_archive(file_path):
+            self.ingest_archive(file_path, text_splitter=text_splitter)
+            return
 
-        # Get all PDF paths
-        new_documents = [
-            os.path.join(root, file)
-            for root, _, files in os.walk(file_path)
-            for file in files if file.endswith(".txt")
-        ]
+        subjects = {f.path for f in os.scandir(file_path) if f.is_dir()}
+        manifest = self._manifest()
 
-        print(f"+++ New PDFs to process: {len(new_documents)}")
+        # Stream .txt files → chunks → embeddings → Chroma (+ lexical index, subject shards). Each
+        # stage hands over through a bounded buffer, so memory stays flat whatever the corpus size.
+        pipeline = EmbeddingPipeline(self.vectorstore, lexical_index=self.lexical_index, shards=self.shards)
+        splits = self._iter_splits(self._iter_documents(file_path), subjects, text_splitter,
+                                   stats=pipeline.stats, manifest=manifest)
+        stats = pipeline.run(prefetch(splits))
 
-        if not new_documents:
+        if not stats.files:
             print("No new documents to add.")
             return
 
-        new_splits = []
-        subjects = [f.path for f in os.scandir(file_path) if f.is_dir()]
+        # Record what was ingested so later syncs only touch what changed
+        manifest.save()
+        self.sources.save()
+        self._refresh_vector_index()
+        self._invalidate_answer_cache()
 
-        # Process .txt documents instead of PDFs
-        for i, document_path in enumerate(new_documents):
-            print(f"+++ Processing document {i+1}/{len(new_documents)}: {document_path}")
-            
-            loader = TextLoader(file_path=document_path)
-            docs = loader.load()
-            for doc in docs:
-                for subject in subjects:
-                    if subject in document_path:
-                        doc.metadata['subject'] = subject
-                doc.metadata["source"] = document_path  # Track source
+        # Persist the updated topics.json for filtering in UI
+        self._save_topics_json()
+        print("Vector database update complete.")
 
-            if text_splitter is None:
-                text_splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50)
+    def _open_indexes(self):
+        """
+        Open what is kept next to the collection: the source catalog (so
+        startup never scans chunk metadata), the lexical index and either the
+        compact vector index (VECTOR_BACKEND = "compact") or, when enabled,
+        the per‐subject shards.
+        """
+        self.sources = SourceCatalog.for_vectorstore(self.vectorstore)
+        self.lexical_index = LexicalIndex.for_vectorstore(self.vectorstore)
+        self.vector_index = None
+        self._refresh_vector_index()
+        self.shards = None
+        # The compact index filters subjects itself, so it needs no shards
+        if config.SUBJECT_SHARDS_ENABLED and self.vector_index is None:
+            self.shards = SubjectShards.for_vectorstore(self.vectorstore, self.sources.chunks_per_topic())
 
-            new_splits.extend(text_splitter.split_documents(docs))
+    def _refresh_vector_index(self):
+        """Open (or rebuild, after an ingestion or sync) the compact vector index of the current catalog."""
+        if config.VECTOR_BACKEND == "compact":
+            self.vector_index = CompactVectorIndex.for_vectorstore(self.vectorstore,
+                                                                   catalog_fingerprint(self.sources.entries))
 
+    @staticmethod
+    def _iter_documents(file_path: str) -> Iterator[str]:
+        for root, _, files in os.walk(file_path):
+            for file in files:
+                if file.endswith(".txt"):
+                    yield os.path.join(root, file)
 
-        # Add new chunks into Chroma and persist
-        print(f"Adding {len(new_splits)} new documents to the vector database...")
-        self.vectorstore = Chroma.from_documents(documents=new_splits, embedding=OpenAIEmbeddings(),
-                                 persist_directory=config.PERSIST_DIRECTORY)
+    def _iter_splits(self, document_paths: Iterable[str], subjects: Set[str], text_splitter=None,
+                     stats: IngestionStats = None, manifest: FileManifest = None) -> Iterator[Document]:
+        """
+        Load and split one file at a time, yielding its chunks as they are produced.
+        Each file is recorded in the manifest and the source catalog once its
+        chunks have been handed over.
+        """
+        if text_splitter is None:
+            text_splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50, add_start_index=True)
+        for document_path in document_paths:
+            chunks = self._load_and_split(document_path, subjects, text_splitter)
+            yield from chunks
+            if stats is not None:
+                stats.files += 1
+            sha256 = None
+            if manifest is not None:
+                manifest.update(document_path)
+                sha256 = manifest.entries[document_path]["sha256"]
+            subject = chunks[0].metadata.get("subject") if chunks else None
+            self.sources.add(document_path, len(chunks), subject, sha256 or FileManifest.hash_file(document_path))
 
-        # Persist the updated topics.json for filtering in UI
-        self._save_topics_json()
-        print("Vector database update complete.")
+    @staticmethod
+    def _load_and_split(document_path: str, subjects: Set[str], text_splitter=None) -> List[Document]:
+        """
+        Load one .txt file, tag it with its `source` and `subject`, and split it into chunks.
+        The subject is the enclosing subject folder, found by path‐prefix lookup.
+        """
+        loader = TextLoader(file_path=document_path)
+        docs = loader.load()
+        subject = subject_for(document_path, subjects)
+        for doc in docs:
+            if subject is not None:
+                doc.metadata['subject'] = subject
+            doc.metadata["source"] = document_path  # Track source
+
+        if text_splitter is None:
+            text_splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50, add_start_index=True)
+
+        return text_splitter.split_documents(docs)
+
+    def _iter_archive_splits(self, archive: zipfile.ZipFile, members: Dict[str, zipfile.ZipInfo], folder: str,
+                             text_splitter=None, stats: IngestionStats = None,
+                             manifest: ArchiveManifest = None) -> Iterator[Document]:
+        """`_iter_splits` for archive members, decompressed and split one member at a time."""
+        if text_splitter is None:
+            text_splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50, add_start_index=True)
+        for doc, sha256 in iter_archive_documents(archive, members, folder):
+            chunks = text_splitter.split_documents([doc])
+            yield from chunks
+            if stats is not None:
+                stats.files += 1
+            source = doc.metadata["source"]
+            if manifest is not None:
+                manifest.update(source, members[source])
+            self.sources.add(source, len(chunks), doc.metadata.get("subject"), sha256)
+
+    def _delete_source(self, source: str) -> int:
+        """Remove every chunk whose metadata `source` is the given path."""
+        ids = self.vectorstore.get(where={"source": source}, include=[])["ids"]
+        if ids:
+            self.vectorstore.delete(ids=ids)
+        self.lexical_index.delete_source(source)
+        if self.shards is not None:
+            self.shards.delete_source(source)
+        self.sources.remove(source)
+        return len(ids)
 
-    def _save_topics_json(self, output_folder: str = "./chroma_db"):
+    def sync_chroma_db(self, file_path: str = None, text_splitter=None) -> ManifestDiff:
         """
-        Write out a JSON file listing all subfolder names under self.file_path.
-        This powers the Streamlit filter UI.
+        Incremental re‐index of an existing vectorstore, driven by the file manifest:
+          • files added or edited since the last build are (re)embedded,
+          • chunks of deleted files are dropped by `source`,
+          • topics.json is rewritten to match the current subject folders.
+        """
+        file_path = file_path or self.file_path
+        if is_archive(file_path):
+            return self.ingest_archive(file_path, text_splitter=text_splitter)
+        manifest = self._manifest()
+        diff = manifest.diff(self._iter_documents(file_path))
+        print(f"🔄 Sync: {len(diff.added)} added, {len(diff.changed)} changed, "
+              f"{len(diff.removed)} removed, {len(diff.unchanged)} unchanged")
+
+        # Added files are cleared too, in case the index predates the manifest
+        for document_path in diff.removed + diff.changed + diff.added:
+            self._delete_source(document_path)
+        for document_path in diff.removed:
+            manifest.remove(document_path)
+
+        subjects = {f.path for f in os.scandir(file_path) if f.is_dir()}
+        if diff.added or diff.changed:
+            pipeline = EmbeddingPipeline(self.vectorstore, lexical_index=self.lexical_index, shards=self.shards)
+            splits = self._iter_splits(diff.added + diff.changed, subjects, text_splitter,
+                                       stats=pipeline.stats, manifest=manifest)
+            pipeline.run(prefetch(splits))
+        manifest.save()
+        self.sources.save()
+        self._refresh_vector_index()
+        if diff.added or diff.changed or diff.removed:
+            self._invalidate_answer_cache()
+
+        self._save_topics_json(replace=True, topics=self._catalog_topics())
+        print("✅ Vector database sync complete.")
+        return diff
+
+    def ingest_archive(self, archive_path: str, text_splitter=None, prefix: str = None) -> ManifestDiff:
         """
-        topics = [f.path for f in os.scandir(self.file_path) if f.is_dir()]
-        topics_clean = [re.search(r"[^/]+$", topic).group() for topic in topics]
+        `sync_chroma_db` for a .zip of the data folder, read in place: its .txt
+        members are streamed out of the archive into chunking and embedding,
+        with no extraction and no walk over the disk.
+          • only members under `prefix` (default: the instance's archive_prefix,
+            else config.ARCHIVE_PREFIX) are read, and their subject is the
+            folder right below it,
+          • sources and subjects are the paths the members would have once
+            extracted next to the archive, so both ways index the same names,
+          • members whose CRC and size match the archive manifest are skipped,
+            so a new archive only costs the members that changed in it.
+        """
+        if prefix is None:
+            prefix = self.archive_prefix if self.archive_prefix is not None else config.ARCHIVE_PREFIX
+        folder = archive_folder(archive_path, prefix)
+        manifest = self._archive_manifest()
+        with zipfile.ZipFile(archive_path) as archive:
+            members = archive_members(archive, folder, prefix)
+            diff = manifest.diff(members)
+            print(f"📦 Archive sync: {len(diff.added)} added, {len(diff.changed)} changed, "
+                  f"{len(diff.removed)} removed, {len(diff.unchanged)} unchanged")
+
+            # Added members are cleared too, in case the index predates the archive manifest
+            for source in diff.removed + diff.changed + diff.added:
+                self._delete_source(source)
+            for source in diff.removed:
+                manifest.remove(source)
+
+            if diff.added or diff.changed:
+                pipeline = EmbeddingPipeline(self.vectorstore, lexical_index=self.lexical_index, shards=self.shards)
+                pending = {source: members[source] for source in diff.added + diff.changed}
+                splits = self._iter_archive_splits(archive, pending, folder, text_splitter,
+                                                   stats=pipeline.stats, manifest=manifest)
+                pipeline.run(prefetch(splits))
+        manifest.save()
+        self.sources.save()
+        self._refresh_vector_index()
+        if diff.added or diff.changed or diff.removed:
+            self._invalidate_answer_cache()
+
+        self._save_topics_json(replace=True, topics=self._catalog_topics())
+        print("✅ Vector database sync from archive complete.")
+        return diff
+
+    def _catalog_topics(self) -> List[str]:
+        """Topics that still have chunks in the index: a subject whose last file was removed is dropped."""
+        return sorted(topic for topic, chunks in self.sources.chunks_per_topic().items() if chunks)
+
+    def _save_topics_json(self, output_folder: str = None, replace: bool = False, topics: List[str] = None):
+        """
+        Write out a JSON file listing all subfolder names under self.file_path
+        (or the given `topics`; syncs pass the topics of the source catalog).
+        This powers the Streamlit filter UI. With replace=True topics that are
+        gone are dropped instead of merged.
+        """
+        output_folder = output_folder or self._persist_dir()
+        if topics is not None:
+            topics_clean = list(topics)
+        else:
+            topics = [f.path for f in os.scandir(self.file_path) if f.is_dir()]
+            topics_clean = [re.search(r"[^/]+$", topic).group() for topic in topics]
         topics_json_path = os.path.join(output_folder, "topics.json")
 
-        if os.path.exists(topics_json_path):
+        if os.path.exists(topics_json_path) and not replace:
             with open(topics_json_path, "r", encoding="utf-8") as f:
                 existing_topics = json.load(f)
         else:
@@ -143,62 +386,214 @@ class DocumentDatabase(Database):
           • Joins them into one big “context” string,
           • Sends that into ChatOpenAI (gpt‐4o‐mini),
           • Streams back a “rag_stream” plus “sources.”
+        `async_graph` runs the same pipeline with async nodes for `arun_rag`.
+        Both are compiled on first use (see `graph_chatbot.get_graph`), not here.
         """
-        self.graph = app
+        self.graph = None
+        self.async_graph = None
+
+    def _get_graph(self, use_async: bool = False):
+        """Compiled graph for this instance, importing LangGraph only when a query needs it."""
+        if (self.async_graph if use_async else self.graph) is None:
+            from model.graph_chatbot import get_graph
+            if use_async:
+                self.async_graph = get_graph(use_async=True)
+            else:
+                self.graph = get_graph()
+        return self.async_graph if use_async else self.graph
 
     def run_rag(self,
-                query: str, messages: List[str]) -> Dict:
+                query: str, messages: List[str], stream: bool = True, **overrides) -> Dict:
         """
         Public method that any controller/UI can call:
           • It takes the raw user query + a PromptTemplate instance
           • It triggers LangGraph, returns a dict with:
                 { "query": query,
-                  "rag_stream": <generator>,
-                  "sources": [list of source‐strings]
+                  "rag_stream": <TokenStream> (or None when stream=False),
+                  "rag_text": full answer,
+                  "sources": [list of source‐strings],
+                  "timings": {node name: seconds},
+                  "cache_hit": bool,
+                  "metrics": <RAGMetrics>, complete once the stream ends
                 }
+        In streaming mode the LLM is called once: "rag_text" starts empty and
+        is filled in as soon as the caller has consumed "rag_stream".
+
+        Questions asked without chat history go through the semantic answer
+        cache first; follow‐ups depend on the conversation and are never cached.
+
+        `overrides` (prompt_template, retriever_k, filter_list, retrieval_mode)
+        apply to this question only, so concurrent callers never change each
+        other's settings.
         """
         # if filter_list is None:
         #     filter_list = []
 
+        metrics = RAGMetrics(query=query)
+        settings = self._request_settings(**overrides)
+        cache_key, cached = self._lookup_answer_cache(query, messages, metrics, settings)
+        if cached is not None:
+            return self._cached_response(query, cached, stream, metrics)
+
+        initial_state = self._initial_state(query, messages, stream, settings)
+
+        # invoke the graph (this will run the `generate_rag` function)
+        app = self._get_graph()
+        # new_state = self.graph.invoke(initial_state)
+        new_state = app.invoke(initial_state)
+        return self._build_response(query, new_state, cache_key, metrics)
+
+    async def arun_rag(self,
+                       query: str, messages: List[str], stream: bool = True, **overrides) -> Dict:
+        """
+        Async twin of `run_rag`, built on the `ainvoke`/`astream` APIs.
+        Returns the same dict, but "rag_stream" is an AsyncTokenStream to be
+        consumed with `async for`: a session no longer holds a thread for the
+        whole LLM round‐trip, so one worker can serve many sessions at once.
+        """
+        metrics = RAGMetrics(query=query)
+        settings = self._request_settings(**overrides)
+        cache_key, cached = await asyncio.to_thread(self._lookup_answer_cache, query, messages, metrics, settings)
+        if cached is not None:
+            return self._cached_response(query, cached, stream, metrics, stream_cls=AsyncTokenStream)
+
+        new_state = await self._get_graph(use_async=True).ainvoke(self._initial_state(query, messages, stream, settings))
+        return self._build_response(query, new_state, cache_key, metrics)
+
+    def run_rag_batch(self, queries: List[str], output_path: str = None,
+                      max_concurrency: int = None, batch_size: int = None, **overrides) -> List[Dict]:
+        """
+        Answer many questions at once, for offline evaluation runs: queries are
+        embedded and searched in batches, generations run `max_concurrency` at
+        a time, and every result (answer, sources, per‐query timings) is
+        appended to the JSONL `output_path` as soon as it finishes.
+        `overrides` are the per‐run settings `run_rag` takes (prompt_template,
+        retriever_k, filter_list, retrieval_mode); the instance is not modified.
+        Returns the records in the order of `queries`. See `BatchRAGRunner`.
+        """
+        return asyncio.run(self.arun_rag_batch(queries, output_path, max_concurrency, batch_size, **overrides))
+
+    async def arun_rag_batch(self, queries: List[str], output_path: str = None,
+                             max_concurrency: int = None, batch_size: int = None, **overrides) -> List[Dict]:
+        """Async twin of `run_rag_batch`, for callers already inside an event loop."""
+        from model.batch_rag import BatchRAGRunner  # imports LangGraph nodes, only needed for batch runs
+        runner = BatchRAGRunner(self, self._request_settings(**overrides),
+                                max_concurrency=max_concurrency, batch_size=batch_size)
+        return await runner.arun(queries, output_path)
+
+    def _request_settings(self, prompt_template: PromptTemplate = None, retriever_k: int = None,
+                          filter_list: List[str] = None, retrieval_mode: str = None) -> Dict:
+        """Settings for one question: the instance's, with the given overrides."""
+        settings = {
+            "prompt_template": prompt_template or self.prompt_template,
+            "retriever_k": retriever_k or self.retriever_k,
+            "filter_list": filter_list if filter_list is not None else self.filter_list,
+            "retrieval_mode": retrieval_mode or self.retrieval_mode,
+        }
+        if settings["retrieval_mode"] not in RETRIEVAL_MODES:
+            raise ValueError(f"retrieval_mode must be one of {RETRIEVAL_MODES}, got {settings['retrieval_mode']!r}")
+        return settings
+
+    def _lookup_answer_cache(self, query: str, messages: List[str], metrics: RAGMetrics,
+                             settings: Dict = None) -> Tuple[Optional[str], Optional[CachedAnswer]]:
+        """
+        Returns (cache key, cached answer); the key is None when caching does not apply.
+        The semantic cache embeds the query, so lexical‐only retrieval skips it
+        to keep those requests free of embedding calls.
+        """
+        settings = settings or self._request_settings()
+        if self.answer_cache is None or messages or settings["retrieval_mode"] == "lexical":
+            return None, None
+        started_at = time.perf_counter()
+        cache_key = self.answer_cache.make_key(settings["prompt_template"], settings["retriever_k"],
+                                               settings["filter_list"], settings["retrieval_mode"],
+                                               corpus=self._corpus())
+        cached = self.answer_cache.lookup(query, cache_key)
+        metrics.stage_seconds["answer_cache_lookup"] = time.perf_counter() - started_at
+        return cache_key, cached
+
+    def _record_metrics(self, metrics: RAGMetrics, token_stream: TokenStream = None):
+        metrics.finish(token_stream)
+        if self.metrics is not None:
+            self.metrics.record(metrics)
+
+    def _initial_state(self, query: str, messages: List[str], stream: bool, settings: Dict = None) -> Dict:
         # Initialize a fresh state
-        initial_state = {
+        settings = settings or self._request_settings()
+        return {
             "query": query,
-            "prompt_template": self.prompt_template,
-            "retriever_k": self.retriever_k,
-            "filter_list": self.filter_list,
+            "prompt_template": settings["prompt_template"],
+            "retriever_k": settings["retriever_k"],
+            "filter_list": settings["filter_list"],
             "raw_chunks": [],
             "formatted_context": "",
+            "context_tokens_saved": 0,
             "rag_stream": None,
             "sources": [],
             "answer": "",
             "combined_context": "",
-            # "history": [],
+            "history": "",
+            "timings": {},
             "vectorstore": self.vectorstore,
-            "messages": messages
+            "lexical_index": self.lexical_index,
+            "shards": self.shards,
+            "vector_index": self.vector_index,
+            "subjects": self.sources.subjects_for(settings["filter_list"]) if settings["filter_list"] else None,
+            "retrieval_mode": settings["retrieval_mode"],
+            "llm": self.llm,
+            "messages": messages,
+            "stream": stream
         }
 
-
-        # query: str = ""
-        # prompt_tpl: PromptTemplate 
-        # retriever_k: int
-        # filter_list: List[str]
-
-        # raw_chunks: List[Document] = []
-        # formatted_context: str = ""
-        # rag_stream: any = None
-        # sources: List[str] = []
-        # answer = ""
-        # combined_context: str = ""
-
-        # invoke the graph (this will run the `generate_rag` function)
-        app = self.graph
-        # new_state = self.graph.invoke(initial_state)
-        new_state = app.invoke(initial_state)
-        
-
-        return {
+    def _build_response(self, query: str, new_state: Dict, cache_key: Optional[str], metrics: RAGMetrics) -> Dict:
+        metrics.stage_seconds.update(new_state.get("timings", {}))
+        metrics.context_tokens = count_tokens(new_state.get("history", "") + new_state.get("formatted_context", ""))
+        metrics.context_tokens_saved = new_state.get("context_tokens_saved", 0)
+        response = {
             "query": new_state["query"],
             "rag_stream": new_state["rag_stream"],
-            "rag_text": new_state["answer"], 
-            "sources": new_state["sources"]
+            "rag_text": new_state["answer"],
+            "sources": new_state["sources"],
+            "timings": new_state.get("timings", {}),
+            "cache_hit": False,
+            "metrics": metrics
+        }
+        if response["rag_stream"] is not None:
+            # Record the streamed answer for history once the UI has drained it
+            response["rag_stream"].add_done_callback(
+                lambda token_stream: response.update(rag_text=token_stream.text)
+            )
+        if cache_key is not None:
+            if response["rag_stream"] is not None:
+                response["rag_stream"].add_done_callback(
+                    lambda token_stream: self.answer_cache.store(query, cache_key, token_stream.text, response["sources"])
+                )
+            else:
+                self.answer_cache.store(query, cache_key, response["rag_text"], response["sources"])
+        self._watch_metrics(response)
+        return response
+
+    def _watch_metrics(self, response: Dict):
+        """Record the request's metrics now, or once its stream has been drained."""
+        if response["rag_stream"] is not None:
+            response["rag_stream"].add_done_callback(
+                lambda token_stream: self._record_metrics(response["metrics"], token_stream)
+            )
+        else:
+            self._record_metrics(response["metrics"])
+
+    def _cached_response(self, query: str, cached: CachedAnswer, stream: bool, metrics: RAGMetrics,
+                         stream_cls=TokenStream) -> Dict:
+        """Replay a cached answer in the same shape `run_rag` returns."""
+        metrics.cache_hit = True
+        response = {
+            "query": query,
+            "rag_stream": stream_cls(replay_tokens(cached.answer)) if stream else None,
+            "rag_text": cached.answer,
+            "sources": list(cached.sources),
+            "timings": dict(metrics.stage_seconds),
+            "cache_hit": True,
+            "metrics": metrics
         }
+        self._watch_metrics(response)
+        return response
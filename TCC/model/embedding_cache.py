@@ -0,0 +1,149 @@
+import os
+import hashlib
+import sqlite3
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+import config
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embedding function that wraps another one (OpenAIEmbeddings by default) with:
+      1. A bounded in‐memory LRU,
+      2. A persistent on‐disk SQLite store,
+      3. The real embedding API, only for texts neither cache has seen.
+
+    Keys are sha256(model name + text), so the same chunk or the same question
+    is only ever paid for once per model, across rebuilds and restarts.
+    Both caches hold float32 arrays (6 KB per 1536‐d vector, against ~49 KB
+    as a list of Python floats); lists are only built for the caller.
+    """
+
+    def __init__(self, embeddings: Embeddings = None, cache_path: str = None,
+                 lru_size: int = None, batch_size: int = 500):
+        if embeddings is None:
+            from model.openai_clients import get_openai_clients
+            embeddings = get_openai_clients().embeddings()
+        self.embeddings = embeddings
+        self.model_name = getattr(self.embeddings, "model", None) or type(self.embeddings).__name__
+        self.cache_path = cache_path or config.EMBEDDING_CACHE_PATH
+        self.lru_size = lru_size if lru_size is not None else config.EMBEDDING_LRU_SIZE
+        self.batch_size = batch_size
+
+        self._lru: "OrderedDict[str, array]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(self.cache_path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+        )
+        self._conn.commit()
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    # --- LRU helpers (callers hold self._lock) ---
+    def _lru_get(self, key: str) -> Optional[array]:
+        vector = self._lru.get(key)
+        if vector is not None:
+            self._lru.move_to_end(key)
+        return vector
+
+    def _lru_put(self, key: str, vector: array):
+        self._lru[key] = vector
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.lru_size:
+            self._lru.popitem(last=False)
+
+    # --- disk helpers (callers hold self._lock) ---
+    def _disk_get_many(self, keys: List[str]) -> Dict[str, array]:
+        found = {}
+        for start in range(0, len(keys), self.batch_size):
+            batch = keys[start:start + self.batch_size]
+            placeholders = ",".join("?" * len(batch))
+            rows = self._conn.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+            )
+            for key, blob in rows:
+                found[key] = array("f", blob)
+        return found
+
+    def _disk_put_many(self, items: Dict[str, array]):
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+            [(key, vector.tobytes()) for key, vector in items.items()],
+        )
+        self._conn.commit()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self._key(text) for text in texts]
+        vectors: Dict[str, array] = {}
+
+        # Embed each unseen text once, in a single batched API call
+        to_embed: Dict[str, str] = {}
+        with self._lock:
+            for key in keys:
+                vector = self._lru_get(key)
+                if vector is not None:
+                    vectors[key] = vector
+            missing_keys = list({key for key in keys if key not in vectors})
+            if missing_keys:
+                for key, vector in self._disk_get_many(missing_keys).items():
+                    vectors[key] = vector
+                    self._lru_put(key, vector)
+            for key, text in zip(keys, texts):
+                if key not in vectors:
+                    to_embed.setdefault(key, text)
+            self.hits += len(texts) - len(to_embed)
+            self.misses += len(to_embed)
+
+        if to_embed:
+            new_vectors = self.embeddings.embed_documents(list(to_embed.values()))
+            fresh = {key: array("f", vector) for key, vector in zip(to_embed.keys(), new_vectors)}
+            with self._lock:
+                self._disk_put_many(fresh)
+                for key, vector in fresh.items():
+                    self._lru_put(key, vector)
+            vectors.update(fresh)
+
+        return [vectors[key].tolist() for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self._key(text)
+        with self._lock:
+            vector = self._lru_get(key)
+            if vector is None:
+                vector = self._disk_get_many([key]).get(key)
+                if vector is not None:
+                    self._lru_put(key, vector)
+            if vector is not None:
+                self.hits += 1
+                return vector.tolist()
+            self.misses += 1
+
+        vector = array("f", self.embeddings.embed_query(text))
+        with self._lock:
+            self._disk_put_many({key: vector})
+            self._lru_put(key, vector)
+        return vector.tolist()
+
+
+_default_embeddings: Optional[CachedEmbeddings] = None
+_default_lock = threading.Lock()
+
+
+def get_cached_embeddings() -> CachedEmbeddings:
+    """Process‐wide cached OpenAIEmbeddings, shared by ingestion and queries."""
+    global _default_embeddings
+    with _default_lock:
+        if _default_embeddings is None:
+            _default_embeddings = CachedEmbeddings()
+        return _default_embeddings
@@ -1,18 +1,21 @@
-from langgraph.graph import MessagesState, StateGraph
+from langgraph.graph import MessagesState, StateGraph, END
 from langchain_core.messages import HumanMessage, AIMessage
-from langgraph.checkpoint.memory import MemorySaver
 from langchain_core.prompts import PromptTemplate
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
-from langchain_community.document_loaders import PDFPlumberLoader
-from langchain_chroma import Chroma
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
-from langchain_core.output_parsers import StrOutputParser
-from langchain_core.runnables import RunnablePassthrough, RunnableParallel
 
-from typing import List
+from typing import Annotated, Dict, List
 from dotenv import load_dotenv
 import os
+import time
+import asyncio
+from functools import lru_cache, wraps
+
+import config
+from model.context_assembly import assemble_context
+from model.lexical_index import reciprocal_rank_fusion
+from model.prompt_cache import get_rag_chain
+from model.subject_shards import subject_where
+from model.token_stream import AsyncTokenStream, TokenStream
 load_dotenv()
 openai_key = os.getenv("OPENAI_API_KEY")
 
@@ -22,6 +25,10 @@ def format_docs(docs: List[Document]) -> str:
         """
         return "\n\n".join(doc.page_content for doc in docs)
 
+def merge_timings(left: Dict[str, float], right: Dict[str, float]) -> Dict[str, float]:
+    """Reducer for `timings`: parallel branches each add their own node's duration."""
+    return {**(left or {}), **(right or {})}
+
 # (A) Define a custom State with all fields we need
 class RAGState(MessagesState):
     query: str = ""
@@ -31,14 +38,23 @@ class RAGState(MessagesState):
 
     raw_chunks: List[Document] = []
     formatted_context: str = ""
+    context_tokens_saved: int = 0
     rag_stream: any = None
     sources: List[str] = []
     answer:str = ""
+    stream: bool = True
+    history: str = ""
+    timings: Annotated[Dict[str, float], merge_timings]
+    llm: any = None
+    retrieval_mode: str = "vector"
+    lexical_index: any = None
+    shards: any = None
+    vector_index: any = None
+    subjects: any = None
     # combined_context: str = ""
-    # history = []
-    vectorstore: Chroma = None
+    vectorstore: any = None
 
-    def __init__(self, query: str = "", prompt_template: PromptTemplate = None, retriever_k: int = 4, filter_list: List[str] = None, vectorstore: Chroma = None):
+    def __init__(self, query: str = "", prompt_template: PromptTemplate = None, retriever_k: int = 4, filter_list: List[str] = None, vectorstore: any = None):
         super().__init__()
         self.query = query
         self.prompt_template = prompt_template
@@ -53,90 +69,217 @@ class RAGState(MessagesState):
         # self.history = []
         self.vectorstore = vectorstore
 
-# (1) Node: retrieve top‐K chunks from Chroma
-def retrieve_chunks(state: RAGState) -> List[Document]:
-    retriever = state["vectorstore"].as_retriever(
-        search_kwargs={"k": state["retriever_k"]}
-    )
-    # If you want filtering by “subject,” uncomment below:
-    # retriever = self.vectorstore.as_retriever(
-    #     search_kwargs={
-    #         "k": state.retriever_k,
-    #         "filter": {"subject": {"$in": state.filter_list}}
-    #     }
-    # )
-    docs: List[Document] = retriever.invoke(state["query"])
-    state["raw_chunks"] = docs
-    return state
-
-# (2) Node: format those chunks into one big string
-
-def format_context(state: RAGState) -> str:
-    ctxt = format_docs(state["raw_chunks"])
-    state["formatted_context"] = ctxt
-    return ctxt
-
-# (3) Node: call the LLM in streaming mode
-
-def call_llm_stream(state: RAGState):
-    if state["messages"]:
-        hist_lines = []
-        for turn in state["messages"]:
-            if (type(turn) is HumanMessage):
-                role = "user"
-            elif (type(turn) is AIMessage):
-                role = "assistant"
-            # print("turn", turn)
-            cont = turn.content
-            # e.g. "User: How does X work?"
-            hist_lines.append(f"{role.capitalize()}: {cont}")
-        history_str = "\n".join(hist_lines) + "\n\n"
-    else:
-        history_str = ""
-
-    # (b) Combine history + retrieved-docs
-    formatted_context = history_str + state["formatted_context"]
-
-    state["formatted_context"] = formatted_context
-
-    rag_chain = (RunnablePassthrough.assign(context=(lambda x: state["formatted_context"]))
-                 | state["prompt_template"]
-                 | ChatOpenAI(model_name="gpt-4o-mini", api_key=openai_key)
-                 | StrOutputParser()
-    )
-    
-    answer: str = rag_chain.invoke({"question": state["query"], "context": state["formatted_context"]})
-    state["answer"] = answer
-
-
-    stream_gen = rag_chain.stream({"question": state["query"]})
-    state["rag_stream"] = stream_gen
-    return state
-
-# (4) Node: collect “sources” from metadata
-
-def collect_sources(state: RAGState) -> List[str]:
+def timed(name: str):
+    """
+    Wrap a node so it reports how long it took in `timings[name]`.
+    Works for both sync and async nodes; nodes return partial state updates.
+    """
+    def decorator(node):
+        if asyncio.iscoroutinefunction(node):
+            @wraps(node)
+            async def async_wrapper(state: RAGState) -> dict:
+                started_at = time.perf_counter()
+                update = await node(state)
+                return {**update, "timings": {name: time.perf_counter() - started_at}}
+            return async_wrapper
+
+        @wraps(node)
+        def wrapper(state: RAGState) -> dict:
+            started_at = time.perf_counter()
+            update = node(state)
+            return {**update, "timings": {name: time.perf_counter() - started_at}}
+        return wrapper
+    return decorator
+
+# (1) Node: retrieve top‐K chunks from Chroma and/or the lexical index
+#
+#   "vector"  → Chroma similarity search (one embedding call for the query)
+#   "lexical" → BM25 over the local inverted index, no embedding call at all
+#   "hybrid"  → both, merged with reciprocal rank fusion
+#
+# With a `filter_list`, vector search only runs on the shards of those
+# subjects (in parallel) and lexical search only scores their chunks.
+# Without shards, Chroma filters on the chunks' `subject` metadata (the
+# `subjects` folders of the selected topics, from the source catalog).
+# With the compact vector index, vector search runs on it instead of Chroma
+# and filters subjects itself.
+def _retriever(state: RAGState, k: int = None):
+    search_kwargs = {"k": k or state["retriever_k"]}
+    if state.get("vector_index") is not None:
+        return state["vector_index"].as_retriever(
+            search_kwargs={**search_kwargs, "filter": state.get("filter_list")}
+        )
+    if state.get("filter_list") and state.get("subjects"):
+        search_kwargs["filter"] = subject_where(state["subjects"])
+    return state["vectorstore"].as_retriever(search_kwargs=search_kwargs)
+
+def _retrieval_mode(state: RAGState) -> str:
+    if state.get("lexical_index") is None:
+        return "vector"
+    return state.get("retrieval_mode") or "vector"
+
+def _lexical_search(state: RAGState, k: int) -> List[Document]:
+    return state["lexical_index"].search_documents(state["vectorstore"], state["query"], k,
+                                                   state.get("filter_list"))
+
+def _sharded(state: RAGState) -> bool:
+    return (bool(state.get("filter_list")) and state.get("shards") is not None
+            and state.get("vector_index") is None)
+
+def _nothing_selected(state: RAGState) -> bool:
+    """A filter whose topics have no chunks in Chroma: nothing to search."""
+    return (bool(state.get("filter_list")) and state.get("vector_index") is None
+            and state.get("subjects") is not None and not state["subjects"])
+
+def _vector_search(state: RAGState, k: int) -> List[Document]:
+    if _sharded(state):
+        return state["shards"].search(state["query"], state["filter_list"], k)
+    if _nothing_selected(state):
+        return []
+    return _retriever(state, k).invoke(state["query"])
+
+async def _avector_search(state: RAGState, k: int) -> List[Document]:
+    if _sharded(state):
+        return await asyncio.to_thread(state["shards"].search, state["query"], state["filter_list"], k)
+    if _nothing_selected(state):
+        return []
+    return await _retriever(state, k).ainvoke(state["query"])
+
+def _candidates(state: RAGState) -> int:
+    # Each ranking contributes more than k candidates so fusion has something to reorder
+    return max(state["retriever_k"], config.HYBRID_CANDIDATES)
+
+@timed("retrieve_chunks")
+def retrieve_chunks(state: RAGState) -> dict:
+    mode = _retrieval_mode(state)
+    if mode == "lexical":
+        return {"raw_chunks": _lexical_search(state, state["retriever_k"])}
+    if mode == "hybrid":
+        k = _candidates(state)
+        rankings = [_vector_search(state, k), _lexical_search(state, k)]
+        return {"raw_chunks": reciprocal_rank_fusion(rankings, state["retriever_k"], config.RRF_K)}
+    docs: List[Document] = _vector_search(state, state["retriever_k"])
+    return {"raw_chunks": docs}
+
+@timed("retrieve_chunks")
+async def aretrieve_chunks(state: RAGState) -> dict:
+    mode = _retrieval_mode(state)
+    if mode == "lexical":
+        return {"raw_chunks": await asyncio.to_thread(_lexical_search, state, state["retriever_k"])}
+    if mode == "hybrid":
+        k = _candidates(state)
+        rankings = await asyncio.gather(_avector_search(state, k),
+                                        asyncio.to_thread(_lexical_search, state, k))
+        return {"raw_chunks": reciprocal_rank_fusion(rankings, state["retriever_k"], config.RRF_K)}
+    docs: List[Document] = await _avector_search(state, state["retriever_k"])
+    return {"raw_chunks": docs}
+
+# (2) Node: turn the chat history into a prefix for the context (runs alongside retrieval)
+
+@timed("format_history")
+def format_history(state: RAGState) -> dict:
+    if not state["messages"]:
+        return {"history": ""}
+    hist_lines = []
+    for turn in state["messages"]:
+        if (type(turn) is HumanMessage):
+            role = "user"
+        elif (type(turn) is AIMessage):
+            role = "assistant"
+        else:
+            role = turn.type
+        # e.g. "User: How does X work?"
+        hist_lines.append(f"{role.capitalize()}: {turn.content}")
+    return {"history": "\n".join(hist_lines) + "\n\n"}
+
+# (3) Node: merge overlapping chunks, drop duplicates and pack them into the token budget
+
+@timed("format_context")
+def format_context(state: RAGState) -> dict:
+    context = assemble_context(state["raw_chunks"])
+    return {"formatted_context": context.text, "context_tokens_saved": context.tokens_saved}
+
+# (4) Node: call the LLM in streaming mode
+
+def _build_rag_chain(state: RAGState):
+    """Combine history + retrieved docs and fetch the compiled prompt → LLM → text chain."""
+    context = state.get("history", "") + state["formatted_context"]
+    rag_chain = get_rag_chain(state["prompt_template"], state.get("llm"))
+    chain_input = {"question": state["query"], "context": context}
+    return rag_chain, chain_input
+
+@timed("call_llm_stream")
+def call_llm_stream(state: RAGState) -> dict:
+    rag_chain, chain_input = _build_rag_chain(state)
+    if state.get("stream", True):
+        # Single LLM call: tokens go straight to the UI and the TokenStream
+        # records the full text once the last token has arrived.
+        return {"rag_stream": TokenStream(rag_chain.stream(chain_input)), "answer": ""}
+    return {"rag_stream": None, "answer": rag_chain.invoke(chain_input)}
+
+@timed("call_llm_stream")
+async def acall_llm_stream(state: RAGState) -> dict:
+    rag_chain, chain_input = _build_rag_chain(state)
+    if state.get("stream", True):
+        # astream() only opens the request once the caller starts iterating
+        return {"rag_stream": AsyncTokenStream(rag_chain.astream(chain_input)), "answer": ""}
+    return {"rag_stream": None, "answer": await rag_chain.ainvoke(chain_input)}
+
+# (5) Node: collect “sources” from metadata (runs in the same step as format_context, right after retrieval)
+
+@timed("collect_sources")
+def collect_sources(state: RAGState) -> dict:
     sources: List[str] = []
     for chunk in state["raw_chunks"]:
         src = chunk.metadata.get("source", "")
         if "page" in chunk.metadata:
             src += f"\n\nPage {chunk.metadata['page']}"
         sources.append(src)
-    state["sources"] = sources
-    return state
-
-# (5) Node: run them all in order
-def run_pipeline(state: RAGState) -> RAGState:
-    _ = retrieve_chunks(state)
-    _ = format_context(state)
-    _ = call_llm_stream(state)
-    _ = collect_sources(state)
-    return state
-
-graph = StateGraph(RAGState)
-graph.add_node("run_pipeline", run_pipeline)
-graph.add_edge("run_pipeline", "__end__")
-graph.set_entry_point("run_pipeline")
-# memory = MemorySaver()
-# config = {"configurable": {"thread_id": "abc123"}}
-app = graph.compile()
+    return {"sources": sources}
+
+# (6) Wire the nodes:
+#
+#   retrieve_chunks ──┬── format_context ──┬── call_llm_stream ── END
+#                     │   format_history ──┘
+#                     └── collect_sources ─────────────────────── END
+#
+# format_history runs in the same step as retrieval and collect_sources in
+# the same step as context formatting, so neither sits on the path to the
+# first token.
+def build_graph(retrieve_node=retrieve_chunks, llm_node=call_llm_stream):
+    graph = StateGraph(RAGState)
+    graph.add_node("retrieve_chunks", retrieve_node)
+    graph.add_node("format_history", format_history)
+    graph.add_node("format_context", format_context)
+    graph.add_node("call_llm_stream", llm_node)
+    graph.add_node("collect_sources", collect_sources)
+
+    graph.set_entry_point("retrieve_chunks")
+    graph.set_entry_point("format_history")
+    graph.add_edge("retrieve_chunks", "format_context")
+    graph.add_edge("retrieve_chunks", "collect_sources")
+    graph.add_edge(["format_context", "format_history"], "call_llm_stream")
+    graph.add_edge("call_llm_stream", END)
+    graph.add_edge("collect_sources", END)
+    # memory = MemorySaver()
+    # config = {"configurable": {"thread_id": "abc123"}}
+    return graph.compile()
+
+@lru_cache(maxsize=None)
+def get_graph(use_async: bool = False):
+    """
+    Compile the graph on first use and reuse it afterwards, so importing this
+    module stays cheap. `use_async=True` gives the same topology with async
+    retrieval/LLM nodes, driven with `await graph.ainvoke(state)`.
+    """
+    if use_async:
+        return build_graph(aretrieve_chunks, acall_llm_stream)
+    return build_graph()
+
+def __getattr__(name: str):
+    # `app` and `async_app` used to be compiled at import time; keep them as lazy aliases
+    if name == "app":
+        return get_graph()
+    if name == "async_app":
+        return get_graph(use_async=True)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,244 @@
+import time
+import uuid
+import queue
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass
+from typing import Iterable, Iterator, List, Optional
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_chroma import Chroma
+
+import config
+from model.lexical_index import LexicalIndex
+from model.subject_shards import SubjectShards
+
+
+class TokenBucket:
+    """
+    Thread‐safe token bucket: `rate` tokens are added per second, up to `capacity`.
+    `acquire(n)` blocks until n tokens are available.
+    """
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1)
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1):
+        # A request bigger than the bucket could never be served: cap it
+        tokens = min(tokens, self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait_for = (tokens - self._tokens) / self.rate
+            time.sleep(wait_for)
+
+
+@dataclass
+class IngestionStats:
+    files: int = 0
+    chunks: int = 0
+    batches: int = 0
+    retries: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def chunks_per_second(self) -> float:
+        return self.chunks / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self):
+        return (f"{self.files} files, {self.chunks} chunks in {self.batches} batches, {self.retries} retries, "
+                f"{self.elapsed:.1f}s ({self.chunks_per_second:.1f} chunks/s)")
+
+
+def _retry_after(exc: Exception) -> Optional[float]:
+    """Seconds the provider asked us to wait, if the error carries a Retry‐After header."""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    value = headers.get("retry-after") if hasattr(headers, "get") else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def is_retryable(exc: Exception) -> bool:
+    """429s, 5xx, timeouts and dropped connections are worth another try."""
+    status = getattr(exc, "status_code", None)
+    if status is not None:
+        return status == 429 or status >= 500
+    name = type(exc).__name__
+    return any(word in name for word in ("RateLimit", "Timeout", "Connection"))
+
+
+_END_OF_STREAM = object()
+
+
+def prefetch(items: Iterable, maxsize: int = None) -> Iterator:
+    """
+    Run the `items` generator in a background thread and hand its output over
+    through a bounded queue: the producer blocks when the consumer falls behind,
+    so at most `maxsize` items are ever buffered between the two stages.
+    """
+    buffer = queue.Queue(maxsize=maxsize or config.INGEST_QUEUE_SIZE)
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        """Hand `item` over, giving up (False) once the consumer has stopped."""
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in items:
+                if not put(item):
+                    return
+            put(_END_OF_STREAM)
+        except BaseException as exc:
+            put(exc)
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is _END_OF_STREAM:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        # Consumer stopped early (error or break): let the producer exit
+        stop.set()
+
+
+def batched(documents: Iterable[Document], batch_size: int) -> Iterator[List[Document]]:
+    batch: List[Document] = []
+    for doc in documents:
+        batch.append(doc)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class EmbeddingPipeline:
+    """
+    Embeds document chunks in batches with a bounded number of concurrent
+    requests, and writes each batch to Chroma as soon as it is embedded:
+      • a request token bucket (and an optional token‐per‐second bucket)
+        keeps us under the provider's rate limits,
+      • 429/5xx errors are retried with exponential backoff + jitter,
+        honouring Retry‐After when present,
+      • writes happen on the calling thread, so Chroma only sees one writer,
+      • the same batches feed the optional lexical (BM25) index and subject
+        shards, so every index is built in one pass over the corpus.
+    """
+
+    def __init__(self, vectorstore: Chroma, embeddings: Embeddings = None,
+                 batch_size: int = None, max_concurrency: int = None,
+                 requests_per_second: float = None, tokens_per_second: float = None,
+                 max_retries: int = None, base_backoff: float = 1.0, max_backoff: float = 60.0,
+                 lexical_index: LexicalIndex = None, shards: SubjectShards = None):
+        self.vectorstore = vectorstore
+        self.lexical_index = lexical_index
+        self.shards = shards
+        self.embeddings = embeddings if embeddings is not None else vectorstore.embeddings
+        self.batch_size = batch_size or config.INGEST_BATCH_SIZE
+        self.max_concurrency = max_concurrency or config.INGEST_MAX_CONCURRENCY
+        self.max_retries = max_retries if max_retries is not None else config.INGEST_MAX_RETRIES
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+
+        self.request_bucket = TokenBucket(requests_per_second or config.INGEST_REQUESTS_PER_SECOND)
+        tokens_per_second = tokens_per_second or config.INGEST_TOKENS_PER_SECOND
+        self.token_bucket = TokenBucket(tokens_per_second) if tokens_per_second else None
+
+        self.stats = IngestionStats()
+        self._stats_lock = threading.Lock()
+        self._last_report = 0.0
+
+    def _embed_batch(self, batch: List[Document]) -> List[List[float]]:
+        texts = [doc.page_content for doc in batch]
+        attempt = 0
+        while True:
+            self.request_bucket.acquire()
+            if self.token_bucket is not None:
+                # ~4 characters per token is close enough for rate limiting
+                self.token_bucket.acquire(sum(len(text) for text in texts) / 4)
+            try:
+                return self.embeddings.embed_documents(texts)
+            except Exception as exc:
+                if attempt >= self.max_retries or not is_retryable(exc):
+                    raise
+                delay = _retry_after(exc)
+                if delay is None:
+                    delay = min(self.max_backoff, self.base_backoff * 2 ** attempt) * random.uniform(0.5, 1.0)
+                attempt += 1
+                with self._stats_lock:
+                    self.stats.retries += 1
+                print(f"⚠️ Embedding batch failed ({type(exc).__name__}), retry {attempt}/{self.max_retries} in {delay:.1f}s")
+                time.sleep(delay)
+
+    def _write_batch(self, batch: List[Document], vectors: List[List[float]]):
+        ids = [doc.id or str(uuid.uuid4()) for doc in batch]
+        self.vectorstore._collection.upsert(
+            ids=ids,
+            embeddings=vectors,
+            metadatas=[doc.metadata or None for doc in batch],
+            documents=[doc.page_content for doc in batch],
+        )
+        if self.lexical_index is not None:
+            self.lexical_index.add(ids, batch)
+        if self.shards is not None:
+            self.shards.add(ids, batch, vectors)
+        self.stats.chunks += len(batch)
+        self.stats.batches += 1
+
+    def run(self, documents: Iterable[Document]) -> IngestionStats:
+        """
+        Embed and store every chunk; returns throughput stats for this run.
+        `documents` is consumed lazily, so it can be a generator over a corpus
+        of any size: only the batches in flight are held in memory.
+        """
+        self._started_at = self._last_report = time.perf_counter()
+        in_flight = {}
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            for batch in batched(documents, self.batch_size):
+                # Backpressure: never hold more than max_concurrency batches at once
+                while len(in_flight) >= self.max_concurrency:
+                    self._drain(in_flight)
+                in_flight[executor.submit(self._embed_batch, batch)] = batch
+            while in_flight:
+                self._drain(in_flight)
+        self.stats.elapsed = time.perf_counter() - self._started_at
+        print(f"✅ Embedded {self.stats}")
+        return self.stats
+
+    def _drain(self, in_flight: dict):
+        """Write whichever in‐flight batches have finished embedding."""
+        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+        for future in done:
+            batch = in_flight.pop(future)
+            self._write_batch(batch, future.result())
+        now = time.perf_counter()
+        self.stats.elapsed = now - self._started_at
+        if now - self._last_report >= config.INGEST_PROGRESS_INTERVAL:
+            self._last_report = now
+            print(f"+++ Progress: {self.stats}")
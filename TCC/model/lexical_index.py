@@ -0,0 +1,204 @@
+import os
+import re
+import math
+import sqlite3
+import threading
+import unicodedata
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from langchain_core.documents import Document
+from langchain_chroma import Chroma
+
+from model.subject_shards import topic_name
+
+INDEX_FILE_NAME = "lexical.sqlite3"
+RETRIEVAL_MODES = ("vector", "lexical", "hybrid")
+
+# Portuguese function words, written without accents (see `tokenize`)
+_STOPWORDS = frozenset("""
+    a o as os ao aos um uma uns umas de da do das dos em na no nas nos num numa
+    e ou que se por para com sem sob sobre entre como mais mas ja nao sim ser
+    foi sao esta este essa esse isso isto ela ele elas eles seu sua seus suas
+    lhe the of and to in
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase, strip accents (so "mudança" matches "mudanca") and drop stopwords."""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return [token for token in re.findall(r"\w+", text) if token not in _STOPWORDS]
+
+
+def reciprocal_rank_fusion(rankings: Sequence[List[Document]], k: int, rrf_k: int = 60) -> List[Document]:
+    """
+    Merge ranked lists with Reciprocal Rank Fusion: score(d) = Σ 1 / (rrf_k + rank).
+    Only ranks are used, so BM25 and cosine scores never need to be comparable.
+    Documents are matched by id, falling back to (source, text).
+    """
+    scores: Dict[Tuple, float] = {}
+    documents: Dict[Tuple, Document] = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking, start=1):
+            key = (doc.id,) if doc.id else (doc.metadata.get("source"), doc.page_content)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+            documents.setdefault(key, doc)
+    best = sorted(scores, key=scores.get, reverse=True)[:k]
+    return [documents[key] for key in best]
+
+
+class LexicalIndex:
+    """
+    BM25 inverted index over the same chunks as the Chroma collection, in a
+    SQLite file next to it:
+        chunks(id, chunk_id, source, topic, length)   one row per chunk
+        postings(term, chunk, tf)                     clustered by term
+    Only term statistics are stored; chunk text and metadata are read back
+    from Chroma by id, which is a local lookup, not an embedding call.
+    """
+
+    def __init__(self, index_path: str = ":memory:", k1: float = 1.2, b: float = 0.75):
+        self.index_path = index_path
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._stats: Optional[Tuple[int, float]] = None
+
+        if index_path != ":memory:":
+            os.makedirs(os.path.dirname(index_path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(index_path, check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS chunks (
+                id INTEGER PRIMARY KEY, chunk_id TEXT UNIQUE NOT NULL,
+                source TEXT, topic TEXT, length INTEGER NOT NULL);
+            CREATE INDEX IF NOT EXISTS chunks_source ON chunks (source);
+            CREATE TABLE IF NOT EXISTS postings (
+                term TEXT NOT NULL, chunk INTEGER NOT NULL, tf INTEGER NOT NULL,
+                PRIMARY KEY (term, chunk)) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS postings_chunk ON postings (chunk);
+        """)
+        self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    @staticmethod
+    def path_for(vectorstore: Chroma) -> str:
+        """The index of `vectorstore` lives in its persist directory (in memory if it has none)."""
+        settings = vectorstore._client.get_settings()
+        if not settings.is_persistent:
+            return ":memory:"
+        return os.path.join(settings.persist_directory, INDEX_FILE_NAME)
+
+    @classmethod
+    def for_vectorstore(cls, vectorstore: Chroma, page_size: int = 5000) -> "LexicalIndex":
+        """
+        Open the index of `vectorstore`, backfilling it once from the stored
+        chunks when it is missing or out of step with the collection (e.g. an
+        index built before the lexical index existed).
+        """
+        index = cls(cls.path_for(vectorstore))
+        count = vectorstore._collection.count()
+        if len(index) != count:
+            print(f"⚠️ Lexical index out of date ({len(index)} of {count} chunks), rebuilding it once...")
+            index.clear()
+            for offset in range(0, count, page_size):
+                page = vectorstore.get(limit=page_size, offset=offset, include=["documents", "metadatas"])
+                index.add(page["ids"], [Document(page_content=text or "", metadata=meta or {})
+                                        for text, meta in zip(page["documents"], page["metadatas"])])
+        return index
+
+    def add(self, ids: List[str], documents: Iterable[Document]):
+        """Index (or re‐index) chunks under the ids they were stored with in Chroma."""
+        with self._lock:
+            self._delete_ids(ids)
+            for chunk_id, doc in zip(ids, documents):
+                counts = Counter(tokenize(doc.page_content))
+                row = self._conn.execute(
+                    "INSERT INTO chunks (chunk_id, source, topic, length) VALUES (?, ?, ?, ?)",
+                    (chunk_id, doc.metadata.get("source"), topic_name(doc.metadata.get("subject")),
+                     sum(counts.values())),
+                ).lastrowid
+                self._conn.executemany(
+                    "INSERT INTO postings (term, chunk, tf) VALUES (?, ?, ?)",
+                    [(term, row, tf) for term, tf in counts.items()],
+                )
+            self._conn.commit()
+            self._stats = None
+
+    def _delete_ids(self, ids: List[str]):
+        for start in range(0, len(ids), 500):
+            batch = ids[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            rows = f"SELECT id FROM chunks WHERE chunk_id IN ({placeholders})"
+            self._conn.execute(f"DELETE FROM postings WHERE chunk IN ({rows})", batch)
+            self._conn.execute(f"DELETE FROM chunks WHERE chunk_id IN ({placeholders})", batch)
+
+    def delete_source(self, source: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM postings WHERE chunk IN (SELECT id FROM chunks WHERE source = ?)", (source,))
+            self._conn.execute("DELETE FROM chunks WHERE source = ?", (source,))
+            self._conn.commit()
+            self._stats = None
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM postings")
+            self._conn.execute("DELETE FROM chunks")
+            self._conn.commit()
+            self._stats = None
+
+    def search(self, query: str, k: int, topics: Iterable[str] = None) -> List[Tuple[str, float]]:
+        """
+        Top‐k (chunk id, BM25 score) pairs for `query`; empty when no term matches.
+        With `topics`, only chunks of those subjects are scored (collection‐wide
+        statistics are kept, so scores stay comparable between filters).
+        """
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+        with self._lock:
+            if self._stats is None:
+                count, avg_length = self._conn.execute("SELECT COUNT(*), AVG(length) FROM chunks").fetchone()
+                self._stats = (count, avg_length or 0.0)
+            count, avg_length = self._stats
+            if not count:
+                return []
+            terms = list(terms)
+            placeholders = ",".join("?" * len(terms))
+            df = dict(self._conn.execute(
+                f"SELECT term, COUNT(*) FROM postings WHERE term IN ({placeholders}) GROUP BY term", terms,
+            ).fetchall())
+            if not df:
+                return []
+            # Score every matching chunk in one aggregate query; idf is computed per term up front
+            weights = [(term, math.log(1 + (count - n + 0.5) / (n + 0.5))) for term, n in df.items()]
+            values = ",".join("(?, ?)" for _ in weights)
+            topics = list(topics or [])
+            where = f"WHERE c.topic IN ({','.join('?' * len(topics))}) " if topics else ""
+            rows = self._conn.execute(
+                f"WITH q(term, idf) AS (VALUES {values}) "
+                "SELECT c.chunk_id, SUM(q.idf * p.tf * (? + 1) / (p.tf + ? * (1 - ? + ? * c.length / ?))) AS score "
+                f"FROM q JOIN postings p ON p.term = q.term JOIN chunks c ON c.id = p.chunk {where}"
+                "GROUP BY p.chunk ORDER BY score DESC LIMIT ?",
+                [value for weight in weights for value in weight]
+                + [self.k1, self.k1, self.b, self.b, avg_length or 1.0] + topics + [k],
+            ).fetchall()
+        return rows
+
+    def search_documents(self, vectorstore: Chroma, query: str, k: int,
+                         topics: Iterable[str] = None) -> List[Document]:
+        """`search`, with the chunks read back from Chroma by id, best first."""
+        hits = self.search(query, k, topics)
+        if not hits:
+            return []
+        stored = vectorstore.get(ids=[chunk_id for chunk_id, _ in hits], include=["documents", "metadatas"])
+        by_id = {chunk_id: Document(id=chunk_id, page_content=text, metadata=meta or {})
+                 for chunk_id, text, meta in zip(stored["ids"], stored["documents"], stored["metadatas"])}
+        return [by_id[chunk_id] for chunk_id, _ in hits if chunk_id in by_id]
@@ -0,0 +1,117 @@
+import os
+import json
+import hashlib
+from typing import Dict, Iterable, List, NamedTuple
+from zipfile import ZipInfo
+
+import config
+
+
+class ManifestDiff(NamedTuple):
+    added: List[str]
+    changed: List[str]
+    removed: List[str]
+    unchanged: List[str]
+
+
+class FileManifest:
+    """
+    Records what was last ingested for each source file:
+        { path: {"size": int, "mtime": float, "sha256": str} }
+
+    Size + mtime is the cheap check; the content hash is only computed when
+    they differ, so a sync over an unchanged corpus never re-reads the files.
+    """
+
+    def __init__(self, manifest_path: str = None):
+        self.manifest_path = manifest_path or config.MANIFEST_FILE
+        self.entries: Dict[str, Dict] = {}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, path: str):
+        return path in self.entries
+
+    @staticmethod
+    def hash_file(path: str) -> str:
+        sha = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                sha.update(block)
+        return sha.hexdigest()
+
+    @staticmethod
+    def stat_entry(path: str, sha256: str = None) -> Dict:
+        stat = os.stat(path)
+        return {
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "sha256": sha256 or FileManifest.hash_file(path),
+        }
+
+    def diff(self, paths: Iterable[str]) -> ManifestDiff:
+        """Compare the files currently on disk with what the manifest recorded."""
+        added, changed, unchanged = [], [], []
+        seen = set()
+        for path in paths:
+            seen.add(path)
+            entry = self.entries.get(path)
+            if entry is None:
+                added.append(path)
+                continue
+            stat = os.stat(path)
+            if stat.st_size == entry["size"] and stat.st_mtime == entry["mtime"]:
+                unchanged.append(path)
+            elif stat.st_size == entry["size"] and self.hash_file(path) == entry["sha256"]:
+                # Touched but not edited: refresh the mtime so we skip the hash next time
+                entry["mtime"] = stat.st_mtime
+                unchanged.append(path)
+            else:
+                changed.append(path)
+        removed = [path for path in self.entries if path not in seen]
+        return ManifestDiff(added, changed, removed, unchanged)
+
+    def update(self, path: str):
+        self.entries[path] = self.stat_entry(path)
+
+    def remove(self, path: str):
+        self.entries.pop(path, None)
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.manifest_path) or ".", exist_ok=True)
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, ensure_ascii=False, indent=4)
+        os.replace(tmp_path, self.manifest_path)
+
+
+class ArchiveManifest(FileManifest):
+    """
+    The same record for documents read straight out of a zip archive, keyed
+    by the path each member would have once extracted:
+        { source: {"size": int, "crc": int} }
+
+    The archive's central directory already holds every member's CRC‐32 and
+    size, so diffing a new archive reads no member data at all.
+    """
+
+    def diff(self, members: Dict[str, ZipInfo]) -> ManifestDiff:
+        """Compare `members` (source → ZipInfo) with what the manifest recorded."""
+        added, changed, unchanged = [], [], []
+        for source, info in members.items():
+            entry = self.entries.get(source)
+            if entry is None:
+                added.append(source)
+            elif entry["size"] == info.file_size and entry["crc"] == info.CRC:
+                unchanged.append(source)
+            else:
+                changed.append(source)
+        removed = [source for source in self.entries if source not in members]
+        return ManifestDiff(added, changed, removed, unchanged)
+
+    def update(self, source: str, info: ZipInfo):
+        self.entries[source] = {"size": info.file_size, "crc": info.CRC}
@@ -0,0 +1,195 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from dataclasses import dataclass, field, asdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+import config
+
+
+@dataclass
+class RAGMetrics:
+    """
+    Numbers for one `run_rag` call. Filled in two steps: stage timings and
+    context size when the graph returns, generation numbers when the stream ends.
+    """
+    query: str
+    started_at: float = field(default_factory=time.time)
+    started_perf: float = field(default_factory=time.perf_counter, repr=False)
+    cache_hit: bool = False
+    stage_seconds: Dict[str, float] = field(default_factory=dict)
+    context_tokens: int = 0
+    context_tokens_saved: int = 0
+    ttft: Optional[float] = None
+    output_tokens: int = 0
+    tokens_per_second: Optional[float] = None
+    total_latency: Optional[float] = None
+
+    @property
+    def retrieval_latency(self) -> Optional[float]:
+        return self.stage_seconds.get("retrieve_chunks")
+
+    def finish(self, token_stream=None):
+        """Close the measurement, taking generation numbers from a drained TokenStream."""
+        if token_stream is not None and token_stream.first_token_at is not None:
+            self.ttft = token_stream.first_token_at - self.started_perf
+            self.output_tokens = len(token_stream.chunks)
+            generation_time = token_stream.finished_at - token_stream.first_token_at
+            if generation_time > 0:
+                self.tokens_per_second = self.output_tokens / generation_time
+        self.total_latency = time.perf_counter() - self.started_perf
+
+    def to_dict(self) -> Dict:
+        data = asdict(self)
+        data.pop("started_perf")
+        data["retrieval_latency"] = self.retrieval_latency
+        return data
+
+
+class _Histogram:
+    """Prometheus‐style cumulative histogram, one series per label value."""
+
+    BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+    def __init__(self, buckets: Tuple[float, ...] = None):
+        self.buckets = buckets or self.BUCKETS
+        self.series: Dict[str, Dict] = {}
+
+    def observe(self, value: float, label: str = ""):
+        series = self.series.setdefault(label, {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0})
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series["counts"][i] += 1
+        series["sum"] += value
+        series["count"] += 1
+
+    def render(self, name: str, help_text: str, label_name: str = None) -> List[str]:
+        lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+        for label, series in sorted(self.series.items()):
+            base = f'{label_name}="{label}",' if label_name else ""
+            for bound, count in zip(self.buckets, series["counts"]):
+                lines.append(f'{name}_bucket{{{base}le="{bound}"}} {count}')
+            lines.append(f'{name}_bucket{{{base}le="+Inf"}} {series["count"]}')
+            suffix = f"{{{base.rstrip(',')}}}" if base else ""
+            lines.append(f"{name}_sum{suffix} {series['sum']}")
+            lines.append(f"{name}_count{suffix} {series['count']}")
+        return lines
+
+
+class MetricsRecorder:
+    """
+    Process‐wide sink for RAGMetrics:
+      • appends every finished request to a JSONL file; the question is
+        written as its SHA‐256 (enough to group repeats) unless `log_queries`
+        (default: config.METRICS_LOG_QUERIES) opts in to the raw text,
+      • aggregates them for the Prometheus text endpoint,
+      • keeps the latest one for the ChatView debug panel.
+    """
+
+    def __init__(self, jsonl_path: str = None, log_queries: bool = None):
+        self.jsonl_path = jsonl_path if jsonl_path is not None else config.METRICS_JSONL_PATH
+        self.log_queries = log_queries if log_queries is not None else config.METRICS_LOG_QUERIES
+        self.latest: Optional[RAGMetrics] = None
+        self._lock = threading.Lock()
+        self._requests = {"true": 0, "false": 0}
+        self._output_tokens = 0
+        self._stage_seconds = _Histogram()
+        self._ttft = _Histogram()
+        self._total = _Histogram()
+        self._context_tokens = _Histogram((250, 500, 1000, 2000, 4000, 8000, 16000, 32000))
+        self._tokens_per_second: Optional[float] = None
+
+    def record(self, metrics: RAGMetrics):
+        with self._lock:
+            self.latest = metrics
+            self._requests["true" if metrics.cache_hit else "false"] += 1
+            self._output_tokens += metrics.output_tokens
+            for stage, seconds in metrics.stage_seconds.items():
+                self._stage_seconds.observe(seconds, stage)
+            if metrics.ttft is not None:
+                self._ttft.observe(metrics.ttft)
+            if metrics.total_latency is not None:
+                self._total.observe(metrics.total_latency)
+            if not metrics.cache_hit:
+                self._context_tokens.observe(metrics.context_tokens)
+            if metrics.tokens_per_second is not None:
+                self._tokens_per_second = metrics.tokens_per_second
+
+            if self.jsonl_path:
+                os.makedirs(os.path.dirname(self.jsonl_path) or ".", exist_ok=True)
+                with open(self.jsonl_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(self._row(metrics), ensure_ascii=False) + "\n")
+
+    def _row(self, metrics: RAGMetrics) -> Dict:
+        row = metrics.to_dict()
+        query = row.pop("query")
+        if self.log_queries:
+            row["query"] = query
+        else:
+            row["query_sha256"] = hashlib.sha256(query.encode("utf-8")).hexdigest()
+        return row
+
+    def prometheus_text(self) -> str:
+        with self._lock:
+            lines = ["# HELP iaris_rag_requests_total RAG requests served, by answer cache hit.",
+                     "# TYPE iaris_rag_requests_total counter"]
+            for hit, count in self._requests.items():
+                lines.append(f'iaris_rag_requests_total{{cache_hit="{hit}"}} {count}')
+            lines += ["# HELP iaris_rag_output_tokens_total Tokens streamed back to users.",
+                      "# TYPE iaris_rag_output_tokens_total counter",
+                      f"iaris_rag_output_tokens_total {self._output_tokens}"]
+            lines += self._stage_seconds.render("iaris_rag_stage_seconds", "Duration of each graph node.", "stage")
+            lines += self._ttft.render("iaris_rag_ttft_seconds", "Time from question to first answer token.")
+            lines += self._total.render("iaris_rag_total_seconds", "Time from question to last answer token.")
+            lines += self._context_tokens.render("iaris_rag_context_tokens", "Prompt context size in tokens.")
+            if self._tokens_per_second is not None:
+                lines += ["# HELP iaris_rag_tokens_per_second Generation speed of the latest answer.",
+                          "# TYPE iaris_rag_tokens_per_second gauge",
+                          f"iaris_rag_tokens_per_second {self._tokens_per_second}"]
+        return "\n".join(lines) + "\n"
+
+
+_default_recorder: Optional[MetricsRecorder] = None
+_default_lock = threading.Lock()
+
+
+def get_metrics_recorder() -> MetricsRecorder:
+    global _default_recorder
+    with _default_lock:
+        if _default_recorder is None:
+            _default_recorder = MetricsRecorder()
+        return _default_recorder
+
+
+def start_metrics_server(port: int, recorder: MetricsRecorder = None) -> ThreadingHTTPServer:
+    """
+    Serve `GET /metrics` in Prometheus text format from a daemon thread,
+    with the OpenAI connection pool gauges once the pool is in use.
+    """
+    recorder = recorder or get_metrics_recorder()
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            from model.openai_clients import get_openai_clients
+            pool = get_openai_clients(create=False)
+            text = recorder.prometheus_text() + (pool.prometheus_text() if pool is not None else "")
+            body = text.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("0.0.0.0", port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"📊 Prometheus metrics on http://0.0.0.0:{server.server_address[1]}/metrics")
+    return server
@@ -0,0 +1,230 @@
+import os
+import time
+import asyncio
+import threading
+import weakref
+from importlib.util import find_spec
+from typing import Dict, List, Optional
+
+import httpx
+
+import config
+
+
+class _PoolCounters:
+    """Request, connection and connection‐wait counters, fed by httpcore trace events."""
+
+    def __init__(self):
+        self.requests = 0
+        self.connections_opened = 0
+        self.tls_handshakes = 0
+        self.http2_requests = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self._lock = threading.Lock()
+
+    def tracer(self):
+        """
+        Trace callback for one request. The wait is the time until the request
+        headers go out: queueing for a free connection, plus opening a new one
+        (TCP + TLS) when none could be reused.
+        """
+        started_at = time.perf_counter()
+        sent = False
+
+        def trace(name: str, info: Dict):
+            nonlocal sent
+            with self._lock:
+                if name == "connection.connect_tcp.complete":
+                    self.connections_opened += 1
+                elif name == "connection.start_tls.complete":
+                    self.tls_handshakes += 1
+                elif name.endswith(".send_request_headers.started") and not sent:
+                    sent = True
+                    waited = time.perf_counter() - started_at
+                    self.requests += 1
+                    self.http2_requests += name.startswith("http2.")
+                    self.wait_seconds_total += waited
+                    self.wait_seconds_max = max(self.wait_seconds_max, waited)
+        return trace
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            return {"requests": self.requests,
+                    "connections_opened": self.connections_opened,
+                    "connections_reused": max(self.requests - self.connections_opened, 0),
+                    "tls_handshakes": self.tls_handshakes,
+                    "http2_requests": self.http2_requests,
+                    "wait_seconds_mean": self.wait_seconds_total / self.requests if self.requests else None,
+                    "wait_seconds_max": self.wait_seconds_max}
+
+
+class _TracedTransport(httpx.HTTPTransport):
+    def __init__(self, counters: _PoolCounters, **kwargs):
+        super().__init__(**kwargs)
+        self.counters = counters
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        request.extensions["trace"] = self.counters.tracer()
+        return super().handle_request(request)
+
+
+class _AsyncTracedTransport(httpx.AsyncHTTPTransport):
+    def __init__(self, counters: _PoolCounters, **kwargs):
+        super().__init__(**kwargs)
+        self.counters = counters
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        trace = self.counters.tracer()
+
+        async def atrace(name: str, info: Dict):
+            trace(name, info)
+
+        request.extensions["trace"] = atrace
+        return await super().handle_async_request(request)
+
+
+class _LoopLocalTransport(httpx.AsyncBaseTransport):
+    """
+    Async connections belong to the event loop that opened them, and we run
+    several (the API server's, one per `asyncio.run` of a batch...). This
+    keeps one pooled transport per live loop behind a single AsyncClient,
+    so the cached chat models can be shared by all of them.
+    """
+
+    def __init__(self, make_transport):
+        self._make_transport = make_transport
+        self._transports: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _AsyncTracedTransport]" = \
+            weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def transports(self) -> List[_AsyncTracedTransport]:
+        with self._lock:
+            for loop in [loop for loop in self._transports if loop.is_closed()]:
+                del self._transports[loop]  # its sockets went with the loop
+            return list(self._transports.values())
+
+    def _current(self) -> _AsyncTracedTransport:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            transport = self._transports.get(loop)
+            if transport is None:
+                transport = self._transports[loop] = self._make_transport()
+            return transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self._current().handle_async_request(request)
+
+    async def aclose(self):
+        """Close the transports of every live loop, each on its own loop when that one is still running."""
+        current = asyncio.get_running_loop()
+        with self._lock:
+            transports = [(loop, transport) for loop, transport in self._transports.items() if not loop.is_closed()]
+            self._transports.clear()
+        for loop, transport in transports:
+            if loop is current or not loop.is_running():
+                await transport.aclose()
+            else:
+                await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(transport.aclose(), loop))
+
+
+def _connections(transport) -> List:
+    pool = getattr(transport, "_pool", None)  # httpx keeps its httpcore pool private
+    return list(getattr(pool, "connections", []))
+
+
+class OpenAIClientPool:
+    """
+    One set of HTTP clients for every OpenAI call of the process (chat
+    models, embeddings, summaries), instead of a new client per question:
+      • keep‐alive connections, reused across requests and threads, within
+        OPENAI_MAX_CONNECTIONS / OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+      • HTTP/2 when OPENAI_HTTP2 is set and the `h2` package is installed,
+      • connect / read / pool timeouts from config,
+      • `stats()`: open and idle connections, reuse and connection wait times.
+    """
+
+    def __init__(self, max_connections: int = None, max_keepalive_connections: int = None,
+                 keepalive_expiry: float = None, timeout: httpx.Timeout = None, http2: bool = None):
+        self.limits = httpx.Limits(
+            max_connections=max_connections or config.OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=max_keepalive_connections or config.OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=keepalive_expiry if keepalive_expiry is not None else config.OPENAI_KEEPALIVE_EXPIRY)
+        self.timeout = timeout or httpx.Timeout(config.OPENAI_READ_TIMEOUT, connect=config.OPENAI_CONNECT_TIMEOUT,
+                                                pool=config.OPENAI_POOL_TIMEOUT)
+        http2 = config.OPENAI_HTTP2 if http2 is None else http2
+        self.http2 = bool(http2) and find_spec("h2") is not None
+        if http2 and not self.http2:
+            print("⚠️ HTTP/2 requested but the 'h2' package is not installed, using HTTP/1.1 keep‐alive.")
+
+        self._counters = _PoolCounters()
+        self._transport = _TracedTransport(self._counters, limits=self.limits, http2=self.http2)
+        self._async_transport = _LoopLocalTransport(
+            lambda: _AsyncTracedTransport(self._counters, limits=self.limits, http2=self.http2))
+        self.http_client = httpx.Client(transport=self._transport, timeout=self.timeout)
+        self.http_async_client = httpx.AsyncClient(transport=self._async_transport, timeout=self.timeout)
+
+    def chat_model(self, model_name: str, temperature: Optional[float] = None, **kwargs):
+        """A ChatOpenAI on the shared clients; `kwargs` go to ChatOpenAI (api_key, base_url...)."""
+        from langchain_openai import ChatOpenAI  # heavy import, only needed when no model was injected
+        if temperature is not None:
+            kwargs["temperature"] = temperature
+        kwargs.setdefault("api_key", os.getenv("OPENAI_API_KEY"))
+        return ChatOpenAI(model_name=model_name, http_client=self.http_client,
+                          http_async_client=self.http_async_client, timeout=self.timeout,
+                          max_retries=config.OPENAI_MAX_RETRIES, **kwargs)
+
+    def embeddings(self, **kwargs):
+        """An OpenAIEmbeddings on the shared clients; `kwargs` go to OpenAIEmbeddings."""
+        from langchain_openai import OpenAIEmbeddings  # heavy import, only for the default model
+        return OpenAIEmbeddings(http_client=self.http_client, http_async_client=self.http_async_client,
+                                timeout=self.timeout, max_retries=config.OPENAI_MAX_RETRIES, **kwargs)
+
+    def stats(self) -> Dict:
+        connections = _connections(self._transport)
+        for transport in self._async_transport.transports():
+            connections += _connections(transport)
+        open_connections = [connection for connection in connections if not connection.is_closed()]
+        return {**self._counters.to_dict(),
+                "open_connections": len(open_connections),
+                "idle_connections": sum(connection.is_idle() for connection in open_connections),
+                "http2_connections": sum("HTTP/2" in connection.info() for connection in open_connections),
+                "event_loops": len(self._async_transport.transports()),
+                "max_connections": self.limits.max_connections,
+                "max_keepalive_connections": self.limits.max_keepalive_connections,
+                "http2": self.http2}
+
+    def prometheus_text(self) -> str:
+        stats = self.stats()
+        lines = []
+        for name, kind, help_text in (
+                ("requests", "counter", "Requests sent to the OpenAI API."),
+                ("connections_opened", "counter", "New connections opened to the OpenAI API."),
+                ("open_connections", "gauge", "Open pooled connections to the OpenAI API."),
+                ("idle_connections", "gauge", "Idle keep‐alive connections to the OpenAI API."),
+                ("wait_seconds_max", "gauge", "Longest wait for a connection before sending a request.")):
+            metric = f"iaris_openai_{name}" + ("_total" if kind == "counter" else "")
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} {kind}", f"{metric} {stats[name]}"]
+        return "\n".join(lines) + "\n"
+
+    def close(self):
+        """Close the sync client; async servers should await `aclose()` instead."""
+        self.http_client.close()
+
+    async def aclose(self):
+        """Close the sync client and the async one, with the pooled transports of every event loop."""
+        self.close()
+        await self.http_async_client.aclose()
+
+
+_default_pool: Optional[OpenAIClientPool] = None
+_default_lock = threading.Lock()
+
+
+def get_openai_clients(create: bool = True) -> Optional[OpenAIClientPool]:
+    """The process' OpenAI client pool (each API worker process gets its own)."""
+    global _default_pool
+    with _default_lock:
+        if _default_pool is None and create:
+            _default_pool = OpenAIClientPool()
+        return _default_pool
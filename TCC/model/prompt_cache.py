@@ -0,0 +1,120 @@
+import re
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate, PromptTemplate
+
+import config
+from model.tokens import MODEL_NAME
+
+_VARIABLE = re.compile(r"(?<!\{)\{[A-Za-z_][A-Za-z0-9_]*\}(?!\})")
+
+
+def prompt_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def split_static_prefix(template: str) -> Tuple[str, str]:
+    """
+    Split a prompt into the text before its first {variable} and the rest.
+    The prefix is the same for every question, so sending it first (as the
+    system message) lets the provider reuse its cached prompt prefix.
+    """
+    match = _VARIABLE.search(template)
+    if match is None:
+        return template, ""
+    # Keep the line that introduces the first variable with the variable part
+    cut = template.rfind("\n", 0, match.start()) + 1
+    return template[:cut], template[cut:]
+
+
+class _LRU:
+    """Small thread‐safe LRU dict counting hits and misses."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[Tuple, object]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get_or_build(self, key: Tuple, build):
+        with self._lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            self.misses += 1
+            value = self.entries[key] = build()
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+            return value
+
+    def info(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self.entries)}
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self.hits = self.misses = 0
+
+
+_prompts = _LRU(config.PROMPT_CACHE_SIZE)
+_models = _LRU(config.PROMPT_CACHE_SIZE)
+_chains = _LRU(config.PROMPT_CACHE_SIZE)
+
+
+def get_prompt_template(text: str) -> PromptTemplate:
+    """`PromptTemplate.from_template(text)`, parsed once per distinct prompt text."""
+    return _prompts.get_or_build((prompt_hash(text),), lambda: PromptTemplate.from_template(text))
+
+
+def get_chat_model(model_name: str = MODEL_NAME, temperature: Optional[float] = None):
+    """One ChatOpenAI per set of model parameters, shared by every question, on the pooled HTTP clients."""
+    def build():
+        from model.openai_clients import get_openai_clients  # httpx/openai, only needed when no model was injected
+        return get_openai_clients().chat_model(model_name, temperature)
+    return _models.get_or_build((model_name, temperature), build)
+
+
+def _model_key(llm) -> Tuple:
+    """
+    Cache key of a chat model: the instance and its parameters. The default
+    model is itself shared per parameter set (get_chat_model), and a cached
+    chain keeps its model alive, so the id cannot be reused while cached.
+    """
+    params = getattr(llm, "_identifying_params", None) or {}
+    return (type(llm).__name__, id(llm), tuple(sorted((k, repr(v)) for k, v in params.items())))
+
+
+def get_rag_chain(prompt_template: PromptTemplate, llm=None):
+    """
+    Compiled prompt → LLM → text chain for `prompt_template`, cached by the
+    hash of the prompt text and the model parameters. Reruns and new
+    questions reuse it; editing the prompt compiles a new one.
+    The static part of the prompt goes first as the system message and the
+    part with {question}/{context} follows as the user message.
+    """
+    llm = llm if llm is not None else get_chat_model()
+    template = prompt_template.template
+
+    def build():
+        prefix, variable_part = split_static_prefix(template)
+        messages = [("system", prefix)] if prefix.strip() else []
+        if variable_part:
+            messages.append(("human", variable_part))
+        return ChatPromptTemplate.from_messages(messages, template_format="f-string") | llm | StrOutputParser()
+
+    return _chains.get_or_build((prompt_hash(template), _model_key(llm)), build)
+
+
+def cache_info() -> Dict[str, Dict[str, int]]:
+    return {"prompts": _prompts.info(), "models": _models.info(), "chains": _chains.info()}
+
+
+def clear_caches():
+    for cache in (_prompts, _models, _chains):
+        cache.clear()
@@ -0,0 +1,109 @@
+import os
+import json
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set
+
+from langchain_chroma import Chroma
+
+from model.subject_shards import topic_name
+
+CATALOG_FILE_NAME = "sources.json"
+
+
+class SourceCatalog:
+    """
+    Persisted list of what the vectorstore holds, one entry per source file:
+        { source: {"chunks": int, "subject": str | None, "sha256": str | None} }
+
+    It lives next to the Chroma collection and is updated by every ingestion
+    and sync, so startup reads one small JSON file (O(sources)) instead of
+    pulling every chunk's metadata out of Chroma.
+    """
+
+    def __init__(self, catalog_path: Optional[str] = None):
+        # catalog_path=None keeps the catalog in memory only (non‐persistent Chroma)
+        self.catalog_path = catalog_path
+        self.entries: Dict[str, Dict] = {}
+        if catalog_path and os.path.exists(catalog_path):
+            with open(catalog_path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, source: str):
+        return source in self.entries
+
+    @property
+    def sources(self) -> Set[str]:
+        return set(self.entries)
+
+    @property
+    def total_chunks(self) -> int:
+        return sum(entry["chunks"] for entry in self.entries.values())
+
+    def chunks_per_topic(self) -> Dict[str, int]:
+        """Chunk totals per subject topic (the folder name), for checking the subject shards."""
+        totals: Dict[str, int] = Counter()
+        for entry in self.entries.values():
+            topic = topic_name(entry["subject"])
+            if topic:
+                totals[topic] += entry["chunks"]
+        return dict(totals)
+
+    def subjects_for(self, topics: Iterable[str]) -> List[str]:
+        """Subject folders (as stored in chunk metadata) of the given topic names."""
+        topics = set(topics)
+        return sorted({entry["subject"] for entry in self.entries.values()
+                       if entry["subject"] and topic_name(entry["subject"]) in topics})
+
+    def add(self, source: str, chunks: int, subject: Optional[str] = None, sha256: Optional[str] = None):
+        self.entries[source] = {"chunks": chunks, "subject": subject, "sha256": sha256}
+
+    def remove(self, source: str):
+        self.entries.pop(source, None)
+
+    def save(self):
+        if not self.catalog_path:
+            return
+        os.makedirs(os.path.dirname(self.catalog_path) or ".", exist_ok=True)
+        tmp_path = self.catalog_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, ensure_ascii=False, indent=4)
+        os.replace(tmp_path, self.catalog_path)
+
+    @staticmethod
+    def path_for(vectorstore: Chroma) -> Optional[str]:
+        """Where the catalog of `vectorstore` lives: its persist directory, if it has one."""
+        settings = vectorstore._client.get_settings()
+        if not settings.is_persistent:
+            return None
+        return os.path.join(settings.persist_directory, CATALOG_FILE_NAME)
+
+    @classmethod
+    def for_vectorstore(cls, vectorstore: Chroma, page_size: int = 5000) -> "SourceCatalog":
+        """
+        Load the catalog of `vectorstore`. The chunk total is checked against
+        the collection's count (an O(1) call); only when the file is missing
+        or out of step, e.g. an index built before the catalog existed, are
+        the chunk metadatas scanned once to rebuild it.
+        """
+        catalog = cls(cls.path_for(vectorstore))
+        count = vectorstore._collection.count()
+        if catalog.total_chunks == count:
+            return catalog
+
+        print(f"⚠️ Source catalog out of date ({catalog.total_chunks} of {count} chunks), rebuilding it once...")
+        catalog.entries = {}
+        chunks, subjects = Counter(), {}
+        for offset in range(0, count, page_size):
+            page = vectorstore.get(limit=page_size, offset=offset, include=["metadatas"])
+            for meta in page["metadatas"]:
+                source = (meta or {}).get("source")
+                chunks[source] += 1
+                subjects.setdefault(source, (meta or {}).get("subject"))
+        for source, n in chunks.items():
+            # Chunks without a source still count, so the totals keep matching
+            catalog.add(source if source is not None else "", n, subjects[source])
+        catalog.save()
+        return catalog
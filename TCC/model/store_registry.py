@@ -0,0 +1,216 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+import config
+
+
+@dataclass
+class CorpusSpec:
+    """How to open one corpus: its documents, where its index lives, and DocumentDatabase options."""
+    name: str
+    file_path: str
+    persist_directory: str
+    options: Dict = field(default_factory=dict)
+
+
+@dataclass
+class _OpenStore:
+    db: object
+    size_bytes: int
+    refs: int = 0
+    opened_at: float = field(default_factory=time.time)
+    last_used: float = field(default_factory=time.time)
+
+
+class StoreLease:
+    """
+    A reference to an open corpus. Use it as a context manager (or call
+    `release()` once): while any lease is held the corpus is never evicted.
+    """
+
+    def __init__(self, registry: "StoreRegistry", name: str, db):
+        self.registry = registry
+        self.name = name
+        self.db = db
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self.registry._release(self.name)
+
+    def __enter__(self):
+        return self.db
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+def _default_opener(spec: CorpusSpec):
+    from model.document_database import DocumentDatabase  # heavy import, only when a corpus is opened
+    options = {"chroma_db": None, **spec.options}
+    return DocumentDatabase(file_path=spec.file_path, persist_directory=spec.persist_directory, **options)
+
+
+def _estimate_bytes(db, spec: CorpusSpec) -> int:
+    """
+    Memory footprint of an open corpus, approximated by the size of its
+    persist directory (Chroma loads its HNSW index and reads the SQLite
+    pages from there); in‐memory stores count STORE_BYTES_PER_CHUNK per chunk.
+    """
+    total = 0
+    for root, _, files in os.walk(spec.persist_directory):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    if total:
+        return total
+    vectorstore = getattr(db, "vectorstore", None)
+    chunks = vectorstore._collection.count() if vectorstore is not None else 0
+    return chunks * config.STORE_BYTES_PER_CHUNK
+
+
+class StoreRegistry:
+    """
+    Process‐wide registry of vector stores, one per named corpus (the IARIS
+    documents, crawled web content, client‐specific sets...):
+      • a corpus is opened lazily on its first `acquire`, under a per‐corpus
+        lock, so concurrent first requests open it exactly once while other
+        corpora stay available,
+      • every `acquire` returns a StoreLease; open corpora are reference
+        counted and shared by all leases,
+      • when the open corpora exceed `max_bytes`, the least recently used
+        ones that nobody holds are closed and dropped.
+    """
+
+    def __init__(self, max_bytes: int = None, opener: Callable[[CorpusSpec], object] = None):
+        self.max_bytes = max_bytes if max_bytes is not None else config.STORE_REGISTRY_MAX_BYTES
+        self.opener = opener or _default_opener
+        self._specs: Dict[str, CorpusSpec] = {}
+        self._open: "OrderedDict[str, _OpenStore]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._opening: Dict[str, threading.Lock] = {}
+
+    def register(self, name: str, file_path: str, persist_directory: str = None, **options) -> CorpusSpec:
+        """
+        Declare a corpus. Registering the same settings again is a no‐op;
+        different settings for a corpus that is open raise ValueError instead
+        of being silently ignored.
+        """
+        spec = CorpusSpec(name, file_path, persist_directory or os.path.join(config.STORES_DIRECTORY, name), options)
+        with self._lock:
+            current = self._specs.get(name)
+            if current is not None and current != spec and name in self._open:
+                raise ValueError(f"Corpus {name!r} is open with different settings; evict it before re-registering")
+            self._specs[name] = spec
+        return spec
+
+    def __contains__(self, name: str):
+        return name in self._specs
+
+    @property
+    def corpora(self) -> List[str]:
+        return sorted(self._specs)
+
+    def acquire(self, name: str) -> StoreLease:
+        """Lease the store of corpus `name`, opening it first if needed."""
+        with self._lock:
+            if name not in self._specs:
+                raise KeyError(f"Unknown corpus {name!r}; registered: {sorted(self._specs)}")
+            lease = self._lease(name)
+            if lease is not None:
+                return lease
+            opening = self._opening.setdefault(name, threading.Lock())
+
+        with opening:
+            with self._lock:
+                # Another thread may have opened it while we waited
+                lease = self._lease(name)
+                if lease is not None:
+                    return lease
+                spec = self._specs[name]
+            started_at = time.perf_counter()
+            db = self.opener(spec)
+            size_bytes = _estimate_bytes(db, spec)
+            with self._lock:
+                self._open[name] = _OpenStore(db, size_bytes)
+                lease = self._lease(name)
+                self._evict_idle()
+        print(f"📂 Corpus {name!r} opened in {time.perf_counter() - started_at:.1f}s "
+              f"(~{size_bytes / 2**20:.0f} MB)")
+        return lease
+
+    def _lease(self, name: str) -> Optional[StoreLease]:
+        # Callers hold self._lock
+        store = self._open.get(name)
+        if store is None:
+            return None
+        store.refs += 1
+        store.last_used = time.time()
+        self._open.move_to_end(name)
+        return StoreLease(self, name, store.db)
+
+    def _release(self, name: str):
+        with self._lock:
+            store = self._open.get(name)
+            if store is None:
+                return
+            store.refs -= 1
+            store.last_used = time.time()
+            if store.refs == 0:
+                self._evict_idle()
+
+    def _evict_idle(self):
+        """Close least recently used unreferenced corpora until under max_bytes (callers hold self._lock)."""
+        total = sum(store.size_bytes for store in self._open.values())
+        for name in list(self._open):
+            if total <= self.max_bytes:
+                break
+            store = self._open[name]
+            if store.refs == 0:
+                total -= self._close(name)
+
+    def _close(self, name: str) -> int:
+        store = self._open.pop(name)
+        try:
+            store.db.close()
+        except Exception as e:
+            print(f"⚠️ Could not close corpus {name!r}: {type(e).__name__}: {e}")
+        print(f"♻️ Corpus {name!r} evicted (~{store.size_bytes / 2**20:.0f} MB)")
+        return store.size_bytes
+
+    def evict(self, name: str) -> bool:
+        """Close corpus `name` now if nobody holds it; returns whether it was closed."""
+        with self._lock:
+            store = self._open.get(name)
+            if store is None or store.refs:
+                return False
+            self._close(name)
+            return True
+
+    def stats(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {name: {"open": name in self._open,
+                           "refs": self._open[name].refs if name in self._open else 0,
+                           "size_bytes": self._open[name].size_bytes if name in self._open else 0}
+                    for name in sorted(self._specs)}
+
+
+_registry: Optional[StoreRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_store_registry() -> StoreRegistry:
+    """The process' registry, with the IARIS corpus (config.DATA_DIR, config.PERSIST_DIRECTORY) registered."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = StoreRegistry()
+            _registry.register(config.DEFAULT_CORPUS, config.DATA_DIR, config.PERSIST_DIRECTORY)
+    return _registry
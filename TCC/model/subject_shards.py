@@ -0,0 +1,174 @@
+import os
+import re
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from langchain_core.documents import Document
+from langchain_chroma import Chroma
+
+import config
+
+SHARD_PREFIX = "subject-"
+
+
+def subject_for(document_path: str, subjects: Set[str]) -> Optional[str]:
+    """
+    Subject folder that contains `document_path`, found by walking up its
+    parent folders and looking each one up in `subjects` (O(path depth),
+    whatever the number of subjects).
+    """
+    folder = os.path.dirname(document_path)
+    while folder:
+        if folder in subjects:
+            return folder
+        parent = os.path.dirname(folder)
+        if parent == folder:
+            break
+        folder = parent
+    return None
+
+
+def topic_name(subject: Optional[str]) -> Optional[str]:
+    """Subject folder → topic name as listed in topics.json and used by `filter_list`."""
+    if not subject:
+        return None
+    return os.path.basename(os.path.normpath(subject))
+
+
+def shard_name(topic: str) -> str:
+    # Chroma names allow [a-zA-Z0-9._-] only; the hash keeps accented topics distinct
+    slug = re.sub(r"[^a-zA-Z0-9_-]+", "-", topic).strip("-")[:40] or "topic"
+    return f"{SHARD_PREFIX}{slug}-{hashlib.sha1(topic.encode('utf-8')).hexdigest()[:8]}"
+
+
+def subject_where(subjects: List[str]) -> Dict:
+    """Chroma `where` clause keeping only chunks of the given subject folders."""
+    return {"subject": {"$in": list(subjects)}}
+
+
+def query_collection(vectorstore: Chroma, vectors: List[List[float]], k: int,
+                     where: Dict = None) -> List[List[Tuple[float, Document]]]:
+    """Top‐k (distance, chunk) pairs for each query vector, in one Chroma query (optionally filtered by `where`)."""
+    count = vectorstore._collection.count()
+    if not count or not vectors:
+        return [[] for _ in vectors]
+    result = vectorstore._collection.query(query_embeddings=vectors, n_results=min(k, count), where=where,
+                                           include=["documents", "metadatas", "distances"])
+    return [[(distance, Document(id=chunk_id, page_content=text, metadata=meta or {}))
+             for chunk_id, text, meta, distance in zip(ids, texts, metas, distances)]
+            for ids, texts, metas, distances in zip(result["ids"], result["documents"],
+                                                    result["metadatas"], result["distances"])]
+
+
+class SubjectShards:
+    """
+    One Chroma collection per subject, next to the main collection and
+    holding the same chunk ids and vectors (written from the same embedded
+    batches, so nothing is embedded twice). A filtered query embeds the
+    question once and searches only the selected shards in parallel, so its
+    latency follows the size of those shards rather than the whole corpus.
+    Unfiltered queries keep using the main collection.
+    """
+
+    def __init__(self, vectorstore: Chroma, max_workers: int = None):
+        self.vectorstore = vectorstore
+        self.max_workers = max_workers or config.SHARD_SEARCH_WORKERS
+        self._shards: Dict[str, Chroma] = {}
+        for collection in vectorstore._client.list_collections():
+            name = collection if isinstance(collection, str) else collection.name
+            if name.startswith(SHARD_PREFIX):
+                shard = self._open(name)
+                self._shards[shard._collection.metadata["subject"]] = shard
+
+    def _open(self, name: str, topic: str = None) -> Chroma:
+        return Chroma(client=self.vectorstore._client, collection_name=name,
+                      embedding_function=self.vectorstore.embeddings,
+                      collection_metadata={"subject": topic} if topic else None)
+
+    def __len__(self):
+        return len(self._shards)
+
+    @property
+    def topics(self) -> List[str]:
+        return sorted(self._shards)
+
+    def shard(self, topic: str) -> Chroma:
+        if topic not in self._shards:
+            self._shards[topic] = self._open(shard_name(topic), topic)
+        return self._shards[topic]
+
+    def counts(self) -> Dict[str, int]:
+        return {topic: shard._collection.count() for topic, shard in self._shards.items()}
+
+    def add(self, ids: List[str], documents: List[Document], vectors: List[List[float]]):
+        """Route already embedded chunks to the shard of their subject; chunks without one stay main‐only."""
+        groups: Dict[str, List[int]] = {}
+        for i, doc in enumerate(documents):
+            topic = topic_name(doc.metadata.get("subject"))
+            if topic:
+                groups.setdefault(topic, []).append(i)
+        for topic, rows in groups.items():
+            self.shard(topic)._collection.upsert(
+                ids=[ids[i] for i in rows],
+                embeddings=[vectors[i] for i in rows],
+                metadatas=[documents[i].metadata or None for i in rows],
+                documents=[documents[i].page_content for i in rows],
+            )
+
+    def delete_source(self, source: str):
+        for shard in self._shards.values():
+            shard._collection.delete(where={"source": source})
+
+    def search(self, query: str, topics: Iterable[str], k: int) -> List[Document]:
+        """Top‐k chunks across the shards of `topics`, merged by distance."""
+        if not any(topic in self._shards for topic in topics):
+            return []
+        return self.search_by_vectors([self.vectorstore.embeddings.embed_query(query)], topics, k)[0]
+
+    def search_by_vectors(self, vectors: List[List[float]], topics: Iterable[str], k: int) -> List[List[Document]]:
+        """
+        `search` for already embedded queries: each selected shard is queried
+        once for all of them, and the hits are merged per query by distance.
+        """
+        shards = [self._shards[topic] for topic in dict.fromkeys(topics) if topic in self._shards]
+        if not shards:
+            return [[] for _ in vectors]
+
+        if len(shards) == 1:
+            per_shard = [query_collection(shards[0], vectors, k)]
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(shards))) as executor:
+                per_shard = list(executor.map(lambda shard: query_collection(shard, vectors, k), shards))
+        results = []
+        for i in range(len(vectors)):
+            hits = sorted((hit for shard_hits in per_shard for hit in shard_hits[i]), key=lambda hit: hit[0])
+            results.append([doc for _, doc in hits[:k]])
+        return results
+
+    @classmethod
+    def for_vectorstore(cls, vectorstore: Chroma, expected: Dict[str, int],
+                        page_size: int = 5000) -> "SubjectShards":
+        """
+        Open the shards of `vectorstore`. `expected` is chunks per topic (from
+        the source catalog); when the shards do not match it, e.g. an index
+        built before sharding, they are rebuilt once from the stored vectors.
+        """
+        shards = cls(vectorstore)
+        # Shards emptied by a sync may linger with 0 chunks; they do not make the index stale
+        actual = {topic: n for topic, n in shards.counts().items() if n}
+        if actual == {topic: n for topic, n in expected.items() if n}:
+            return shards
+
+        print(f"⚠️ Subject shards out of date, rebuilding {len(expected)} shards once...")
+        for topic in list(shards._shards):
+            vectorstore._client.delete_collection(shard_name(topic))
+        shards._shards = {}
+        count = vectorstore._collection.count()
+        for offset in range(0, count, page_size):
+            page = vectorstore._collection.get(limit=page_size, offset=offset,
+                                               include=["embeddings", "documents", "metadatas"])
+            documents = [Document(page_content=text or "", metadata=meta or {})
+                         for text, meta in zip(page["documents"], page["metadatas"])]
+            shards.add(page["ids"], documents, [list(vector) for vector in page["embeddings"]])
+        return shards
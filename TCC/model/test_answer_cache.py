@@ -0,0 +1,122 @@
+# model/test_answer_cache.py
+
+import io
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from typing import List
+from unittest.mock import patch
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.prompts import PromptTemplate
+
+import config
+from model.answer_cache import AnswerCache, replay_tokens
+from model.document_database import DocumentDatabase
+
+
+class KeywordEmbeddings(Embeddings):
+    """Bag‐of‐keywords vectors: queries sharing keywords land close together."""
+
+    VOCABULARY = ["teoria", "mudança", "impacto", "medir", "gri", "relatório"]
+
+    def _vector(self, text: str) -> List[float]:
+        words = text.lower().replace("?", "").split()
+        return [float(words.count(term)) for term in self.VOCABULARY] + [0.01]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._vector(text)
+
+
+class TestAnswerCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = AnswerCache(KeywordEmbeddings(), threshold=0.9, ttl=60, max_entries=2)
+        self.key = AnswerCache.make_key(PromptTemplate.from_template("{question} {context}"), 4)
+
+    def test_similar_question_hits(self):
+        self.cache.store("O que é teoria da mudança?", self.key, "Resposta sobre TdM", ["tdm.txt"])
+        hit = self.cache.lookup("o que é a teoria da mudança", self.key)
+        self.assertIsNotNone(hit)
+        self.assertEqual(hit.sources, ["tdm.txt"])
+        self.assertIsNone(self.cache.lookup("Como medir impacto?", self.key))
+
+    def test_key_includes_prompt_and_k(self):
+        self.cache.store("O que é teoria da mudança?", self.key, "Resposta", [])
+        edited = AnswerCache.make_key(PromptTemplate.from_template("Seja breve. {question} {context}"), 4)
+        other_k = AnswerCache.make_key(PromptTemplate.from_template("{question} {context}"), 8)
+        self.assertIsNone(self.cache.lookup("O que é teoria da mudança?", edited))
+        self.assertIsNone(self.cache.lookup("O que é teoria da mudança?", other_k))
+
+    def test_ttl_and_lru_eviction(self):
+        with patch("model.answer_cache.time.time", return_value=1000.0):
+            self.cache.store("teoria mudança", self.key, "A", [])
+            self.cache.store("medir impacto", self.key, "B", [])
+            self.cache.lookup("teoria mudança", self.key)
+            self.cache.store("relatório gri", self.key, "C", [])
+            # "medir impacto" was the least recently used
+            self.assertIsNone(self.cache.lookup("medir impacto", self.key))
+            self.assertEqual(len(self.cache), 2)
+        with patch("model.answer_cache.time.time", return_value=1000.0 + 61):
+            self.assertIsNone(self.cache.lookup("teoria mudança", self.key))
+            self.assertEqual(len(self.cache), 0)
+
+    def test_clear_one_corpus(self):
+        other = AnswerCache.make_key(PromptTemplate.from_template("{question} {context}"), 4, corpus="/stores/gri")
+        self.cache.store("teoria mudança", self.key, "A", [])
+        self.cache.store("teoria mudança", other, "B", [])
+        self.cache.clear(corpus="/stores/gri")
+        self.assertIsNone(self.cache.lookup("teoria mudança", other))
+        self.assertEqual(self.cache.lookup("teoria mudança", self.key).answer, "A")
+
+    def test_replay_tokens_round_trip(self):
+        text = "Olá!  Aqui vai:\n- item 1\n- item 2"
+        self.assertEqual("".join(replay_tokens(text)), text)
+
+
+@patch.object(config, "ANSWER_CACHE_ENABLED", True)
+@patch.object(config, "METRICS_ENABLED", False)
+class TestAnswerCacheInvalidation(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.data_dir = os.path.join(self.tmp_dir.name, "data")
+        for name, text in (("tdm/a.txt", "teoria da mudança e impacto"), ("ods/b.txt", "medir impacto dos ODS")):
+            os.makedirs(os.path.join(self.data_dir, os.path.dirname(name)), exist_ok=True)
+            with open(os.path.join(self.data_dir, name), "w", encoding="utf-8") as f:
+                f.write(text)
+        self.cache = AnswerCache(KeywordEmbeddings(), threshold=0.9, ttl=60, max_entries=10)
+        self.output = redirect_stdout(io.StringIO())
+        self.output.__enter__()
+
+    def tearDown(self):
+        self.output.__exit__(None, None, None)
+        self.tmp_dir.cleanup()
+
+    def test_sync_that_removes_a_source_drops_cached_answers(self):
+        with patch("model.document_database.get_answer_cache", return_value=self.cache):
+            db = DocumentDatabase(chroma_db=None, file_path=self.data_dir, retriever_k=2,
+                                  embeddings=KeywordEmbeddings(), llm=FakeListChatModel(responses=["ok"] * 4),
+                                  retrieval_mode="vector", persist_directory=os.path.join(self.tmp_dir.name, "db"))
+        removed = os.path.join(self.data_dir, "ods", "b.txt")
+        self.assertIn(removed, db.run_rag("medir impacto", messages=[], stream=False)["sources"])
+        self.assertTrue(db.run_rag("medir impacto", messages=[], stream=False)["cache_hit"])
+
+        db.sync_chroma_db()  # nothing changed: the cache is kept
+        self.assertTrue(db.run_rag("medir impacto", messages=[], stream=False)["cache_hit"])
+
+        os.remove(removed)
+        db.sync_chroma_db()
+        response = db.run_rag("medir impacto", messages=[], stream=False)
+        self.assertFalse(response["cache_hit"])
+        self.assertNotIn(removed, response["sources"])
+        db.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,153 @@
+# model/test_archive_source.py
+
+import io
+import os
+import json
+import shutil
+import zipfile
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from typing import List
+from unittest.mock import patch
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+import config
+from model.document_database import DocumentDatabase
+
+MEMBERS = {
+    "gri/relatorio.txt": "Relatório GRI com indicadores ambientais.",
+    "ods/agenda.txt": "Os ODS orientam metas globais da Agenda 2030.",
+    "ods/metas/saude.txt": "ODS 3: saúde e bem‐estar.",
+    "leia-me.txt": "Corpus de teste.",
+    "ods/tabela.csv": "não é um documento",
+    "__MACOSX/ods/._agenda.txt": "lixo do macOS",
+}
+
+
+class FakeEmbeddings(Embeddings):
+    def __init__(self):
+        self.texts_embedded = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.texts_embedded += len(texts)
+        return [[float(len(text)), 1.0] for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return [float(len(text)), 1.0]
+
+
+class TestArchiveIngestion(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.data_dir = os.path.join(self.tmp_dir.name, "data")
+        self.archive_path = os.path.join(self.data_dir, "downloaded.zip")
+        self.persist_dir = os.path.join(self.tmp_dir.name, "chroma_db")
+        os.makedirs(self.data_dir)
+        self.embeddings = FakeEmbeddings()
+        self.patches = [
+            patch.object(config, "ANSWER_CACHE_ENABLED", False),
+            patch.object(config, "METRICS_ENABLED", False),
+        ]
+        for p in self.patches:
+            p.start()
+        self.output = redirect_stdout(io.StringIO())
+        self.output.__enter__()
+
+    def tearDown(self):
+        self.output.__exit__(None, None, None)
+        for p in self.patches:
+            p.stop()
+        self.tmp_dir.cleanup()
+
+    def _write_archive(self, members):
+        with zipfile.ZipFile(self.archive_path, "w", zipfile.ZIP_DEFLATED) as archive:
+            for name, text in members.items():
+                archive.writestr(name, text)
+
+    def _build(self, file_path, persist_dir, archive_prefix=""):
+        return DocumentDatabase(chroma_db=None, file_path=file_path, embeddings=self.embeddings,
+                                llm=FakeListChatModel(responses=["ok"]), persist_directory=persist_dir,
+                                archive_prefix=archive_prefix)
+
+    def _chunks(self, db):
+        page = db.vectorstore.get(include=["documents", "metadatas"])
+        return sorted((text, json.dumps(meta, sort_keys=True)) for text, meta in zip(page["documents"], page["metadatas"]))
+
+    def _topics(self, persist_dir):
+        with open(os.path.join(persist_dir, "topics.json"), encoding="utf-8") as f:
+            return sorted(json.load(f))
+
+    def test_archive_indexes_the_same_chunks_as_the_extracted_folder(self):
+        self._write_archive(MEMBERS)
+        from_archive = self._build(self.archive_path, self.persist_dir)
+        self.assertEqual(sorted(os.listdir(self.data_dir)), ["downloaded.zip"])  # nothing extracted
+
+        with zipfile.ZipFile(self.archive_path) as archive:
+            archive.extractall(self.data_dir)
+        shutil.rmtree(os.path.join(self.data_dir, "__MACOSX"))  # skipped in the archive
+        extracted_persist_dir = os.path.join(self.tmp_dir.name, "extracted_db")
+        from_folder = self._build(self.data_dir, extracted_persist_dir)
+
+        self.assertEqual(len(from_archive.sources), 4)
+        self.assertEqual(self._chunks(from_archive), self._chunks(from_folder))
+        self.assertEqual(from_archive.sources.entries, from_folder.sources.entries)
+        self.assertEqual(from_archive.shards.counts(), {"gri": 1, "ods": 2})
+        self.assertEqual(self._topics(self.persist_dir), ["gri", "ods"])
+        from_archive.close()
+        from_folder.close()
+
+    def test_subjects_are_the_folders_below_the_archive_prefix(self):
+        nested = {f"IARIS_DATA/{name}": text for name, text in MEMBERS.items() if not name.startswith("__MACOSX")}
+        nested["LEIA-ME.txt"] = "Fora da pasta de dados."
+        self._write_archive(nested)
+        with patch.object(config, "ARCHIVE_PREFIX", "IARIS_DATA/"):
+            from_archive = self._build(self.archive_path, self.persist_dir, archive_prefix=None)
+
+        with zipfile.ZipFile(self.archive_path) as archive:
+            archive.extractall(self.data_dir)
+        from_folder = self._build(os.path.join(self.data_dir, "IARIS_DATA"), os.path.join(self.tmp_dir.name, "extracted_db"))
+
+        self.assertEqual(self._chunks(from_archive), self._chunks(from_folder))
+        self.assertEqual(from_archive.shards.counts(), {"gri": 1, "ods": 2})
+        self.assertEqual(self._topics(self.persist_dir), ["gri", "ods"])
+        self.assertEqual(from_archive.sources.entries[os.path.join(self.data_dir, "IARIS_DATA", "ods", "agenda.txt")]["subject"],
+                         os.path.join(self.data_dir, "IARIS_DATA", "ods"))
+        from_archive.close()
+        from_folder.close()
+
+    def test_a_prefix_missing_from_the_archive_is_an_error(self):
+        self._write_archive(MEMBERS)
+        with self.assertRaises(ValueError):
+            self._build(self.archive_path, self.persist_dir, archive_prefix="IARIS_DATA/")
+
+    def test_unchanged_members_are_skipped_on_the_next_archive(self):
+        self._write_archive(MEMBERS)
+        self._build(self.archive_path, self.persist_dir).close()
+        first_run = self.embeddings.texts_embedded
+
+        members = dict(MEMBERS, **{"ods/agenda.txt": "Agenda 2030, edição revisada.", "tdm/teoria.txt": "Teoria da Mudança."})
+        del members["gri/relatorio.txt"]
+        self._write_archive(members)
+        db = self._build(self.archive_path, self.persist_dir)
+        self.assertEqual(self.embeddings.texts_embedded, first_run)  # an existing index is only loaded
+
+        diff = db.sync_chroma_db()
+        agenda, teoria, relatorio = (os.path.join(self.data_dir, *name.split("/"))
+                                     for name in ("ods/agenda.txt", "tdm/teoria.txt", "gri/relatorio.txt"))
+        self.assertEqual((diff.added, diff.changed, diff.removed), ([teoria], [agenda], [relatorio]))
+        self.assertEqual(len(diff.unchanged), 2)
+        self.assertEqual(self.embeddings.texts_embedded, first_run + 2)
+        self.assertNotIn(relatorio, db.sources)
+        self.assertEqual(len(db.vectorstore.get()["ids"]), 4)
+        self.assertEqual(self._topics(self.persist_dir), ["ods", "tdm"])
+
+        db.sync_chroma_db()
+        self.assertEqual(self.embeddings.texts_embedded, first_run + 2)
+        db.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+# model/test_batch_rag.py
+
+import io
+import os
+import json
+import time
+import tempfile
+import threading
+import unittest
+from contextlib import redirect_stdout
+from typing import List
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from model.testing import FakeEmbeddings, build_test_database, write_files
+
+QUESTIONS = ["O que é Teoria da Mudança?", "Como fazer um relatório GRI?", "O que são os ODS?",
+             "Como engajar stakeholders?", "Como medir impacto social?"]
+
+
+class FailingEmbeddings(FakeEmbeddings):
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        raise ConnectionError("embedding API down")
+
+
+_lock = threading.Lock()
+
+
+class SlowChatModel(FakeListChatModel):
+    """Answers after a short sleep and remembers how many calls overlapped."""
+    active: int = 0
+    peak: int = 0
+
+    def _call(self, *args, **kwargs):
+        with _lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(0.05)
+        with _lock:
+            self.active -= 1
+        return super()._call(*args, **kwargs)
+
+
+class TestBatchRAG(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.data_dir = os.path.join(self.tmp_dir.name, "data")
+        self.tdm, _, _ = write_files(self.data_dir, {
+            "tdm.txt": "Teoria da Mudança conecta atividades a impactos.",
+            "gri.txt": "O relatório GRI segue as normas de sustentabilidade.",
+            "ods.txt": "Os ODS são 17 objetivos da ONU.",
+        })
+        self.embeddings = FakeEmbeddings()
+        self.db = build_test_database(self.data_dir, os.path.join(self.tmp_dir.name, "chroma_db"),
+                                      embeddings=self.embeddings, llm=FakeListChatModel(responses=["resposta"]),
+                                      retriever_k=2, retrieval_mode="hybrid")
+        self.embeddings.calls = 0
+
+    def tearDown(self):
+        self.db.close()
+        self.tmp_dir.cleanup()
+
+    def _run(self, **kwargs):
+        with redirect_stdout(io.StringIO()):
+            return self.db.run_rag_batch(QUESTIONS, **kwargs)
+
+    def test_results_stream_to_jsonl_and_come_back_in_order(self):
+        output_path = os.path.join(self.tmp_dir.name, "eval", "results.jsonl")
+        records = self._run(output_path=output_path, batch_size=2)
+
+        self.assertEqual([record["query"] for record in records], QUESTIONS)
+        with open(output_path, "r", encoding="utf-8") as f:
+            lines = [json.loads(line) for line in f]
+        self.assertEqual(sorted(line["index"] for line in lines), list(range(len(QUESTIONS))))
+        for record in records:
+            self.assertIsNone(record["error"])
+            self.assertEqual(record["answer"], "resposta")
+            self.assertTrue(record["sources"])
+            self.assertGreater(record["context_tokens"], 0)
+            self.assertTrue({"embed_batch", "retrieve_batch", "format_context", "generate", "latency"}
+                            <= set(record["timings"]))
+
+    def test_queries_are_embedded_once_per_batch(self):
+        self._run(batch_size=2)
+        self.assertEqual(self.embeddings.calls, 3)  # 5 questions in batches of 2
+
+    def test_lexical_mode_makes_no_embedding_calls(self):
+        self.db.retrieval_mode = "lexical"
+        records = self._run()
+        self.assertEqual(self.embeddings.calls, 0)
+        self.assertEqual(records[0]["sources"][0], self.tdm)
+
+    def test_per_run_settings_leave_the_shared_database_alone(self):
+        records = self._run(retrieval_mode="lexical", retriever_k=1)
+        self.assertEqual(self.embeddings.calls, 0)
+        self.assertEqual(max(len(record["sources"]) for record in records), 1)
+        self.assertEqual((self.db.retrieval_mode, self.db.retriever_k), ("hybrid", 2))
+
+    def test_generations_are_bounded_by_max_concurrency(self):
+        self.db.llm = SlowChatModel(responses=["resposta"])
+        records = self._run(max_concurrency=2)
+        self.assertTrue(all(record["answer"] == "resposta" for record in records))
+        self.assertEqual(self.db.llm.peak, 2)
+
+    def test_failed_retrieval_is_reported_per_question(self):
+        self.db.vectorstore._embedding_function = FailingEmbeddings()
+        records = self._run(batch_size=10)
+        self.assertTrue(all("ConnectionError" in record["error"] for record in records))
+        self.assertTrue(all(record["answer"] is None for record in records))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+# model/test_context_assembly.py
+
+import io
+import unittest
+from contextlib import redirect_stdout
+from unittest.mock import patch
+
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from model.context_assembly import assemble_context, merge_chunks, drop_near_duplicates
+from model import tokens
+from model.tokens import count_tokens, truncate_to_tokens
+
+TEXT = " ".join(f"Frase {i} sobre metas de sustentabilidade e indicadores GRI." for i in range(40))
+
+
+def split(text: str, source: str, add_start_index: bool = True):
+    splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50, add_start_index=add_start_index)
+    return splitter.split_documents([Document(page_content=text, metadata={"source": source})])
+
+
+class TestContextAssembly(unittest.TestCase):
+    def test_adjacent_chunks_are_merged_back_into_the_source_text(self):
+        chunks = split(TEXT, "a.txt")
+        spans = merge_chunks(list(reversed(chunks)))
+        self.assertEqual(len(spans), 1)
+        self.assertEqual(spans[0].text, TEXT)
+        self.assertEqual(spans[0].chunks, len(chunks))
+
+    def test_overlap_is_detected_without_start_index(self):
+        chunks = split(TEXT, "a.txt", add_start_index=False)[:3]
+        spans = merge_chunks(chunks)
+        self.assertEqual(len(spans), 1)
+        self.assertTrue(TEXT.startswith(spans[0].text))
+
+    def test_distant_chunks_and_other_sources_stay_apart(self):
+        chunks = split(TEXT, "a.txt")
+        other = Document(page_content="Outro documento.", metadata={"source": "b.txt", "start_index": 0})
+        spans = merge_chunks([chunks[0], other, chunks[-1]])
+        self.assertEqual([span.source for span in spans], ["a.txt", "b.txt", "a.txt"])
+
+    def test_near_duplicates_are_dropped(self):
+        chunk = split(TEXT, "a.txt")[0]
+        copy = Document(page_content=chunk.page_content, metadata={"source": "copia.txt"})
+        spans = drop_near_duplicates(merge_chunks([chunk, copy]), threshold=0.9)
+        self.assertEqual([span.source for span in spans], ["a.txt"])
+
+    def test_context_fits_the_token_budget_and_reports_savings(self):
+        chunks = split(TEXT, "a.txt") + split(TEXT.upper(), "b.txt")
+        with redirect_stdout(io.StringIO()) as output:
+            context = assemble_context(chunks, token_budget=200)
+        self.assertLessEqual(count_tokens(context.text), 200)
+        self.assertEqual(context.tokens, count_tokens(context.text))
+        self.assertGreater(context.tokens_saved, 0)
+        self.assertEqual(output.getvalue(), "")  # sizes go to the metrics recorder, not stdout
+
+    def test_oversized_best_span_is_truncated(self):
+        with redirect_stdout(io.StringIO()):
+            context = assemble_context(split(TEXT, "a.txt"), token_budget=50)
+        self.assertTrue(context.text)
+        self.assertLessEqual(count_tokens(context.text), 50)
+        self.assertTrue(TEXT.startswith(context.text))
+
+    def test_token_cache_keeps_only_chunk_sized_texts(self):
+        tokens.clear_token_cache()
+        context = " ".join([TEXT] * 2)
+        self.assertGreater(len(context), tokens.CACHED_TEXT_MAX_CHARS)
+        truncate_to_tokens(context, 50)  # neither a context this long nor its prefixes are cached
+        self.assertEqual(len(tokens._counts), 0)
+
+        chunks = [chunk.page_content for chunk in split(TEXT, "a.txt")]
+        with patch.object(tokens, "CACHE_MAX_CHARS", len(chunks[0]) * 2):
+            for chunk in chunks:
+                count_tokens(chunk)
+            self.assertLessEqual(tokens._cached_chars, len(chunks[0]) * 2)
+        self.assertIn(chunks[-1], tokens._counts)
+        self.assertEqual(tokens._cached_chars, sum(map(len, tokens._counts)))
+        tokens.clear_token_cache()
+
+    def test_no_chunks(self):
+        self.assertEqual(assemble_context([]).text, "")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+# model/test_conversation_memory.py
+
+import io
+import threading
+import unittest
+from contextlib import redirect_stdout
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+import config
+from model.conversation_memory import ConversationMemory
+from model.tokens import count_tokens
+
+LONG_ANSWER = "1. Olá, gestor! " + "Explicação detalhada sobre Teoria da Mudança e indicadores. " * 80
+
+
+class FailingChatModel(FakeListChatModel):
+    def invoke(self, *args, **kwargs):
+        raise ConnectionError("offline")
+
+
+class TestConversationMemory(unittest.TestCase):
+    def setUp(self):
+        self.llm = FakeListChatModel(responses=["Resumo 1", "Resumo 2", "Resumo 3", "Resumo 4"])
+        self.memory = ConversationMemory(max_turns=2, turn_tokens=100, summary_tokens=50, llm=self.llm)
+
+    def test_recent_turns_are_kept_verbatim_and_older_ones_summarized(self):
+        with redirect_stdout(io.StringIO()):
+            for i in range(3):
+                self.memory.add_turn(f"pergunta {i}", f"resposta {i}")
+            messages = self.memory.messages()
+
+        self.assertEqual(messages[0], {"role": "system", "content": "Resumo da conversa até aqui: Resumo 1"})
+        self.assertEqual([m["content"] for m in messages[1:]],
+                         ["pergunta 1", "resposta 1", "pergunta 2", "resposta 2"])
+        self.assertEqual(len(self.memory), 3)
+
+    def test_summary_is_updated_once_per_evicted_turn(self):
+        with redirect_stdout(io.StringIO()):
+            for i in range(2):
+                self.memory.add_turn(f"pergunta {i}", "resposta")
+            self.memory.messages()
+            self.assertEqual(self.llm.i, 0)  # nothing evicted yet, no LLM call
+
+            for i in range(2, 5):
+                self.memory.add_turn(f"pergunta {i}", "resposta")
+            self.memory.messages()
+            self.memory.messages()  # re-reading the history does not summarize again
+
+        self.assertEqual(self.llm.i, 3)
+        self.assertEqual(self.memory.summary, "Resumo 3")
+        self.assertEqual(self.memory.summarized_turns, 3)
+
+    def test_prompt_size_stays_bounded_in_long_sessions(self):
+        sizes = []
+        with redirect_stdout(io.StringIO()):
+            for i in range(12):
+                self.llm.i = 0
+                self.memory.add_turn(f"pergunta {i}", LONG_ANSWER)
+                sizes.append(sum(count_tokens(m["content"]) for m in self.memory.messages()))
+
+        self.assertEqual(max(sizes[2:]), min(sizes[2:]))
+        self.assertLessEqual(sizes[-1], 2 * 2 * 100 + 50 + 20)
+
+    def test_questions_are_kept_when_the_summary_call_fails(self):
+        memory = ConversationMemory(max_turns=1, llm=FailingChatModel(responses=[""]))
+        with redirect_stdout(io.StringIO()):
+            memory.add_turn("O que é Teoria da Mudança?", "resposta")
+            memory.add_turn("E como medir impacto?", "resposta")
+            messages = memory.messages()
+
+        self.assertIn("O que é Teoria da Mudança?", messages[0]["content"])
+        self.assertEqual(messages[1]["content"], "E como medir impacto?")
+
+
+    def test_sessions_share_one_summary_pool(self):
+        sessions = [ConversationMemory(max_turns=1, llm=FakeListChatModel(responses=["Resumo"])) for _ in range(20)]
+        with redirect_stdout(io.StringIO()):
+            for memory in sessions:
+                memory.add_turn("pergunta 1", "resposta")
+                memory.add_turn("pergunta 2", "resposta")
+            for memory in sessions:
+                memory.wait()
+
+        self.assertTrue(all(memory.summary == "Resumo" for memory in sessions))
+        workers = [t for t in threading.enumerate() if t.name.startswith("memory-summary")]
+        self.assertLessEqual(len(workers), config.MEMORY_SUMMARY_WORKERS)
+
+
+if __name__ == "__main__":
+    unittest.main()
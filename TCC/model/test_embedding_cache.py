@@ -0,0 +1,98 @@
+# model/test_embedding_cache.py
+
+import os
+import tempfile
+import threading
+import unittest
+from array import array
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+
+from model.embedding_cache import CachedEmbeddings
+
+
+class CountingEmbeddings(Embeddings):
+    """Deterministic stand‐in for OpenAIEmbeddings that counts API calls."""
+
+    model = "fake-embedding"
+
+    def __init__(self):
+        self.document_calls = 0
+        self.query_calls = 0
+        self.texts_embedded = 0
+
+    def _vector(self, text: str) -> List[float]:
+        return [float(len(text)), float(sum(map(ord, text)) % 97), 1.0]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.document_calls += 1
+        self.texts_embedded += len(texts)
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        self.query_calls += 1
+        return self._vector(text)
+
+
+class TestCachedEmbeddings(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache_path = os.path.join(self.tmp_dir.name, "embeddings.sqlite3")
+        self.fake = CountingEmbeddings()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_rebuild_costs_no_api_calls(self):
+        texts = ["Teoria da Mudança", "GRI", "ODS", "GRI"]
+        first = CachedEmbeddings(self.fake, cache_path=self.cache_path).embed_documents(texts)
+        self.assertEqual(self.fake.document_calls, 1)
+        # Duplicates inside one batch are only embedded once
+        self.assertEqual(self.fake.texts_embedded, 3)
+
+        # A fresh instance (new process) reads everything back from disk
+        second = CachedEmbeddings(self.fake, cache_path=self.cache_path).embed_documents(texts)
+        self.assertEqual(self.fake.document_calls, 1)
+        self.assertEqual(first, second)
+
+    def test_repeated_query_hits_cache(self):
+        cache = CachedEmbeddings(self.fake, cache_path=self.cache_path)
+        vector = cache.embed_query("Como medir impacto?")
+        self.assertEqual(cache.embed_query("Como medir impacto?"), vector)
+        self.assertEqual(self.fake.query_calls, 1)
+        self.assertEqual(cache.hits, 1)
+
+    def test_key_includes_model_name(self):
+        CachedEmbeddings(self.fake, cache_path=self.cache_path).embed_documents(["GRI"])
+        other_model = CountingEmbeddings()
+        other_model.model = "another-model"
+        CachedEmbeddings(other_model, cache_path=self.cache_path).embed_documents(["GRI"])
+        self.assertEqual(other_model.document_calls, 1)
+
+    def test_lru_is_bounded(self):
+        cache = CachedEmbeddings(self.fake, cache_path=self.cache_path, lru_size=2)
+        cache.embed_documents(["a", "b", "c"])
+        self.assertEqual(len(cache._lru), 2)
+
+    def test_lru_holds_float32_arrays_and_returns_lists(self):
+        cache = CachedEmbeddings(self.fake, cache_path=self.cache_path)
+        vectors = cache.embed_documents(["GRI", "ODS"])
+        self.assertTrue(all(isinstance(vector, array) and vector.typecode == "f" for vector in cache._lru.values()))
+        self.assertEqual(vectors, [self.fake._vector("GRI"), self.fake._vector("ODS")])
+        self.assertIsInstance(cache.embed_query("GRI"), list)
+
+    def test_counters_are_exact_under_concurrency(self):
+        cache = CachedEmbeddings(self.fake, cache_path=self.cache_path)
+        cache.embed_query("GRI")
+        threads = [threading.Thread(target=lambda: [cache.embed_query("GRI") for _ in range(200)]) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual((cache.hits, cache.misses), (1600, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,149 @@
+# model/test_ingestion.py
+
+import time
+import tempfile
+import threading
+import unittest
+from typing import List
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_chroma import Chroma
+
+from model.ingestion import EmbeddingPipeline, TokenBucket, prefetch
+
+
+class FakeRateLimitError(Exception):
+    status_code = 429
+
+
+class StubEmbeddingServer(Embeddings):
+    """
+    Stand‐in for the OpenAI embedding endpoint: answers after `latency` seconds,
+    fails the first `rate_limited_calls` requests with a 429 and records the
+    highest number of requests it saw at the same time.
+    """
+
+    def __init__(self, latency: float = 0.01, rate_limited_calls: int = 0):
+        self.latency = latency
+        self.rate_limited_calls = rate_limited_calls
+        self.calls = 0
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        with self._lock:
+            self.calls += 1
+            if self.calls <= self.rate_limited_calls:
+                raise FakeRateLimitError("429 Too Many Requests")
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(self.latency)
+        with self._lock:
+            self.active -= 1
+        return [[float(len(text)), 1.0] for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return [float(len(text)), 1.0]
+
+
+class TestEmbeddingPipeline(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.docs = [Document(page_content=f"chunk {i}", metadata={"source": f"doc{i % 3}.txt"})
+                     for i in range(50)]
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _vectorstore(self, embeddings):
+        return Chroma(collection_name="test_ingestion", embedding_function=embeddings,
+                      persist_directory=self.tmp_dir.name)
+
+    def test_all_chunks_written_with_bounded_concurrency(self):
+        server = StubEmbeddingServer()
+        vectorstore = self._vectorstore(server)
+        stats = EmbeddingPipeline(vectorstore, batch_size=8, max_concurrency=3,
+                                  requests_per_second=1000).run(self.docs)
+
+        self.assertEqual(stats.chunks, 50)
+        self.assertEqual(stats.batches, 7)
+        self.assertLessEqual(server.max_active, 3)
+        self.assertGreater(stats.chunks_per_second, 0)
+        self.assertEqual(len(vectorstore.get()["ids"]), 50)
+
+    def test_rate_limited_batches_are_retried(self):
+        server = StubEmbeddingServer(rate_limited_calls=2)
+        vectorstore = self._vectorstore(server)
+        stats = EmbeddingPipeline(vectorstore, batch_size=25, max_concurrency=1, requests_per_second=1000,
+                                  base_backoff=0.01).run(self.docs)
+
+        self.assertEqual(stats.retries, 2)
+        self.assertEqual(len(vectorstore.get()["ids"]), 50)
+
+    def test_non_retryable_errors_propagate(self):
+        class BrokenEmbeddings(StubEmbeddingServer):
+            def embed_documents(self, texts):
+                raise ValueError("bad input")
+
+        vectorstore = self._vectorstore(BrokenEmbeddings())
+        with self.assertRaises(ValueError):
+            EmbeddingPipeline(vectorstore, batch_size=25, requests_per_second=1000).run(self.docs)
+
+
+class TestPrefetch(unittest.TestCase):
+
+    def test_producer_is_bounded_by_queue(self):
+        produced = []
+
+        def producer():
+            for i in range(100):
+                produced.append(i)
+                yield i
+
+        stream = prefetch(producer(), maxsize=4)
+        self.assertEqual(next(stream), 0)
+        time.sleep(0.2)
+        # One item consumed, at most 4 buffered and 1 blocked in put()
+        self.assertLessEqual(len(produced), 6)
+        self.assertEqual(list(stream), list(range(1, 100)))
+
+    def test_producer_errors_reach_consumer(self):
+        def producer():
+            yield 1
+            raise IOError("disk gone")
+
+        with self.assertRaises(IOError):
+            list(prefetch(producer(), maxsize=2))
+
+
+    def test_producer_exits_when_consumer_stops_with_a_full_queue(self):
+        threads = []
+
+        def producer():
+            threads.append(threading.current_thread())
+            yield from range(2)
+
+        stream = prefetch(producer(), maxsize=1)
+        self.assertEqual(next(stream), 0)
+        time.sleep(0.2)  # 1 fills the queue, the end marker waits for room
+        stream.close()
+        threads[0].join(timeout=2)
+        self.assertFalse(threads[0].is_alive())
+
+
+class TestTokenBucket(unittest.TestCase):
+
+    def test_acquire_waits_for_refill(self):
+        bucket = TokenBucket(rate=20, capacity=1)
+        started_at = time.perf_counter()
+        for _ in range(5):
+            bucket.acquire()
+        # 1 token up front, then 4 more at 20/s
+        self.assertGreaterEqual(time.perf_counter() - started_at, 0.15)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+# model/test_lexical_index.py
+
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from langchain_core.documents import Document
+
+from model.lexical_index import LexicalIndex, reciprocal_rank_fusion, tokenize
+from model.testing import FakeEmbeddings, build_test_database
+
+
+class TestLexicalIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = LexicalIndex()
+        self.index.add(["tdm", "gri", "ods"], [
+            Document(page_content="A Teoria da Mudança liga atividades a resultados.", metadata={"source": "tdm.txt"}),
+            Document(page_content="O relatório GRI organiza indicadores de sustentabilidade.", metadata={"source": "gri.txt"}),
+            Document(page_content="Os ODS orientam metas globais de sustentabilidade.", metadata={"source": "ods.txt"}),
+        ])
+
+    def test_tokenize_strips_accents_and_stopwords(self):
+        self.assertEqual(tokenize("A Teoria da Mudança"), ["teoria", "mudanca"])
+
+    def test_keyword_query_ranks_matching_chunk_first(self):
+        self.assertEqual([chunk_id for chunk_id, _ in self.index.search("GRI", 3)], ["gri"])
+        self.assertEqual(self.index.search("teoria da mudanca", 1)[0][0], "tdm")
+        self.assertEqual({chunk_id for chunk_id, _ in self.index.search("sustentabilidade", 3)}, {"gri", "ods"})
+        self.assertEqual(self.index.search("de da", 3), [])
+
+    def test_delete_source_and_reindex(self):
+        self.index.delete_source("gri.txt")
+        self.assertEqual(self.index.search("GRI", 3), [])
+        self.index.add(["tdm"], [Document(page_content="Mensuração de impacto", metadata={"source": "tdm.txt"})])
+        self.assertEqual(len(self.index), 2)
+        self.assertEqual(self.index.search("teoria", 3), [])
+
+    def test_reciprocal_rank_fusion(self):
+        a, b, c = (Document(id=i, page_content=i) for i in "abc")
+        fused = reciprocal_rank_fusion([[a, b, c], [b, c]], k=2)
+        # b and c appear in both lists, so they beat a (first in only one list)
+        self.assertEqual([doc.id for doc in fused], ["b", "c"])
+
+
+class TestRetrievalModes(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.data_dir = os.path.join(self.tmp_dir.name, "data")
+        self.persist_dir = os.path.join(self.tmp_dir.name, "chroma_db")
+        os.makedirs(os.path.join(self.data_dir, "gri"))
+        os.makedirs(os.path.join(self.data_dir, "tdm"))
+        for name, text in [("gri/gri.txt", "O padrão GRI define indicadores para relatórios."),
+                           ("tdm/tdm.txt", "Teoria da Mudança descreve o caminho até o impacto.")]:
+            with open(os.path.join(self.data_dir, name), "w", encoding="utf-8") as f:
+                f.write(text)
+        self.embeddings = FakeEmbeddings()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _build(self, mode):
+        db = build_test_database(self.data_dir, self.persist_dir, embeddings=self.embeddings,
+                                 retriever_k=1, retrieval_mode=mode)
+        self.addCleanup(db.close)
+        return db
+
+    def test_lexical_mode_makes_no_embedding_call(self):
+        db = self._build("lexical")
+        self.assertEqual(len(db.lexical_index), db.vectorstore._collection.count())
+        response = db.run_rag("GRI", messages=[], stream=False)
+        self.assertEqual(self.embeddings.queries, 0)
+        self.assertEqual(response["sources"], [os.path.join(self.data_dir, "gri", "gri.txt")])
+
+    def test_hybrid_mode_fuses_both_rankings(self):
+        db = self._build("hybrid")
+        response = db.run_rag("Teoria da Mudança", messages=[], stream=False)
+        self.assertEqual(self.embeddings.queries, 1)
+        self.assertEqual(response["sources"], [os.path.join(self.data_dir, "tdm", "tdm.txt")])
+
+    def test_index_survives_restart(self):
+        self._build("lexical")
+        self.assertTrue(os.path.exists(os.path.join(self.persist_dir, "lexical.sqlite3")))
+        with patch.object(LexicalIndex, "add", side_effect=AssertionError("index rebuilt")):
+            db = self._build("lexical")
+        gri_ids = db.vectorstore.get(where={"source": os.path.join(self.data_dir, "gri", "gri.txt")})["ids"]
+        self.assertEqual(db.lexical_index.search("GRI", 1)[0][0], gri_ids[0])
+
+    def test_unknown_mode_is_rejected(self):
+        with self.assertRaises(ValueError):
+            self._build("semantic")
+
+
+if __name__ == '__main__':
+    unittest.main()
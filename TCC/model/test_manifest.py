@@ -0,0 +1,105 @@
+# model/test_manifest.py
+
+import os
+import json
+import tempfile
+import unittest
+
+from model.manifest import FileManifest
+from model.source_catalog import SourceCatalog
+from model.testing import FakeEmbeddings, build_test_database
+
+
+class TestFileManifest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.root = self.tmp_dir.name
+        self.manifest_path = os.path.join(self.root, "manifest.json")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _write(self, name, text):
+        path = os.path.join(self.root, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        return path
+
+    def test_diff_detects_added_changed_removed(self):
+        a = self._write("a.txt", "alpha")
+        b = self._write("b.txt", "beta")
+        manifest = FileManifest(self.manifest_path)
+        manifest.update(a)
+        manifest.update(b)
+        manifest.save()
+
+        self._write("b.txt", "beta, edited")
+        c = self._write("c.txt", "gamma")
+        os.remove(a)
+
+        diff = FileManifest(self.manifest_path).diff([b, c])
+        self.assertEqual(diff.added, [c])
+        self.assertEqual(diff.changed, [b])
+        self.assertEqual(diff.removed, [a])
+
+    def test_touched_file_is_unchanged(self):
+        a = self._write("a.txt", "alpha")
+        manifest = FileManifest(self.manifest_path)
+        manifest.update(a)
+        os.utime(a, (0, 12345))
+        self.assertEqual(manifest.diff([a]).unchanged, [a])
+
+
+class TestSyncChromaDb(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.data_dir = os.path.join(self.tmp_dir.name, "data")
+        self.persist_dir = os.path.join(self.tmp_dir.name, "chroma_db")
+        os.makedirs(os.path.join(self.data_dir, "ods"))
+        self.embeddings = FakeEmbeddings()
+        self.db = build_test_database(self.data_dir, self.persist_dir, embeddings=self.embeddings)
+
+    def tearDown(self):
+        self.db.close()
+        self.tmp_dir.cleanup()
+
+    def _write(self, name, text):
+        path = os.path.join(self.data_dir, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        return path
+
+    def _sources(self):
+        return {meta["source"] for meta in self.db.vectorstore.get()["metadatas"]}
+
+    def test_sync_only_embeds_what_changed(self):
+        a = self._write(os.path.join("ods", "a.txt"), "Objetivos de Desenvolvimento Sustentável")
+        b = self._write("b.txt", "Teoria da Mudança")
+        self.db.sync_chroma_db()
+        self.assertEqual(self._sources(), {a, b})
+        first_run = self.embeddings.texts_embedded
+
+        # Nothing changed: no embeddings
+        diff = self.db.sync_chroma_db()
+        self.assertEqual(self.embeddings.texts_embedded, first_run)
+        self.assertEqual(sorted(diff.unchanged), sorted([a, b]))
+
+        # Edit one file, delete the other
+        self._write("b.txt", "Teoria da Mudança, versão revisada")
+        os.remove(a)
+        self.db.sync_chroma_db()
+        self.assertEqual(self._sources(), {b})
+        self.assertEqual(len(self.db.vectorstore.get()["ids"]), 1)
+        self.assertEqual(SourceCatalog.for_vectorstore(self.db.vectorstore).sources, {b})
+        self.assertEqual(len(self.db.lexical_index), 1)
+        self.assertEqual(self.db.shards.counts(), {"ods": 0})
+
+        # ods/ is still on disk but has no chunks left: it is no longer offered as a filter
+        with open(os.path.join(self.persist_dir, "topics.json"), encoding="utf-8") as f:
+            self.assertEqual(json.load(f), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
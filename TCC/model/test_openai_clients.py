@@ -0,0 +1,123 @@
+# model/test_openai_clients.py
+
+import io
+import json
+import asyncio
+import threading
+import unittest
+from contextlib import redirect_stdout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from model.openai_clients import OpenAIClientPool
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    """Answers chat completions and embeddings like the OpenAI API, over keep‐alive HTTP/1.1."""
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if self.path.endswith("/embeddings"):
+            body = {"object": "list", "model": request["model"],
+                    "data": [{"object": "embedding", "index": i, "embedding": [0.1, 0.2]}
+                             for i, _ in enumerate(request["input"])],
+                    "usage": {"prompt_tokens": 1, "total_tokens": 1}}
+        else:
+            body = {"id": "chatcmpl-1", "object": "chat.completion", "created": 0, "model": request["model"],
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": "Olá, gestor!"}}],
+                    "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2}}
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestOpenAIClientPool(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), FakeOpenAIHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}/v1"
+        with redirect_stdout(io.StringIO()):
+            self.pool = OpenAIClientPool(max_connections=4, max_keepalive_connections=2, http2=False)
+
+    def tearDown(self):
+        self.pool.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_chat_models_and_embeddings_share_one_keep_alive_connection(self):
+        llm = self.pool.chat_model("gpt-4o-mini", api_key="test", base_url=self.base_url)
+        other = self.pool.chat_model("gpt-4o-mini", temperature=0, api_key="test", base_url=self.base_url)
+        embeddings = self.pool.embeddings(api_key="test", base_url=self.base_url,
+                                          check_embedding_ctx_length=False)
+
+        for _ in range(3):
+            self.assertEqual(llm.invoke("oi").content, "Olá, gestor!")
+        other.invoke("oi")
+        self.assertEqual(embeddings.embed_documents(["a", "b"]), [[0.1, 0.2], [0.1, 0.2]])
+
+        stats = self.pool.stats()
+        self.assertEqual(stats["requests"], 5)
+        self.assertEqual(stats["connections_opened"], 1)
+        self.assertEqual(stats["connections_reused"], 4)
+        self.assertEqual((stats["open_connections"], stats["idle_connections"]), (1, 1))
+        self.assertGreater(stats["wait_seconds_max"], 0)
+
+    def test_async_clients_work_across_event_loops(self):
+        llm = self.pool.chat_model("gpt-4o-mini", api_key="test", base_url=self.base_url)
+
+        async def ask_twice():
+            answers = await asyncio.gather(llm.ainvoke("oi"), llm.ainvoke("olá"))
+            return [answer.content for answer in answers]
+
+        # A batch run starts a new loop each time; connections of a closed loop must not be reused
+        for _ in range(2):
+            self.assertEqual(asyncio.run(ask_twice()), ["Olá, gestor!"] * 2)
+        stats = self.pool.stats()
+        self.assertEqual(stats["requests"], 4)
+        self.assertEqual(stats["event_loops"], 0)
+
+    def test_aclose_closes_sync_and_async_transports(self):
+        llm = self.pool.chat_model("gpt-4o-mini", api_key="test", base_url=self.base_url)
+        llm.invoke("oi")
+
+        # A second loop that is still running, like a worker thread's
+        other_loop = asyncio.new_event_loop()
+        thread = threading.Thread(target=other_loop.run_forever, daemon=True)
+        thread.start()
+        asyncio.run_coroutine_threadsafe(llm.ainvoke("oi"), other_loop).result(10)
+
+        async def ask_and_close():
+            await llm.ainvoke("olá")
+            transports = self.pool._async_transport.transports()
+            self.assertEqual(self.pool.stats()["open_connections"], 3)
+            await self.pool.aclose()
+            return transports
+
+        transports = asyncio.run(ask_and_close())
+        other_loop.call_soon_threadsafe(other_loop.stop)
+        thread.join(10)
+        other_loop.close()
+
+        self.assertEqual(len(transports), 2)
+        self.assertTrue(self.pool.http_client.is_closed)
+        self.assertTrue(self.pool.http_async_client.is_closed)
+        for transport in [self.pool._transport, *transports]:
+            self.assertEqual(transport._pool.connections, [])
+        self.assertEqual(self.pool.stats()["open_connections"], 0)
+
+    def test_prometheus_text_exposes_the_pool(self):
+        self.pool.chat_model("gpt-4o-mini", api_key="test", base_url=self.base_url).invoke("oi")
+        text = self.pool.prometheus_text()
+        self.assertIn("iaris_openai_requests_total 1", text)
+        self.assertIn("iaris_openai_open_connections 1", text)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+# model/test_prompt_cache.py
+
+import io
+import unittest
+from contextlib import redirect_stdout
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from model import prompt_cache
+from model.prompt_cache import get_prompt_template, get_rag_chain, split_static_prefix
+
+PROMPT = """Você é a IARIS, uma IA assistente especializada em impacto socioambiental.
+Use exemplos práticos e cite as fontes {{como nesta chave}}.
+
+## O usuário te perguntou: "{question}"
+## Você deve responder baseado no seguinte documento: "{context}"
+"""
+
+
+class TestPromptCache(unittest.TestCase):
+    def setUp(self):
+        prompt_cache.clear_caches()
+        self.llm = FakeListChatModel(responses=["resposta"])
+
+    def test_static_prefix_comes_before_the_variables(self):
+        prefix, rest = split_static_prefix(PROMPT)
+        self.assertEqual(prefix + rest, PROMPT)
+        self.assertNotIn("{question}", prefix)
+        self.assertTrue(rest.startswith('## O usuário te perguntou: "{question}"'))
+
+    def test_prompt_is_parsed_once_per_text(self):
+        self.assertIs(get_prompt_template(PROMPT), get_prompt_template(PROMPT))
+        self.assertIsNot(get_prompt_template(PROMPT), get_prompt_template(PROMPT + "Seja breve."))
+        self.assertEqual(prompt_cache.cache_info()["prompts"], {"hits": 2, "misses": 2, "size": 2})
+
+    def test_chain_is_reused_until_the_prompt_or_model_changes(self):
+        with redirect_stdout(io.StringIO()):
+            chain = get_rag_chain(get_prompt_template(PROMPT), self.llm)
+            self.assertIs(get_rag_chain(get_prompt_template(PROMPT), self.llm), chain)
+            edited = get_rag_chain(get_prompt_template(PROMPT + "Seja breve."), self.llm)
+            other_model = get_rag_chain(get_prompt_template(PROMPT), FakeListChatModel(responses=["x"]))
+        self.assertIsNot(edited, chain)
+        self.assertIsNot(other_model, chain)
+
+    def test_compiled_chain_renders_the_same_prompt_text(self):
+        with redirect_stdout(io.StringIO()):
+            chain = get_rag_chain(get_prompt_template(PROMPT), self.llm)
+        inputs = {"question": "O que é ODS?", "context": "Documento sobre ODS."}
+        messages = chain.first.invoke(inputs).to_messages()
+        self.assertEqual([message.type for message in messages], ["system", "human"])
+        self.assertEqual("".join(message.content for message in messages),
+                         get_prompt_template(PROMPT).format(**inputs))
+        self.assertEqual(chain.invoke(inputs), "resposta")
+
+
+if __name__ == "__main__":
+    unittest.main()
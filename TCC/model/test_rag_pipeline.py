@@ -0,0 +1,158 @@
+# model/test_rag_pipeline.py
+
+import io
+import os
+import sys
+import json
+import hashlib
+import asyncio
+import subprocess
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from typing import List
+from unittest.mock import patch
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.prompts import PromptTemplate
+
+import config
+from model.document_database import DocumentDatabase
+from model.graph_chatbot import format_history
+from model.metrics import MetricsRecorder
+
+
+class FakeEmbeddings(Embeddings):
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [[float(len(text)), 1.0] for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return [float(len(text)), 1.0]
+
+
+class TestRagPipeline(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.llm = FakeListChatModel(responses=["Olá, gestor! Teoria da Mudança é...", "segunda resposta"])
+        data_dir = os.path.join(self.tmp_dir.name, "data")
+        os.makedirs(data_dir)
+        for name, text in (("tdm.txt", "Teoria da Mudança"), ("gri.txt", "Relatório GRI")):
+            with open(os.path.join(data_dir, name), "w", encoding="utf-8") as f:
+                f.write(text)
+
+        recorder = MetricsRecorder(jsonl_path=os.path.join(self.tmp_dir.name, "metrics.jsonl"))
+        self.patches = [
+            patch.object(config, "ANSWER_CACHE_ENABLED", False),
+            patch.object(config, "METRICS_ENABLED", True),
+            patch("model.document_database.get_metrics_recorder", return_value=recorder),
+        ]
+        for p in self.patches:
+            p.start()
+        self.output = redirect_stdout(io.StringIO())
+        self.output.__enter__()
+        self.db = DocumentDatabase(chroma_db=None, file_path=data_dir, retriever_k=1, filter_list=[],
+                                   prompt_template=PromptTemplate.from_template("{context}\n\n{question}"),
+                                   embeddings=FakeEmbeddings(), llm=self.llm, retrieval_mode="vector",
+                                   persist_directory=os.path.join(self.tmp_dir.name, "chroma_db"))
+
+    def tearDown(self):
+        self.db.close()
+        self.output.__exit__(None, None, None)
+        for p in self.patches:
+            p.stop()
+        self.tmp_dir.cleanup()
+
+    def test_stream_makes_a_single_llm_call(self):
+        response = self.db.run_rag("O que é TdM?", messages=[])
+        self.assertEqual(response["rag_text"], "")
+        streamed = "".join(response["rag_stream"])
+
+        self.assertEqual(streamed, "Olá, gestor! Teoria da Mudança é...")
+        self.assertEqual(response["rag_text"], streamed)
+        self.assertIsNotNone(response["rag_stream"].ttft)
+        # FakeListChatModel moves to its next response once per call
+        self.assertEqual(self.llm.i, 1)
+        self.assertEqual(len(response["sources"]), 1)
+        self.assertEqual(set(response["timings"]),
+                         {"retrieve_chunks", "format_history", "format_context", "call_llm_stream", "collect_sources"})
+
+    def test_metrics_recorded_when_stream_ends(self):
+        response = self.db.run_rag("O que é TdM?", messages=[])
+        self.assertIsNone(self.db.metrics.latest)
+        "".join(response["rag_stream"])
+
+        metrics = self.db.metrics.latest
+        self.assertIs(metrics, response["metrics"])
+        self.assertIsNotNone(metrics.retrieval_latency)
+        self.assertGreater(metrics.context_tokens, 0)
+        self.assertGreater(metrics.output_tokens, 0)
+        self.assertGreaterEqual(metrics.total_latency, metrics.ttft)
+
+        with open(self.db.metrics.jsonl_path, encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f]
+        # Questions stay out of the log unless METRICS_LOG_QUERIES opts in
+        self.assertNotIn("query", rows[0])
+        self.assertEqual(rows[0]["query_sha256"], hashlib.sha256("O que é TdM?".encode("utf-8")).hexdigest())
+        opted_in = MetricsRecorder(jsonl_path=os.path.join(self.tmp_dir.name, "raw.jsonl"), log_queries=True)
+        opted_in.record(metrics)
+        with open(opted_in.jsonl_path, encoding="utf-8") as f:
+            self.assertEqual(json.loads(f.readline())["query"], "O que é TdM?")
+        prometheus = self.db.metrics.prometheus_text()
+        self.assertIn('iaris_rag_requests_total{cache_hit="false"} 1', prometheus)
+        self.assertIn('iaris_rag_stage_seconds_count{stage="retrieve_chunks"} 1', prometheus)
+
+    def test_per_question_settings_leave_the_shared_database_alone(self):
+        edited = PromptTemplate.from_template("Seja breve.\n{context}\n\n{question}")
+        self.assertIs(self.db._request_settings(prompt_template=edited)["prompt_template"], edited)
+        response = self.db.run_rag("O que é TdM?", messages=[], stream=False, prompt_template=edited,
+                                   retriever_k=2, filter_list=[])
+        self.assertEqual(len(response["sources"]), 2)
+        self.assertEqual(self.db.prompt_template.template, "{context}\n\n{question}")
+        self.assertEqual(self.db.retriever_k, 1)
+
+    def test_history_is_prefixed_to_context(self):
+        history = [HumanMessage(content="Oi"), AIMessage(content="Olá!")]
+        update = format_history({"messages": history})
+        self.assertEqual(update["history"], "User: Oi\nAssistant: Olá!\n\n")
+        self.assertIn("format_history", update["timings"])
+
+    def test_async_sessions(self):
+        async def session(question):
+            response = await self.db.arun_rag(question, messages=[])
+            tokens = [token async for token in response["rag_stream"]]
+            return "".join(tokens), response["rag_text"]
+
+        async def main():
+            return await asyncio.gather(session("O que é TdM?"), session("O que é GRI?"))
+
+        results = asyncio.run(main())
+        self.assertEqual(sorted(text for text, _ in results),
+                         ["Olá, gestor! Teoria da Mudança é...", "segunda resposta"])
+        for streamed, rag_text in results:
+            self.assertEqual(streamed, rag_text)
+
+
+class TestLazyStartup(unittest.TestCase):
+    def test_import_defers_heavy_packages(self):
+        # Fresh interpreter: nothing imported by other tests leaks into sys.modules
+        script = ("import sys, json, model; "
+                  "heavy = [m for m in ('langchain_openai', 'langchain_chroma', 'langgraph') if m in sys.modules]; "
+                  "from model import graph_chatbot; "
+                  "print(json.dumps({'heavy': heavy, 'compiled': graph_chatbot.get_graph.cache_info().currsize}))")
+        tcc_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        result = subprocess.run([sys.executable, "-c", script], cwd=tcc_dir, capture_output=True, text=True)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        report = json.loads(result.stdout.strip().splitlines()[-1])
+        self.assertEqual(report, {"heavy": [], "compiled": 0})
+
+    def test_graph_is_compiled_once(self):
+        from model import graph_chatbot
+        self.assertIs(graph_chatbot.get_graph(), graph_chatbot.app)
+        self.assertIs(graph_chatbot.get_graph(use_async=True), graph_chatbot.async_app)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+# model/test_source_catalog.py
+
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from langchain_chroma import Chroma
+
+from model.manifest import FileManifest
+from model.source_catalog import SourceCatalog
+from model.testing import build_test_database
+
+
+class TestSourceCatalog(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.data_dir = os.path.join(self.tmp_dir.name, "data")
+        self.persist_dir = os.path.join(self.tmp_dir.name, "chroma_db")
+        os.makedirs(os.path.join(self.data_dir, "ods"))
+        os.makedirs(os.path.join(self.data_dir, "gri"))
+        self._write(os.path.join("ods", "a.txt"), "Objetivos de Desenvolvimento Sustentável. " * 30)
+        self._write(os.path.join("gri", "b.txt"), "Relatório de sustentabilidade GRI.")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _write(self, name, text):
+        path = os.path.join(self.data_dir, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        return path
+
+    def _build(self, **kwargs):
+        db = build_test_database(self.data_dir, self.persist_dir, **kwargs)
+        self.addCleanup(db.close)
+        return db
+
+    def test_ingestion_fills_catalog(self):
+        db = self._build()
+        catalog = SourceCatalog(os.path.join(self.persist_dir, "sources.json"))
+        a = os.path.join(self.data_dir, "ods", "a.txt")
+        self.assertEqual(catalog.sources, {a, os.path.join(self.data_dir, "gri", "b.txt")})
+        self.assertEqual(catalog.total_chunks, db.vectorstore._collection.count())
+        self.assertGreater(catalog.entries[a]["chunks"], 1)
+        self.assertEqual(catalog.entries[a]["subject"], os.path.join(self.data_dir, "ods"))
+        self.assertEqual(catalog.entries[a]["sha256"], FileManifest.hash_file(a))
+
+    def test_startup_does_not_scan_chunks(self):
+        self._build()
+        with patch.object(Chroma, "get", side_effect=AssertionError("metadata scan at startup")):
+            db = self._build()
+        self.assertEqual(len(db.sources), 2)
+
+    def test_legacy_index_is_rebuilt_once(self):
+        self._build()
+        os.remove(os.path.join(self.persist_dir, "sources.json"))
+
+        db = self._build()
+        self.assertEqual(len(db.sources), 2)
+        self.assertTrue(os.path.exists(os.path.join(self.persist_dir, "sources.json")))
+        self.assertEqual(db.sources.total_chunks, db.vectorstore._collection.count())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,167 @@
+# model/test_store_registry.py
+
+import io
+import os
+import time
+import tempfile
+import threading
+import unittest
+from contextlib import redirect_stdout
+from typing import List
+from unittest.mock import patch
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+import config
+from model.answer_cache import AnswerCache
+from model.store_registry import StoreRegistry
+
+MB = 2 ** 20
+
+
+class FakeStore:
+    def __init__(self, name):
+        self.name = name
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class FakeEmbeddings(Embeddings):
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [[float(len(text)), 1.0] for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return [float(len(text)), 1.0]
+
+
+class TestStoreRegistry(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.opened = []
+        self.output = redirect_stdout(io.StringIO())
+        self.output.__enter__()
+
+    def tearDown(self):
+        self.output.__exit__(None, None, None)
+        self.tmp_dir.cleanup()
+
+    def _opener(self, spec):
+        time.sleep(0.05)  # long enough for concurrent first acquires to overlap
+        self.opened.append(spec.name)
+        return FakeStore(spec.name)
+
+    def _registry(self, max_bytes=10 * MB, **sizes_mb) -> StoreRegistry:
+        registry = StoreRegistry(max_bytes=max_bytes, opener=self._opener)
+        for name, size in sizes_mb.items():
+            persist_directory = os.path.join(self.tmp_dir.name, name)
+            os.makedirs(persist_directory)
+            with open(os.path.join(persist_directory, "index.bin"), "wb") as f:
+                f.truncate(size * MB)
+            registry.register(name, f"data/{name}", persist_directory)
+        return registry
+
+    def test_concurrent_first_acquires_open_the_corpus_once(self):
+        registry = self._registry(iaris=1)
+        leases = []
+        threads = [threading.Thread(target=lambda: leases.append(registry.acquire("iaris"))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.opened, ["iaris"])
+        self.assertEqual(len({id(lease.db) for lease in leases}), 1)
+        self.assertEqual(registry.stats()["iaris"]["refs"], 8)
+        for lease in leases:
+            lease.release()
+            lease.release()  # idempotent
+        self.assertEqual(registry.stats()["iaris"]["refs"], 0)
+
+    def test_idle_corpora_are_evicted_least_recently_used_first(self):
+        registry = self._registry(max_bytes=10 * MB, iaris=4, web=4, client=4)
+        with registry.acquire("iaris"):
+            pass
+        with registry.acquire("web") as web:
+            pass
+        iaris = registry.acquire("iaris")  # now more recently used than web
+
+        with registry.acquire("client"):
+            pass
+        self.assertTrue(web.closed)
+        self.assertEqual({name for name, stats in registry.stats().items() if stats["open"]}, {"iaris", "client"})
+        iaris.release()
+
+    def test_corpora_in_use_are_never_evicted(self):
+        registry = self._registry(max_bytes=5 * MB, iaris=4, web=4)
+        iaris = registry.acquire("iaris")
+        with registry.acquire("web") as web:
+            self.assertFalse(iaris.db.closed)
+            self.assertFalse(registry.evict("iaris"))
+        self.assertTrue(web.closed)  # over the cap as soon as it is released
+
+        iaris.release()
+        self.assertTrue(registry.evict("iaris"))
+        self.assertTrue(iaris.db.closed)
+
+    def test_unknown_corpus_and_conflicting_registration(self):
+        registry = self._registry(iaris=1)
+        with self.assertRaises(KeyError):
+            registry.acquire("web")
+
+        registry.register("iaris", "data/iaris", os.path.join(self.tmp_dir.name, "iaris"))  # same settings
+        with registry.acquire("iaris"):
+            with self.assertRaises(ValueError):
+                registry.register("iaris", "data/other", os.path.join(self.tmp_dir.name, "iaris"))
+        registry.evict("iaris")
+        registry.register("iaris", "data/other", os.path.join(self.tmp_dir.name, "iaris"))
+        self.assertEqual(registry.acquire("iaris").db.name, "iaris")
+        self.assertEqual(self.opened, ["iaris", "iaris"])
+
+    def _document_registry(self, **options) -> StoreRegistry:
+        for name, text in (("tdm", "Teoria da Mudança conecta atividades a impactos."),
+                           ("gri", "O relatório GRI segue normas de sustentabilidade.")):
+            os.makedirs(os.path.join(self.tmp_dir.name, "data", name, name))
+            with open(os.path.join(self.tmp_dir.name, "data", name, name, f"{name}.txt"), "w", encoding="utf-8") as f:
+                f.write(text)
+
+        registry = StoreRegistry()
+        for name in ("tdm", "gri"):
+            registry.register(name, os.path.join(self.tmp_dir.name, "data", name),
+                              os.path.join(self.tmp_dir.name, "stores", name),
+                              embeddings=FakeEmbeddings(), retrieval_mode="vector", **options)
+        return registry
+
+    @patch.object(config, "ANSWER_CACHE_ENABLED", False)
+    @patch.object(config, "METRICS_ENABLED", False)
+    def test_document_databases_keep_their_corpora_apart(self):
+        registry = self._document_registry()
+        with registry.acquire("tdm") as tdm, registry.acquire("gri") as gri:
+            self.assertIsNot(tdm, gri)
+            self.assertEqual([os.path.basename(source) for source in tdm.sources.entries], ["tdm.txt"])
+            self.assertEqual([os.path.basename(source) for source in gri.sources.entries], ["gri.txt"])
+        for name in ("tdm", "gri"):
+            self.assertTrue(registry.evict(name))
+            self.assertTrue(os.path.exists(os.path.join(self.tmp_dir.name, "stores", name, "manifest.json")))
+
+
+    @patch.object(config, "ANSWER_CACHE_ENABLED", True)
+    @patch.object(config, "METRICS_ENABLED", False)
+    def test_answer_cache_is_not_shared_across_corpora(self):
+        shared_cache = AnswerCache(FakeEmbeddings(), threshold=0.9, ttl=60, max_entries=10)
+        with patch("model.document_database.get_answer_cache", return_value=shared_cache):
+            registry = self._document_registry(llm=FakeListChatModel(responses=["ok"] * 4))
+            with registry.acquire("tdm") as tdm, registry.acquire("gri") as gri:
+                first = tdm.run_rag("Qual é o tema?", messages=[], stream=False)
+                second = gri.run_rag("Qual é o tema?", messages=[], stream=False)
+                again = tdm.run_rag("Qual é o tema?", messages=[], stream=False)
+        self.assertFalse(second["cache_hit"])
+        self.assertEqual([os.path.basename(source) for source in second["sources"]], ["gri.txt"])
+        self.assertTrue(again["cache_hit"])
+        self.assertEqual(again["sources"], first["sources"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+# model/test_subject_shards.py
+
+import os
+import tempfile
+import unittest
+from typing import List
+from unittest.mock import patch
+
+import config
+from model.subject_shards import SubjectShards, shard_name, subject_for
+from model.testing import FakeEmbeddings, build_test_database
+
+TEXTS = {
+    "gri": ["Relatório GRI com indicadores ambientais.", "Padrões GRI para relatórios de sustentabilidade."],
+    "ods": ["Os ODS orientam metas globais.", "Agenda 2030 e os ODS."],
+    "tdm": ["Teoria da Mudança liga atividades a resultados."],
+}
+
+
+class TopicEmbeddings(FakeEmbeddings):
+    def _vector(self, text: str) -> List[float]:
+        return [float(len(text)), float(text.count("GRI")), float(text.count("ODS")), 1.0]
+
+
+class TestSubjectFor(unittest.TestCase):
+    def test_prefix_lookup(self):
+        subjects = {os.path.join("data", "ods"), os.path.join("data", "gri")}
+        self.assertEqual(subject_for(os.path.join("data", "ods", "2030", "a.txt"), subjects),
+                         os.path.join("data", "ods"))
+        self.assertIsNone(subject_for(os.path.join("data", "ods2", "a.txt"), subjects))
+        self.assertIsNone(subject_for(os.path.join("data", "a.txt"), subjects))
+
+    def test_shard_names_are_valid_and_distinct(self):
+        self.assertRegex(shard_name("mensuração de impacto"), r"^[a-zA-Z0-9][a-zA-Z0-9._-]+[a-zA-Z0-9]$")
+        self.assertNotEqual(shard_name("ação"), shard_name("acao"))
+
+
+class TestSubjectShards(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.data_dir = os.path.join(self.tmp_dir.name, "data")
+        self.persist_dir = os.path.join(self.tmp_dir.name, "chroma_db")
+        for topic, texts in TEXTS.items():
+            os.makedirs(os.path.join(self.data_dir, topic))
+            for i, text in enumerate(texts):
+                with open(os.path.join(self.data_dir, topic, f"{i}.txt"), "w", encoding="utf-8") as f:
+                    f.write(text)
+        self.embeddings = TopicEmbeddings()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _build(self, filter_list=None, retriever_k=2):
+        db = build_test_database(self.data_dir, self.persist_dir, embeddings=self.embeddings,
+                                 retriever_k=retriever_k, filter_list=filter_list)
+        self.addCleanup(db.close)
+        return db
+
+    def _topics(self, response):
+        return {os.path.basename(os.path.dirname(source)) for source in response["sources"]}
+
+    def test_ingestion_fills_one_shard_per_subject(self):
+        db = self._build()
+        self.assertEqual(db.shards.counts(), {"gri": 2, "ods": 2, "tdm": 1})
+
+    def test_filtered_query_only_searches_selected_shards(self):
+        db = self._build(filter_list=["gri", "tdm"], retriever_k=3)
+        with patch.object(type(db.vectorstore), "similarity_search", side_effect=AssertionError("full search")):
+            response = db.run_rag("ODS", messages=[], stream=False)
+        self.assertEqual(self._topics(response), {"gri", "tdm"})
+        self.assertEqual(len(response["sources"]), 3)
+        # One query embedding, however many shards were searched
+        self.assertEqual(self.embeddings.queries, 1)
+
+    def test_filter_applies_without_shards(self):
+        with patch.object(config, "SUBJECT_SHARDS_ENABLED", False):
+            db = self._build(filter_list=["gri", "tdm"], retriever_k=5)
+        self.assertIsNone(db.shards)
+        for run in (lambda: db.run_rag("ODS", messages=[], stream=False),
+                    lambda: db.run_rag_batch(["ODS"])[0]):
+            response = run()
+            self.assertEqual(self._topics(response), {"gri", "tdm"})
+            self.assertEqual(len(response["sources"]), 3)
+        self.assertEqual(db.run_rag("ODS", messages=[], stream=False, filter_list=["ausente"])["sources"], [])
+
+    def test_unfiltered_query_uses_main_collection(self):
+        db = self._build(retriever_k=5)
+        with patch.object(SubjectShards, "search", side_effect=AssertionError("sharded search")):
+            response = db.run_rag("ODS", messages=[], stream=False)
+        self.assertEqual(self._topics(response), {"gri", "ods", "tdm"})
+
+    def test_sync_removes_chunks_from_shard(self):
+        db = self._build()
+        os.remove(os.path.join(self.data_dir, "ods", "0.txt"))
+        db.sync_chroma_db()
+        self.assertEqual(db.shards.counts()["ods"], 1)
+
+    def test_missing_shards_are_rebuilt_once(self):
+        db = self._build()
+        for topic in TEXTS:
+            db.vectorstore._client.delete_collection(shard_name(topic))
+        db = self._build()
+        self.assertEqual(db.shards.counts(), {"gri": 2, "ods": 2, "tdm": 1})
+        with patch.object(SubjectShards, "add", side_effect=AssertionError("rebuilt again")):
+            self._build()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,165 @@
+# model/test_vector_index.py
+
+import io
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from typing import List
+from unittest.mock import patch
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.prompts import PromptTemplate
+
+import config
+from model.document_database import DocumentDatabase
+from model.vector_index import CompactVectorIndex
+
+TEXTS = {
+    "gri": ["Relatório GRI com indicadores ambientais.", "Padrões GRI para relatórios de sustentabilidade."],
+    "ods": ["Os ODS orientam metas globais.", "Agenda 2030 e os ODS."],
+    "tdm": ["Teoria da Mudança liga atividades a resultados."],
+}
+
+
+class FakeEmbeddings(Embeddings):
+    def _vector(self, text: str) -> List[float]:
+        return [float(len(text)), float(text.count("GRI")), float(text.count("ODS")), 1.0]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._vector(text)
+
+
+def random_pages(rows=300, dim=64, page_size=100, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(rows, dim)).astype(np.float32)
+    pages = []
+    for start in range(0, rows, page_size):
+        end = min(start + page_size, rows)
+        pages.append(([f"id-{i}" for i in range(start, end)], vectors[start:end],
+                      [f"trecho {i} ção" for i in range(start, end)],
+                      [{"source": f"data/{'gri' if i % 2 else 'ods'}/{i // 10}.txt",
+                        "subject": f"data/{'gri' if i % 2 else 'ods'}", "start_index": i} for i in range(start, end)]))
+    return vectors, pages
+
+
+class TestCompactVectorIndex(unittest.TestCase):
+    def setUp(self):
+        self.vectors, self.pages = random_pages()
+        self.queries = self.vectors[:5] + np.random.default_rng(1).normal(scale=0.1, size=(5, 64))
+        unit = self.vectors / np.linalg.norm(self.vectors, axis=1, keepdims=True)
+        self.expected = np.argsort(-(unit @ self.queries.T).T, axis=1)
+
+    def _ids(self, hits):
+        return [doc.id for _, doc in hits]
+
+    def test_top_k_matches_exact_float32_search(self):
+        for dtype in ("float16", "int8"):
+            index = CompactVectorIndex.build(FakeEmbeddings(), self.pages, dtype=dtype)
+            index.block_rows = 64  # several blocks
+            for hits, expected in zip(index.search_by_vectors(self.queries.tolist(), 5), self.expected):
+                self.assertEqual(self._ids(hits)[0], f"id-{expected[0]}", dtype)
+                self.assertGreaterEqual(len(set(self._ids(hits)) & {f"id-{i}" for i in expected[:5]}), 4, dtype)
+                distances = [distance for distance, _ in hits]
+                self.assertEqual(distances, sorted(distances))
+
+    def test_documents_and_subject_filter(self):
+        index = CompactVectorIndex.build(FakeEmbeddings(), self.pages)
+        hits = index.search_by_vectors([self.vectors[3].tolist()], 10, topics=["gri"])[0]
+        self.assertEqual(len(hits), 10)
+        self.assertTrue(all(doc.metadata["subject"] == "data/gri" for _, doc in hits))
+        self.assertEqual(hits[0][1].page_content, "trecho 3 ção")
+        self.assertEqual(hits[0][1].metadata, {"source": "data/gri/0.txt", "subject": "data/gri", "start_index": 3})
+        self.assertEqual(index.search_by_vectors([self.vectors[3].tolist()], 3, topics=["tdm"]), [[]])
+
+    def test_pca_reduces_the_stored_dimensions(self):
+        index = CompactVectorIndex.build(FakeEmbeddings(), self.pages, pca_dims=48)
+        self.assertEqual(index.vectors.shape, (300, 48))
+        self.assertEqual(self._ids(index.search_by_vectors([self.vectors[7].tolist()], 1)[0]), ["id-7"])
+
+    def test_from_texts_embeds_and_builds(self):
+        texts = [text for topic_texts in TEXTS.values() for text in topic_texts]
+        metadatas = [{"source": f"data/{topic}/{i}.txt", "subject": f"data/{topic}"}
+                     for topic, topic_texts in TEXTS.items() for i in range(len(topic_texts))]
+        index = CompactVectorIndex.from_texts(texts, FakeEmbeddings(), metadatas=metadatas, dtype="float16")
+        self.assertEqual(len(index), 5)
+        hits = index.similarity_search("Agenda 2030 e os ODS.", k=3, filter=["ods"])
+        self.assertEqual({doc.page_content for doc in hits}, set(TEXTS["ods"]))
+        self.assertEqual({doc.metadata["source"] for doc in hits}, {"data/ods/0.txt", "data/ods/1.txt"})
+        self.assertEqual(len(CompactVectorIndex.from_texts(["sem metadados"], FakeEmbeddings())), 1)
+
+    def test_saved_index_is_memory_mapped(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            directory = os.path.join(tmp_dir, "index")
+            index = CompactVectorIndex.build(FakeEmbeddings(), self.pages, dtype="int8")
+            index.save(directory)
+            loaded = CompactVectorIndex.load(directory, FakeEmbeddings())
+            self.assertIsInstance(loaded.vectors, np.memmap)
+            self.assertEqual(self._ids(loaded.search_by_vectors(self.queries.tolist(), 3)[2]),
+                             self._ids(index.search_by_vectors(self.queries.tolist(), 3)[2]))
+            del loaded
+
+
+class TestCompactBackend(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.data_dir = os.path.join(self.tmp_dir.name, "data")
+        for topic, texts in TEXTS.items():
+            os.makedirs(os.path.join(self.data_dir, topic))
+            for i, text in enumerate(texts):
+                with open(os.path.join(self.data_dir, topic, f"{i}.txt"), "w", encoding="utf-8") as f:
+                    f.write(text)
+        self.patches = [
+            patch.object(config, "VECTOR_BACKEND", "compact"),
+            patch.object(config, "ANSWER_CACHE_ENABLED", False),
+            patch.object(config, "METRICS_ENABLED", False),
+        ]
+        for p in self.patches:
+            p.start()
+        self.output = redirect_stdout(io.StringIO())
+        self.output.__enter__()
+
+    def tearDown(self):
+        self.output.__exit__(None, None, None)
+        for p in self.patches:
+            p.stop()
+        self.tmp_dir.cleanup()
+
+    def _build(self, filter_list=None, retriever_k=2):
+        return DocumentDatabase(chroma_db=None, file_path=self.data_dir, retriever_k=retriever_k,
+                                filter_list=filter_list, embeddings=FakeEmbeddings(), retrieval_mode="vector",
+                                prompt_template=PromptTemplate.from_template("{context}\n\n{question}"),
+                                llm=FakeListChatModel(responses=["ok"] * 5),
+                                persist_directory=os.path.join(self.tmp_dir.name, "chroma_db"))
+
+    def _topics(self, response):
+        return {os.path.basename(os.path.dirname(source)) for source in response["sources"]}
+
+    def test_queries_are_served_by_the_compact_index(self):
+        db = self._build(filter_list=["gri", "tdm"], retriever_k=3)
+        self.assertIsNone(db.shards)
+        self.assertEqual(len(db.vector_index), 5)
+        with patch.object(type(db.vectorstore), "similarity_search", side_effect=AssertionError("Chroma search")):
+            response = db.run_rag("ODS", messages=[], stream=False)
+            batch = db.run_rag_batch(["ODS"])
+        self.assertEqual(self._topics(response), {"gri", "tdm"})
+        self.assertEqual(len(response["sources"]), 3)
+        self.assertEqual(batch[0]["sources"], response["sources"])
+
+    def test_index_is_reused_until_a_sync_changes_the_corpus(self):
+        self._build().close()
+        with patch.object(CompactVectorIndex, "build", side_effect=AssertionError("rebuilt")):
+            db = self._build()
+        os.remove(os.path.join(self.data_dir, "ods", "0.txt"))
+        db.sync_chroma_db()
+        self.assertEqual(len(db.vector_index), 4)
+        self.assertEqual(len(os.listdir(os.path.dirname(db.vector_index.directory))), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+# Offline fakes and the DocumentDatabase factory shared by the test modules.
+import os
+from typing import Dict, List
+from unittest.mock import patch
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.prompts import PromptTemplate
+
+import config
+from model.document_database import DocumentDatabase
+
+TEST_PROMPT = "{context}\n\n{question}"
+
+
+class FakeEmbeddings(Embeddings):
+    """[length, 1] vectors; counts calls, query embeddings and embedded texts."""
+
+    def __init__(self):
+        self.calls = 0
+        self.queries = 0
+        self.texts_embedded = 0
+
+    def _vector(self, text: str) -> List[float]:
+        return [float(len(text)), 1.0]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.calls += 1
+        self.texts_embedded += len(texts)
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        self.calls += 1
+        self.queries += 1
+        return self._vector(text)
+
+
+def write_files(root: str, files: Dict[str, str]) -> List[str]:
+    """Write {relative path: text} under `root` and return the absolute paths."""
+    paths = []
+    for name, text in files.items():
+        path = os.path.join(root, *name.split("/"))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        paths.append(path)
+    return paths
+
+
+def build_test_database(data_dir: str, persist_dir: str, embeddings: Embeddings = None, llm=None,
+                        **kwargs) -> DocumentDatabase:
+    """
+    DocumentDatabase built through its constructor, as the app does, but:
+      • kept in `persist_dir` (manifest, catalog, shards and indexes included),
+      • with FakeEmbeddings and a FakeListChatModel unless given,
+      • without the process‐wide answer cache and metrics recorder.
+    Other keyword arguments (retriever_k, filter_list, retrieval_mode, ...) go to the constructor.
+    """
+    kwargs.setdefault("prompt_template", PromptTemplate.from_template(TEST_PROMPT))
+    kwargs.setdefault("retrieval_mode", "vector")
+    with patch.object(config, "ANSWER_CACHE_ENABLED", False), patch.object(config, "METRICS_ENABLED", False):
+        return DocumentDatabase(chroma_db=None, file_path=data_dir, persist_directory=persist_dir,
+                                embeddings=embeddings if embeddings is not None else FakeEmbeddings(),
+                                llm=llm if llm is not None else FakeListChatModel(responses=["ok"] * 10),
+                                **kwargs)
@@ -0,0 +1,93 @@
+import time
+from typing import AsyncIterable, AsyncIterator, Callable, Iterable, Iterator, List, Optional, Union
+
+
+class TokenStream:
+    """
+    Wraps a token generator coming from a single LLM call so that:
+      • the UI (`st.write_stream`) can consume the tokens as they arrive,
+      • the full answer text is recorded once the stream ends,
+      • the time to first token (TTFT) is measured.
+
+    Callbacks registered with `add_done_callback` run after the last token,
+    which is where `rag_text` and the chat history get filled in.
+    """
+
+    def __init__(self, tokens: Union[Iterable[str], AsyncIterable[str]], started_at: Optional[float] = None):
+        self._tokens = tokens
+        self._callbacks: List[Callable[["TokenStream"], None]] = []
+        self.started_at = started_at if started_at is not None else time.perf_counter()
+        self.first_token_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.chunks: List[str] = []
+        self.done = False
+
+    def __iter__(self) -> Iterator[str]:
+        if self.done:
+            # Already consumed: replay what was recorded instead of calling the LLM again
+            yield from self.chunks
+            return
+        for token in self._tokens:
+            self._record(token)
+            yield token
+        self._finish()
+
+    def _record(self, token: str):
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+        self.chunks.append(token)
+
+    def _finish(self):
+        self.done = True
+        self.finished_at = time.perf_counter()
+        for callback in self._callbacks:
+            callback(self)
+
+    def add_done_callback(self, callback: Callable[["TokenStream"], None]):
+        """Run `callback(stream)` once the stream is exhausted (immediately if it already is)."""
+        if self.done:
+            callback(self)
+        else:
+            self._callbacks.append(callback)
+
+    @property
+    def text(self) -> str:
+        return "".join(self.chunks)
+
+    @property
+    def ttft(self) -> Optional[float]:
+        if self.first_token_at is None:
+            return None
+        return self.first_token_at - self.started_at
+
+    @property
+    def total_time(self) -> Optional[float]:
+        if self.finished_at is None:
+            return None
+        return self.finished_at - self.started_at
+
+
+class AsyncTokenStream(TokenStream):
+    """
+    Same recording as TokenStream, over an `astream()` async iterator:
+    consume it with `async for` so one worker can serve many sessions.
+    """
+
+    def __iter__(self):
+        raise TypeError("AsyncTokenStream must be consumed with `async for`")
+
+    async def __aiter__(self) -> AsyncIterator[str]:
+        if self.done:
+            for token in self.chunks:
+                yield token
+            return
+        if hasattr(self._tokens, "__aiter__"):
+            async for token in self._tokens:
+                self._record(token)
+                yield token
+        else:
+            # Plain iterables (e.g. a cached answer being replayed) work too
+            for token in self._tokens:
+                self._record(token)
+                yield token
+        self._finish()
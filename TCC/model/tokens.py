@@ -0,0 +1,83 @@
+import threading
+from collections import OrderedDict
+
+MODEL_NAME = "gpt-4o-mini"
+
+# Only chunk‐sized texts are cached: assembled contexts and the prefixes tried
+# by `truncate_to_tokens` are counted once and never asked for again.
+CACHED_TEXT_MAX_CHARS = 4000
+# The cache is bounded by the characters it holds, not by its number of entries
+CACHE_MAX_CHARS = 4_000_000
+
+_encoding = None
+_encoding_loaded = False
+
+_counts: "OrderedDict[str, int]" = OrderedDict()
+_cached_chars = 0
+_counts_lock = threading.Lock()
+
+
+def _get_encoding():
+    """tiktoken encoding for the chat model, or None when it cannot be loaded (e.g. offline)."""
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        _encoding_loaded = True
+        try:
+            import tiktoken
+            _encoding = tiktoken.encoding_for_model(MODEL_NAME)
+        except Exception as exc:
+            print(f"⚠️ tiktoken unavailable ({type(exc).__name__}), estimating tokens as chars/4")
+            _encoding = None
+    return _encoding
+
+
+def _count_uncached(text: str) -> int:
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is None:
+        return max(1, len(text) // 4)
+    return len(encoding.encode(text))
+
+
+def count_tokens(text: str) -> int:
+    """Number of prompt tokens in `text`; chunk‐sized texts are cached since chunks repeat a lot."""
+    global _cached_chars
+    if not text or len(text) > CACHED_TEXT_MAX_CHARS:
+        return _count_uncached(text)
+    with _counts_lock:
+        count = _counts.get(text)
+        if count is not None:
+            _counts.move_to_end(text)
+            return count
+    count = _count_uncached(text)
+    with _counts_lock:
+        if text not in _counts:
+            _counts[text] = count
+            _cached_chars += len(text)
+            while _cached_chars > CACHE_MAX_CHARS:
+                evicted, _ = _counts.popitem(last=False)
+                _cached_chars -= len(evicted)
+    return count
+
+
+def clear_token_cache():
+    global _cached_chars
+    with _counts_lock:
+        _counts.clear()
+        _cached_chars = 0
+
+
+def truncate_to_tokens(text: str, budget: int) -> str:
+    """Longest word‐boundary prefix of `text` that fits in `budget` tokens."""
+    if count_tokens(text) <= budget:
+        return text
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if _count_uncached(text[:middle]) <= budget:
+            low = middle
+        else:
+            high = middle - 1
+    cut = text[:low]
+    return cut[:cut.rfind(" ")] if " " in cut else cut
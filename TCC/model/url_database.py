@@ -1,15 +1,14 @@
 from typing import List
-from langchain import hub
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import SeleniumURLLoader 
 from langchain_community.vectorstores import Chroma
 from langchain_core.documents import Document
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.runnables import RunnablePassthrough, RunnableParallel
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 
 import os
 from model.database import Database
+from model.embedding_cache import get_cached_embeddings
+from model.prompt_cache import get_chat_model
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -26,10 +25,11 @@ class WebDatabase(Database):
         
             self.vectorstore = Chroma(
                 persist_directory="./chroma_db",
-                embedding_function=OpenAIEmbeddings()
+                embedding_function=get_cached_embeddings()
             )
         else:
             if loader is None:
+                from langchain_community.document_loaders import SeleniumURLLoader
                 loader = SeleniumURLLoader(urls=urls)
             docs = loader.load()
 
@@ -38,13 +38,14 @@ class WebDatabase(Database):
 
             splits = text_splitter.split_documents(docs)
 
-            self.vectorstore = Chroma.from_documents(documents=splits, embedding=OpenAIEmbeddings(), persist_directory="./chroma_db")
+            self.vectorstore = Chroma.from_documents(documents=splits, embedding=get_cached_embeddings(), persist_directory="./chroma_db")
     
     def _setup_rag(self):
         # super()
+        from langchain import hub  # only this legacy path pulls prompts from the hub
         retriever = self.vectorstore.as_retriever()
         prompt = hub.pull("rlm/rag-prompt")
-        llm = ChatOpenAI(model_name="gpt-4o-mini", api_key=openai_key)
+        llm = get_chat_model("gpt-4o-mini")
 
         rag_chain_from_docs = ( RunnablePassthrough.assign(
             context=(lambda x: self.format_docs(x["context"])))
@@ -62,7 +63,7 @@ class WebDatabase(Database):
     def ask_rag(self, query,debug=False):
         rag = self._setup_rag()
         print("key", openai_key)
-        llm = ChatOpenAI(model_name="gpt-4o-mini", api_key=openai_key)
+        llm = get_chat_model("gpt-4o-mini")
         if debug:
             responses = {"query": query, "llm": "LLM ANSWER", "rag": "RAG ANSWER"}
             print(responses)
@@ -0,0 +1,308 @@
+import os
+import json
+import shutil
+import uuid
+import hashlib
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+import config
+from model.subject_shards import topic_name
+
+INDEX_DIR_NAME = "vector_index"
+INDEX_VERSION = 1
+DTYPES = ("float16", "int8")
+
+
+def catalog_fingerprint(entries: Dict[str, Dict]) -> str:
+    """Hash of a source catalog (source, chunks, file hash): changes whenever an ingestion or sync does."""
+    digest = hashlib.sha256()
+    for source in sorted(entries):
+        entry = entries[source]
+        digest.update(f"{source}\0{entry['chunks']}\0{entry.get('sha256')}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+class CompactVectorIndex(VectorStore):
+    """
+    Read‐only, in‐process copy of a Chroma collection for exact top‐k search,
+    an alternative to loading Chroma's HNSW index in every worker:
+      • vectors are L2‐normalized (optionally PCA‐reduced first) and stored
+        as a float16 matrix, or int8 with one scale per row,
+      • ids, texts and metadata (source, subject, start_index) are columnar
+        arrays: codes into small lookup lists, one UTF‐8 blob for the texts,
+      • on disk everything is .npy/.bin files opened with mmap, so workers
+        share the pages and loading does not read the matrix,
+      • search is a blocked matrix product with the query plus argpartition,
+        and a subject filter is a mask over the subject codes.
+    Chroma stays the store of record; the index is rebuilt from it whenever
+    the source catalog changes (see `for_vectorstore`).
+    """
+
+    def __init__(self, embeddings: Embeddings, arrays: Dict[str, np.ndarray], meta: Dict,
+                 directory: Optional[str] = None):
+        self._embeddings = embeddings
+        self.meta = meta
+        self.directory = directory
+        self.vectors = arrays["vectors"]
+        self.scales = arrays.get("scales")
+        self.pca_mean = arrays.get("pca_mean")
+        self.pca_components = arrays.get("pca_components")
+        self.ids = arrays["ids"]
+        self.source_codes = arrays["sources"]
+        self.subject_codes = arrays["subjects"]
+        self.start_index = arrays["start_index"]
+        self.text_offsets = arrays["text_offsets"]
+        self.texts = arrays["texts"]
+        self.block_rows = config.VECTOR_INDEX_BLOCK_ROWS
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embeddings
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the arrays (on disk when memory‐mapped, only the pages searched become resident)."""
+        return sum(array.nbytes for array in (self.vectors, self.scales, self.ids, self.source_codes,
+                                              self.subject_codes, self.start_index, self.text_offsets, self.texts)
+                   if array is not None)
+
+    # ── building ─────────────────────────────────────────────────────────
+
+    @classmethod
+    def build(cls, embeddings: Embeddings, pages: Iterable[Tuple[List[str], List, List[str], List[Dict]]],
+              dtype: str = None, pca_dims: int = None, fingerprint: str = "") -> "CompactVectorIndex":
+        """
+        Build an in‐memory index from pages of (ids, vectors, texts, metadatas).
+        With `pca_dims`, the projection is fitted on the first page.
+        """
+        dtype = dtype or config.VECTOR_INDEX_DTYPE
+        if dtype not in DTYPES:
+            raise ValueError(f"dtype must be one of {DTYPES}, got {dtype!r}")
+        ids, texts, blocks, scales = [], [], [], []
+        sources, subjects = {}, {}
+        source_codes, subject_codes, start_index = [], [], []
+        pca_mean = pca_components = None
+        source_dim = 0
+
+        for page_ids, page_vectors, page_texts, page_metas in pages:
+            if not page_ids:
+                continue
+            matrix = _normalize(np.asarray(page_vectors, dtype=np.float32))
+            source_dim = matrix.shape[1]
+            if pca_dims and pca_dims < source_dim and pca_components is None:
+                pca_mean = matrix.mean(axis=0)
+                _, _, vt = np.linalg.svd(matrix - pca_mean, full_matrices=False)
+                pca_components = vt[:pca_dims].astype(np.float32)
+            if pca_components is not None:
+                matrix = _normalize((matrix - pca_mean) @ pca_components.T)
+            if dtype == "int8":
+                row_scales = np.abs(matrix).max(axis=1) / 127
+                row_scales[row_scales == 0] = 1
+                blocks.append(np.round(matrix / row_scales[:, None]).astype(np.int8))
+                scales.append(row_scales.astype(np.float32))
+            else:
+                blocks.append(matrix.astype(np.float16))
+
+            ids += page_ids
+            texts += [text or "" for text in page_texts]
+            for meta in page_metas:
+                meta = meta or {}
+                source, subject = meta.get("source"), meta.get("subject")
+                source_codes.append(sources.setdefault(source, len(sources)) if source is not None else -1)
+                subject_codes.append(subjects.setdefault(subject, len(subjects)) if subject is not None else -1)
+                start_index.append(meta.get("start_index", -1))
+
+        encoded = [text.encode("utf-8") for text in texts]
+        dim = blocks[0].shape[1] if blocks else 0
+        arrays = {
+            "vectors": np.concatenate(blocks) if blocks else np.zeros((0, dim), dtype=dtype),
+            "ids": np.array(ids, dtype=str),
+            "sources": np.array(source_codes, dtype=np.int32),
+            "subjects": np.array(subject_codes, dtype=np.int32),
+            "start_index": np.array(start_index, dtype=np.int64),
+            "text_offsets": np.cumsum([0] + [len(text) for text in encoded], dtype=np.int64),
+            "texts": np.frombuffer(b"".join(encoded), dtype=np.uint8),
+        }
+        if dtype == "int8":
+            arrays["scales"] = np.concatenate(scales) if scales else np.zeros(0, dtype=np.float32)
+        if pca_components is not None:
+            arrays["pca_mean"], arrays["pca_components"] = pca_mean, pca_components
+        meta = {"version": INDEX_VERSION, "count": len(ids), "dtype": dtype, "dim": dim, "source_dim": source_dim,
+                "pca_dims": pca_dims or None, "fingerprint": fingerprint,
+                "sources": list(sources), "subjects": list(subjects)}
+        return cls(embeddings, arrays, meta)
+
+    def save(self, directory: str):
+        """Write the index to `directory`, which only appears once every file is complete."""
+        tmp_dir = directory + ".tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        for name, array in (("vectors", self.vectors), ("scales", self.scales), ("ids", self.ids),
+                            ("sources", self.source_codes), ("subjects", self.subject_codes),
+                            ("start_index", self.start_index), ("text_offsets", self.text_offsets),
+                            ("pca_mean", self.pca_mean), ("pca_components", self.pca_components)):
+            if array is not None:
+                np.save(os.path.join(tmp_dir, f"{name}.npy"), array)
+        with open(os.path.join(tmp_dir, "texts.bin"), "wb") as f:
+            f.write(self.texts.tobytes())
+        with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(self.meta, f, ensure_ascii=False)
+        os.replace(tmp_dir, directory)
+        self.directory = directory
+
+    @classmethod
+    def load(cls, directory: str, embeddings: Embeddings) -> "CompactVectorIndex":
+        """Open a saved index; the arrays are memory‐mapped, not read."""
+        with open(os.path.join(directory, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        arrays = {}
+        for name in ("vectors", "scales", "ids", "sources", "subjects", "start_index", "text_offsets",
+                     "pca_mean", "pca_components"):
+            path = os.path.join(directory, f"{name}.npy")
+            if os.path.exists(path):
+                # Empty arrays cannot be mapped
+                arrays[name] = np.load(path, mmap_mode="r" if meta["count"] else None)
+        texts_path = os.path.join(directory, "texts.bin")
+        arrays["texts"] = (np.memmap(texts_path, dtype=np.uint8, mode="r") if os.path.getsize(texts_path)
+                           else np.zeros(0, dtype=np.uint8))
+        return cls(embeddings, arrays, meta, directory)
+
+    @staticmethod
+    def path_for(vectorstore) -> Optional[str]:
+        """The indexes of `vectorstore` live in its persist directory (in memory if it has none)."""
+        settings = vectorstore._client.get_settings()
+        if not settings.is_persistent:
+            return None
+        return os.path.join(settings.persist_directory, INDEX_DIR_NAME)
+
+    @classmethod
+    def for_vectorstore(cls, vectorstore, fingerprint: str, page_size: int = 5000) -> "CompactVectorIndex":
+        """
+        Open the index of `vectorstore` for `fingerprint` (the source
+        catalog's, see `catalog_fingerprint`) and the configured dtype / PCA,
+        building it from the stored vectors when there is none yet.
+        Each build gets its own folder, so a worker still mapping the previous
+        one is never pulled from under (Windows cannot delete mapped files).
+        """
+        dtype, pca_dims = config.VECTOR_INDEX_DTYPE, config.VECTOR_INDEX_PCA_DIMS or None
+        base_dir = cls.path_for(vectorstore)
+        directory = None
+        if base_dir:
+            directory = os.path.join(base_dir, f"v{INDEX_VERSION}-{fingerprint[:16]}-{dtype}-{pca_dims or 'full'}")
+            if os.path.exists(directory):
+                return cls.load(directory, vectorstore.embeddings)
+
+        count = vectorstore._collection.count()
+        print(f"🧮 Building the compact vector index ({count} chunks, {dtype}"
+              f"{f', PCA to {pca_dims} dims' if pca_dims else ''})...")
+
+        def pages():
+            for offset in range(0, count, page_size):
+                page = vectorstore._collection.get(limit=page_size, offset=offset,
+                                                   include=["embeddings", "documents", "metadatas"])
+                yield page["ids"], page["embeddings"], page["documents"], page["metadatas"]
+
+        index = cls.build(vectorstore.embeddings, pages(), dtype, pca_dims, fingerprint)
+        if directory:
+            os.makedirs(base_dir, exist_ok=True)
+            index.save(directory)
+            for name in os.listdir(base_dir):
+                if name != os.path.basename(directory):
+                    shutil.rmtree(os.path.join(base_dir, name), ignore_errors=True)  # best effort while mapped
+            index = cls.load(directory, vectorstore.embeddings)
+        return index
+
+    # ── search ───────────────────────────────────────────────────────────
+
+    def _rows_for(self, topics: Optional[Iterable[str]]) -> Optional[np.ndarray]:
+        """Rows of the subjects of `topics`, or None for every row."""
+        if not topics:
+            return None
+        topics = set(topics)
+        codes = [code for code, subject in enumerate(self.meta["subjects"]) if topic_name(subject) in topics]
+        return np.flatnonzero(np.isin(self.subject_codes, codes))
+
+    def _query_matrix(self, vectors: List[List[float]]) -> np.ndarray:
+        queries = _normalize(np.asarray(vectors, dtype=np.float32))
+        if self.pca_components is not None:
+            queries = _normalize((queries - self.pca_mean) @ np.asarray(self.pca_components).T)
+        return queries
+
+    def _document(self, row: int) -> Document:
+        text = bytes(self.texts[self.text_offsets[row]:self.text_offsets[row + 1]]).decode("utf-8")
+        metadata = {}
+        if self.source_codes[row] >= 0:
+            metadata["source"] = self.meta["sources"][self.source_codes[row]]
+        if self.subject_codes[row] >= 0:
+            metadata["subject"] = self.meta["subjects"][self.subject_codes[row]]
+        if self.start_index[row] >= 0:
+            metadata["start_index"] = int(self.start_index[row])
+        return Document(id=str(self.ids[row]), page_content=text, metadata=metadata)
+
+    def search_by_vectors(self, vectors: List[List[float]], k: int,
+                          topics: Iterable[str] = None) -> List[List[Tuple[float, Document]]]:
+        """Top‐k (cosine distance, chunk) pairs for each query vector, within `topics` if given."""
+        rows = self._rows_for(topics)
+        n = len(self) if rows is None else len(rows)
+        if not n or not vectors:
+            return [[] for _ in vectors]
+        k = min(k, n)
+        queries = self._query_matrix(vectors)
+
+        scores = np.empty((len(queries), n), dtype=np.float32)
+        for start in range(0, n, self.block_rows):
+            block = slice(start, min(start + self.block_rows, n)) if rows is None \
+                else rows[start:start + self.block_rows]
+            part = np.asarray(self.vectors[block], dtype=np.float32) @ queries.T
+            if self.scales is not None:
+                part *= np.asarray(self.scales[block])[:, None]
+            scores[:, start:start + part.shape[0]] = part.T
+
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        results = []
+        for i, candidates in enumerate(top):
+            ranked = candidates[np.argsort(-scores[i, candidates])]
+            results.append([(float(1 - scores[i, j]), self._document(int(j if rows is None else rows[j])))
+                            for j in ranked])
+        return results
+
+    def similarity_search_with_score(self, query: str, k: int = 4, filter: List[str] = None,
+                                     **kwargs: Any) -> List[Tuple[Document, float]]:
+        hits = self.search_by_vectors([self._embeddings.embed_query(query)], k, filter)[0]
+        return [(doc, distance) for distance, doc in hits]
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, filter: List[str] = None,
+                                    **kwargs: Any) -> List[Document]:
+        return [doc for _, doc in self.search_by_vectors([embedding], k, filter)[0]]
+
+    def similarity_search(self, query: str, k: int = 4, filter: List[str] = None,
+                          **kwargs: Any) -> List[Document]:
+        """Top‐k chunks for `query`; `filter` is a list of topics, like `filter_list`."""
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, filter)]
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings, metadatas: Optional[List[dict]] = None,
+                   ids: Optional[List[str]] = None, **kwargs: Any) -> "CompactVectorIndex":
+        """
+        Embed `texts` and build an in‐memory index of them; `kwargs` (dtype,
+        pca_dims) go to `build`. The app builds its index from the Chroma
+        collection instead, see `for_vectorstore`.
+        """
+        texts = list(texts)
+        ids = list(ids) if ids is not None else [str(uuid.uuid4()) for _ in texts]
+        metadatas = list(metadatas) if metadatas is not None else [{} for _ in texts]
+        vectors = embedding.embed_documents(texts) if texts else []
+        return cls.build(embedding, [(ids, vectors, texts, metadatas)], **kwargs)
@@ -4,12 +4,21 @@ import json
 import urllib.parse
 
 import streamlit as st
-from langchain.prompts import PromptTemplate
+from langchain_core.prompts import PromptTemplate
 
 from streamlit_chat import message
 from dotenv import load_dotenv
 
 import config
+from model.conversation_memory import ConversationMemory
+from model.prompt_cache import get_prompt_template
+from model.prompts import DEFAULT_PROMPT
+
+RETRIEVAL_MODE_LABELS = {
+    "hybrid": "Híbrida (palavras‐chave + semântica)",
+    "vector": "Semântica",
+    "lexical": "Palavras‐chave",
+}
 
 
 class ChatView:
@@ -32,42 +41,28 @@ class ChatView:
 
             with st.expander("🔍 Parâmetros de busca", expanded=False):
                 self.values = st.slider("Buscar em quantos documentos?", 2, 10)
+                modes = list(RETRIEVAL_MODE_LABELS)
+                self.retrieval_mode = st.selectbox(
+                    "Tipo de busca", modes, index=modes.index(config.RETRIEVAL_MODE),
+                    format_func=RETRIEVAL_MODE_LABELS.get,
+                )
+                # Selected topics limit the search to their subject shards
+                self.filters = st.multiselect("Filtrar por tema", sorted(self._load_topics_json()),
+                                              format_func=self._format_topic)
 
             # Let user tweak the PromptTemplate
             self.user_prompt = st.text_area(
                 "Altere o prompt padrão da IARIS",
-                '''Você é a IARIS, uma IA assistente especializada em negócios de impacto socioambiental positivo que existe para apoiar gestores de instituições, ONGs e negócios com fins lucrativos a atuarem de forma eficiente a favor de impacto socioambiental positivo.
-
-                    Seu objetivo é fornecer insights práticos, estratégias e ferramentas para melhorar a gestão de suas organizações, sempre com foco em gerar e ampliar impactos positivos para a sociedade e o meio ambiente.
-
-                    Você conversa com gestores de diferentes tipos de instituições como empresas privadas, organizações sem fins lucrativos, fundações e institutos, empresas do sistema B, empresas e órgãos públicos.
-
-                    Você não deve ser formal nas suas respostas, mas tampouco deve ser muito informal, usando jargões, abreviações e termos mais populares. Lembre-se, você está conversando com gestores e precisa orientá-los a conhecerem mais sobre impacto socioambiental positivo e sua linguagem deve ser clara, acessível e adaptável ao nível de conhecimento do gestor, seja ele iniciante ou experiente no tema, incluindo sempre que possível exemplos práticos e casos de sucesso.
-
-                    Sempre que possível, forneça exemplos práticos, cases de sucesso e referências confiáveis (como frameworks globais, estudos acadêmicos ou boas práticas de organizações reconhecidas). Se o gestor trouxer um problema específico, ajude a identificar soluções viáveis e personalizadas para o contexto da organização dele.
-
-                    Interesses que os gestores têm ao te procurar:
-
-                    * Teoria da Mudança
-                    * Monitoramento e mensuração de impacto social e/ou ambiental positivo
-                    * Produção de relatório de sustentabilidade
-                    * Mapeamento e engajamento de stakeholders
-
-                    #Sobre a estrutura das suas respostas
-                    Suas respostas devem sempre conter cinco partes combinadas e conectadas entre si de forma lógica:
-                    1. Introdução Amigável e Contextualizada: Breve cumprimento e referência direta à pergunta do gestor.
-                    2. Explicação Clara e Adaptada: Resposta direta e alinhada à pergunta, com linguagem acessível e adaptada ao perfil do gestor.
-                    3. Detalhamento com Exemplos e Orientações: Use bullet points para listar exemplos, casos de sucesso ou orientações práticas.
-                    4. Resumo Conciso: Destaque os pontos principais da resposta até a parte 3 com até 300 caracteres.
-                    5. Fonte: discriminar as fontes utilizadas para a resposta dada. Depois, coloque-se à disposição e faça uma pergunta relevante para manter o diálogo.
-
-                    ## O usuário te perguntou: "{question}"
-                    ## Você deve responder baseado no seguinte documento: "{context}"
-                    ''',
+                DEFAULT_PROMPT,
                 height=400,
             )
 
-        self.promptTemplate = PromptTemplate.from_template(self.user_prompt)
+            # Latest request numbers (filled in by display())
+            with st.expander("📊 Diagnóstico", expanded=False):
+                self.metrics_panel = st.empty()
+
+        # Parsed once per distinct prompt text, not on every rerun
+        self.promptTemplate = get_prompt_template(self.user_prompt)
         self.retriever_k = 1
         self.key = 0
 
@@ -90,6 +85,8 @@ class ChatView:
         st.session_state["rag_stream"] = None
         st.session_state["rag_generated"] = []
         st.session_state["sources"] = None
+        st.session_state["metrics"] = None
+        st.session_state["memory"] = ConversationMemory()
 
     @staticmethod
     def _format_topic(topic: str) -> str:
@@ -111,18 +108,18 @@ class ChatView:
         return self.user_input
 
     def get_edited_prompt(self) -> PromptTemplate:
-        # user may have modified the prompt text
-        return PromptTemplate.from_template(self.user_prompt)
+        # user may have modified the prompt text; unchanged text hits the cache
+        return get_prompt_template(self.user_prompt)
 
     def get_search_filters(self):
-        return []
+        return list(self.filters)
 
     def display(self, responses: dict = None):
         """
         Show the new human message + RAG answer (streaming) + sources.
         responses is expected to contain:
            { "query": str,
-             "rag_stream": <generator>,
+             "rag_stream": <TokenStream>,
              "sources": [file‐path, ...]
            }
         """
@@ -140,25 +137,43 @@ class ChatView:
         with self.rag_message.container():
             # If there’s a streaming generator, use write_stream to show partial tokens
             if st.session_state["rag_stream"]:
-                st.write_stream(st.session_state["rag_stream"])
+                # Tokens are shown as they arrive; the full text is kept for reruns
+                streamed_text = st.write_stream(st.session_state["rag_stream"])
+                self._remember(streamed_text)
+                st.session_state["rag_stream"] = None
             elif st.session_state["rag_generated"]:
                 self.rag_message.markdown(st.session_state["rag_generated"][-1])
 
         self._display_sources()
+        self._display_metrics()
         self.key += 1
 
     def _handle_responses(self, responses: dict):
+        st.session_state["metrics"] = responses.get("metrics")
+
         # Grab the streaming generator
-        if "rag_stream" in responses:
+        if responses.get("rag_stream") is not None:
             st.session_state["rag_stream"] = responses["rag_stream"]
             st.session_state["sources"] = responses["sources"]
 
-        # If user decides to not stream (in future), you could also handle a non‐streaming “rag_text”
-        if "rag_text" in responses:
+        # Non‐streaming answers come back complete in “rag_text”
+        elif "rag_text" in responses:
             # Append the generated text to the session state
-            st.session_state["rag_generated"].append(responses["rag_text"])            
+            self._remember(responses["rag_text"])
             st.session_state["sources"] = responses["sources"]
 
+    def _remember(self, answer: str):
+        """
+        Store a finished answer. The conversation itself lives in the session's
+        ConversationMemory; the raw lists only keep what is still shown or
+        verbatim in the prompt, so they stop growing with the session.
+        """
+        st.session_state["rag_generated"].append(answer)
+        st.session_state["memory"].add_turn(st.session_state["user_input"][-1], answer)
+        keep = max(config.MEMORY_RECENT_TURNS, 1)
+        del st.session_state["user_input"][:-keep]
+        del st.session_state["rag_generated"][:-keep]
+
     def _display_sources(self):
         """
         If we have a list of sources, show them horizontally as clickable links.
@@ -178,6 +193,28 @@ class ChatView:
                         st.link_button(label=base_name + ".pdf", url=s3_url)
 
 
+    def _display_metrics(self):
+        """
+        Debug panel in the sidebar with the numbers of the latest answer.
+        """
+        metrics = st.session_state.get("metrics")
+        if metrics is None:
+            return
+
+        def fmt(value, unit="s", scale=1.0, digits=2):
+            return "—" if value is None else f"{value * scale:.{digits}f} {unit}"
+
+        with self.metrics_panel.container():
+            st.metric("Busca no Chroma", fmt(metrics.retrieval_latency, "ms", 1000, 0))
+            st.metric("Contexto", f"{metrics.context_tokens} tokens",
+                      f"-{metrics.context_tokens_saved} economizados" if metrics.context_tokens_saved else None,
+                      delta_color="off")
+            st.metric("Primeiro token (TTFT)", fmt(metrics.ttft))
+            st.metric("Velocidade", fmt(metrics.tokens_per_second, "tokens/s", digits=1))
+            st.metric("Tempo total", fmt(metrics.total_latency))
+            st.metric("Cache de respostas", "acerto" if metrics.cache_hit else "—")
+            st.json(metrics.stage_seconds, expanded=False)
+
     def _load_topics_json(self):
         topics_json_path = config.TOPICS_FILE
 
@@ -192,18 +229,9 @@ class ChatView:
     
 
     def generate_context(self):
-        # If any history exists
-        context = []
-        if st.session_state['rag_generated']:
-            # Add the last three exchanges
-            EXCHANGE_LIMIT = 3
-            size = len(st.session_state['rag_generated'])
-            # print("Current size of history:", size)
-            for i in range(max(size-EXCHANGE_LIMIT, 0), size):
-                context.append(
-                    {'role': 'user', 'content': st.session_state['user_input'][i]}
-                )
-                context.append(
-                    {'role': 'assistant', 'content': st.session_state["rag_generated"][i]}
-                )
-        return context
+        """
+        History for the next question: a rolling summary of older exchanges
+        plus the last MEMORY_RECENT_TURNS ones verbatim, so the prompt stays
+        roughly the same size however long the session gets.
+        """
+        return st.session_state["memory"].messages()